@@ -10,52 +10,61 @@ for printing and supports many different formats Let’s take a look together at
 """
 
 # import libs
-import pandas as pd
 import matplotlib.pyplot as plt
-import os
 import numpy as np
 
-# load the data and read basic info.
-insurance = pd.read_csv("insurance.csv")
-print(insurance.head())
-print(insurance.describe())
-print(insurance.columns)
+from vizkit import dag, datasets, downsample, heatmap, render, stats, streaming, tracing, writer
+
+# the charts are drawn in ggplot style; the heat maps (and the charts after them) turn the grid off
+GGPLOT = 'ggplot'
+GGPLOT_NO_GRID = ['ggplot', {'axes.grid': False}]
+# the columns the correlation heat maps are computed on
+NUMERIC_COLUMNS = ['age', 'bmi', 'children', 'charges']
 
-# create a folder to save the charts.
-os.makedirs('plots/BasicPlotting', exist_ok=True)
 
 # 1. Still using insurance.csv plot the line chart for charges and save it as charges_plot.png
-plt.style.use('ggplot')
-plt.figure(figsize=(8, 5))
-plt.plot(insurance['charges'])
-plt.title('Insurance Charges', fontdict={'fontweight': 'bold', 'fontsize': 18})
-plt.xlabel('Payer index')
-plt.ylabel('USD')
-plt.savefig(f'plots/BasicPlotting/charges_plot.png', format='png')
-plt.clf()
+def plot_charges(insurance, decimate=True, decimate_method='minmax'):
+    fig = plt.figure(figsize=(8, 5))
+    # (long series keep only the vertices visible at the figure's resolution)
+    downsample.plot(plt.gca(), None, insurance['charges'], enabled=decimate, method=decimate_method)
+    plt.title('Insurance Charges', fontdict={'fontweight': 'bold', 'fontsize': 18})
+    plt.xlabel('Payer index')
+    plt.ylabel('USD')
+    return fig
+
 
 # 2. plot the histogram for bmi and save it as bmi_hist.png
-plt.figure(figsize=(12, 8))
-# display the count over the bar and "+2 & +10" is to adjust the coordinates to show text in center of the bar top.
-bmiplot = plt.hist(insurance['bmi'], bins=6, color='g', rwidth=0.9)
-for i in range(6):
-    plt.text(bmiplot[1][i] + 2, bmiplot[0][i] + 10, str(bmiplot[0][i]), color='black', size='medium')
-
-plt.title('BMI Distribution\n', fontdict={'fontweight': 'bold'})
-plt.xlabel('BMI')
-plt.ylabel('Number of people')
-plt.savefig(f'plots/BasicPlotting/bmi_hist.png', format='png')
-plt.clf()
+def plot_bmi_hist(insurance):
+    return draw_bmi_hist(insurance['bmi'], bins=6)
+
+
+def plot_streamed_bmi_hist(summary):
+    counts, edges = summary.histograms['bmi']
+    return draw_bmi_hist(edges[:-1], bins=edges, weights=counts)
+
+
+def draw_bmi_hist(bmi, bins, weights=None):
+    fig = plt.figure(figsize=(12, 8))
+    # display the count over the bar and "+2 & +10" is to adjust the coordinates to show text in center of the bar top.
+    bmiplot = plt.hist(bmi, bins=bins, weights=weights, color='g', rwidth=0.9)
+    for i in range(6):
+        plt.text(bmiplot[1][i] + 2, bmiplot[0][i] + 10, str(bmiplot[0][i]), color='black', size='medium')
+
+    plt.title('BMI Distribution\n', fontdict={'fontweight': 'bold'})
+    plt.xlabel('BMI')
+    plt.ylabel('Number of people')
+    return fig
+
 
 # 3. plot the scatter plot for age vs charges and save it as age_charge_scatter.png
-plt.style.use('ggplot')
-plt.figure(figsize=(8, 5))
-plt.scatter(insurance['age'], insurance['charges'], marker='x')
-plt.title('Insurance charges distribution by Age\n', fontdict={'fontweight': 'bold'})
-plt.xlabel('age', fontdict={'fontsize': 11})
-plt.ylabel('USD', fontdict={'fontsize': 11})
-plt.savefig(f'plots/BasicPlotting/age_charge_scatter.png', format='png')
-plt.clf()
+def plot_age_charge_scatter(insurance):
+    fig = plt.figure(figsize=(8, 5))
+    plt.scatter(insurance['age'], insurance['charges'], marker='x')
+    plt.title('Insurance charges distribution by Age\n', fontdict={'fontweight': 'bold'})
+    plt.xlabel('age', fontdict={'fontsize': 11})
+    plt.ylabel('USD', fontdict={'fontsize': 11})
+    return fig
+
 
 # 4. Do the plots match what we saw with the correlation function.
 # Output from last week:
@@ -64,97 +73,172 @@ plt.clf()
 
 
 # Let's do a simple method for plotting heat map.
-plt.rcParams["axes.grid"] = False
-plt.figure(figsize=(10, 10))
-corr = insurance.corr().round(4)
-names = ['age', 'bmi', 'Children', 'charges']
-fig, ax = plt.subplots(1, 1, figsize=(10, 10))
-cax = ax.matshow(corr, vmin=-1, vmax=1)
-fig.colorbar(cax)
-ticks = np.arange(0, 4, 1)
-ax.set_xticks(ticks)
-ax.set_yticks(ticks)
-ax.set_xticklabels(names, fontdict={'fontweight': 'bold'})
-ax.set_yticklabels(names, fontdict={'fontweight': 'bold'})
-for i in range(0, 4):
-    for j in range(0, 4):
-        text = ax.text(j, i, corr.iloc[i, j], ha='center', va='center', color='black', size='medium')
-ax.set_title('Heat map of Correlation of Dimensions\n', fontdict={'fontweight': 'bold', 'fontsize': 18})
-plt.savefig(f'plots/BasicPlotting/corr_map_simple_version.png', format='png')
-plt.clf()
+def plot_corr_map_simple(insurance):
+    return draw_corr_map_simple(stats.statistics(insurance, NUMERIC_COLUMNS).corr.round(4))
+
+
+def plot_streamed_corr_map_simple(summary):
+    return draw_corr_map_simple(summary.statistics.corr.round(4))
+
+
+def draw_corr_map_simple(corr):
+    names = ['age', 'bmi', 'Children', 'charges']
+    fig, ax = plt.subplots(1, 1, figsize=(10, 10))
+    cax = ax.matshow(corr, vmin=-1, vmax=1)
+    fig.colorbar(cax)
+    ticks = np.arange(0, 4, 1)
+    ax.set_xticks(ticks)
+    ax.set_yticks(ticks)
+    ax.set_xticklabels(names, fontdict={'fontweight': 'bold'})
+    ax.set_yticklabels(names, fontdict={'fontweight': 'bold'})
+    heatmap.annotate(ax, corr, fmt=str, color='black', size='medium')
+    ax.set_title('Heat map of Correlation of Dimensions\n', fontdict={'fontweight': 'bold', 'fontsize': 18})
+    return fig
+
 
 # Here is a more general correlation heat map from our instructor.
-plt.rcParams["axes.grid"] = False
-fig, axes = plt.subplots(1, 1, figsize=(10, 10))
-correlation = insurance.corr().round(4)
-im = axes.imshow(correlation, cmap="coolwarm")
-cbar = axes.figure.colorbar(im, ax=axes)
-cbar.ax.set_ylabel('Correlation', rotation=-90, va="bottom")
-numrows = len(correlation.iloc[0])
-numcolumns = len(correlation.columns)
-axes.set_xticks(np.arange(numrows))
-axes.set_yticks(np.arange(numcolumns))
-axes.set_xticklabels(correlation.columns, fontdict={'fontweight': 'bold'})
-axes.set_yticklabels(correlation.columns, fontdict={'fontweight': 'bold'})
-plt.setp(axes.get_xticklabels(), rotation=45, ha='right', rotation_mode='anchor')
-for i in range(numrows):
-    for j in range(numcolumns):
-        text = axes.text(j, i, correlation.iloc[i, j], ha='center', va='center', color='w', size='large')
-axes.set_title('Heat map of Correlation of Dimensions\n', fontdict={'fontweight': 'bold', 'fontsize': 18})
-fig.tight_layout()
-plt.savefig(f'plots/BasicPlotting/corr_map_general_version.png', format='png')
-plt.clf()
+def plot_corr_map_general(insurance):
+    return draw_corr_map_general(stats.statistics(insurance, NUMERIC_COLUMNS).corr.round(4))
+
+
+def plot_streamed_corr_map_general(summary):
+    return draw_corr_map_general(summary.statistics.corr.round(4))
+
+
+def draw_corr_map_general(correlation):
+    fig, axes = plt.subplots(1, 1, figsize=(10, 10))
+    im = axes.imshow(correlation, cmap="coolwarm")
+    cbar = axes.figure.colorbar(im, ax=axes)
+    cbar.ax.set_ylabel('Correlation', rotation=-90, va="bottom")
+    # only as many tick labels and cell labels as are legible at this size
+    heatmap.label_axes(axes, correlation.columns, fontweight='bold')
+    plt.setp(axes.get_xticklabels(), rotation=45, ha='right', rotation_mode='anchor')
+    heatmap.annotate(axes, correlation, fmt=str, color='w', size='large')
+    axes.set_title('Heat map of Correlation of Dimensions\n', fontdict={'fontweight': 'bold', 'fontsize': 18})
+    fig.tight_layout()
+    return fig
+
 
 # Now let's plot a line chart of charges and age.
-sorted_by_age_df = insurance.sort_values('age')
-plt.figure(figsize=(8, 5))
-plt.plot(sorted_by_age_df['age'], sorted_by_age_df['charges'], label='Charges', color='b')
-plt.title('Insurance Charges by age', fontdict={'fontweight': 'bold', 'fontsize': 18})
-plt.xlabel('age')
-plt.ylabel('USD')
-plt.savefig(f'plots/BasicPlotting/charges_by_age.png', format='png')
-plt.clf()
+def sort_by_age(insurance):
+    return insurance[['age', 'charges']].sort_values('age')
+
+
+# the age-sorted rows are a node of the figure graph (see vizkit.dag)
+NODES = [dag.node('sorted_by_age', sort_by_age)]
+
+
+def plot_charges_by_age(insurance, sorted_by_age, decimate=True, decimate_method='minmax'):
+    fig = plt.figure(figsize=(8, 5))
+    downsample.plot(plt.gca(), sorted_by_age['age'], sorted_by_age['charges'], label='Charges', color='b',
+                    enabled=decimate, method=decimate_method)
+    plt.title('Insurance Charges by age', fontdict={'fontweight': 'bold', 'fontsize': 18})
+    plt.xlabel('age')
+    plt.ylabel('USD')
+    return fig
+
 
 # Next let's do a box plot chart to explore age groups.
+def plot_age_group_boxplot(insurance):
+    young = insurance.loc[insurance.age < 30]['charges']
+    middle_age = insurance.loc[(insurance.age > 30) & (insurance.age < 50)]['charges']
+    old = insurance.loc[insurance.age > 50]['charges']
+
+    fig = plt.figure(figsize=(10, 10))
+    bp = plt.boxplot([young, middle_age, old], labels=['Young', 'Middle_Age', 'Old'], patch_artist=True)
+    # change outline color, fill color and linewidth of the boxes
+    for box in bp['boxes']:
+        # change outline color
+        box.set(color='#7570b3', linewidth=2)
+        # change fill color
+        box.set(facecolor='#1b9e77')
+    # change color and linewidth of the whiskers
+    for whisker in bp['whiskers']:
+        whisker.set(color='#7570b3', linewidth=2)
+
+    # change color and linewidth of the caps
+    for cap in bp['caps']:
+        cap.set(color='#7570b3', linewidth=2)
+
+    # change color and linewidth of the medians
+    for median in bp['medians']:
+        median.set(color='#b2df8a', linewidth=2)
+
+    # change the style of fliers and their fill
+    for flier in bp['fliers']:
+        flier.set(marker='o', color='#e7298a', alpha=0.5)
+    plt.title('Insurance Charges by ageGroup\n', fontdict={'fontweight': 'bold', 'fontsize': 18})
+    plt.ylabel('USD')
+    return fig
 
-young = insurance.loc[insurance.age < 30]['charges']
-middle_age = insurance.loc[(insurance.age > 30) & (insurance.age < 50)]['charges']
-old = insurance.loc[insurance.age > 50]['charges']
-
-plt.figure(figsize=(10, 10))
-bp = plt.boxplot([young, middle_age, old], labels=['Young', 'Middle_Age', 'Old'], patch_artist=True)
-# change outline color, fill color and linewidth of the boxes
-for box in bp['boxes']:
-    # change outline color
-    box.set(color='#7570b3', linewidth=2)
-    # change fill color
-    box.set(facecolor='#1b9e77')
-# change color and linewidth of the whiskers
-for whisker in bp['whiskers']:
-    whisker.set(color='#7570b3', linewidth=2)
-
-# change color and linewidth of the caps
-for cap in bp['caps']:
-    cap.set(color='#7570b3', linewidth=2)
-
-# change color and linewidth of the medians
-for median in bp['medians']:
-    median.set(color='#b2df8a', linewidth=2)
-
-# change the style of fliers and their fill
-for flier in bp['fliers']:
-    flier.set(marker='o', color='#e7298a', alpha=0.5)
-plt.title('Insurance Charges by ageGroup\n', fontdict={'fontweight': 'bold', 'fontsize': 18})
-plt.ylabel('USD')
-plt.savefig(f'plots/BasicPlotting/ageGroup_boxplot.png', format='png')
-plt.clf()
 
 # Plot a scatter chart to see if BMI is related with children number in family.
-plt.style.use('ggplot')
-plt.figure(figsize=(8, 5))
-plt.scatter(insurance['bmi'], insurance['children'])
-plt.title('BMI with Children\n', fontdict={'fontweight': 'bold'})
-plt.xlabel('bmi')
-plt.ylabel('familiy children numbers')
-plt.savefig(f'plots/BasicPlotting/BMI_by_children_scatter.png', format='png')
-plt.clf()
+def plot_bmi_children_scatter(insurance):
+    fig = plt.figure(figsize=(8, 5))
+    plt.scatter(insurance['bmi'], insurance['children'])
+    plt.title('BMI with Children\n', fontdict={'fontweight': 'bold'})
+    plt.xlabel('bmi')
+    plt.ylabel('familiy children numbers')
+    return fig
+
+
+def figure_tasks(insurance, decimate=True, decimate_method='minmax'):
+    # all the charts are saved in plots/BasicPlotting
+    return [
+        render.task('plots/BasicPlotting/charges_plot.png', plot_charges, style=GGPLOT, uses=['charges'],
+                    decimate=decimate, decimate_method=decimate_method),
+        render.task('plots/BasicPlotting/bmi_hist.png', plot_bmi_hist, style=GGPLOT, uses=['bmi']),
+        render.task('plots/BasicPlotting/age_charge_scatter.png', plot_age_charge_scatter, style=GGPLOT,
+                    uses=['age', 'charges']),
+        render.task('plots/BasicPlotting/corr_map_simple_version.png', plot_corr_map_simple, style=GGPLOT_NO_GRID,
+                    uses=NUMERIC_COLUMNS),
+        render.task('plots/BasicPlotting/corr_map_general_version.png', plot_corr_map_general,
+                    style=GGPLOT_NO_GRID, uses=NUMERIC_COLUMNS),
+        render.task('plots/BasicPlotting/charges_by_age.png', plot_charges_by_age, style=GGPLOT_NO_GRID,
+                    uses=[], needs=['sorted_by_age'], decimate=decimate, decimate_method=decimate_method),
+        render.task('plots/BasicPlotting/ageGroup_boxplot.png', plot_age_group_boxplot, style=GGPLOT_NO_GRID,
+                    uses=['age', 'charges']),
+        render.task('plots/BasicPlotting/BMI_by_children_scatter.png', plot_bmi_children_scatter, style=GGPLOT,
+                    uses=['bmi', 'children']),
+    ]
+
+
+def stream_tasks():
+    # the charts that can be drawn from streamed summaries (--stream)
+    return [
+        render.task('plots/BasicPlotting/bmi_hist.png', plot_streamed_bmi_hist, style=GGPLOT),
+        render.task('plots/BasicPlotting/corr_map_simple_version.png', plot_streamed_corr_map_simple,
+                    style=GGPLOT_NO_GRID),
+        render.task('plots/BasicPlotting/corr_map_general_version.png', plot_streamed_corr_map_general,
+                    style=GGPLOT_NO_GRID),
+    ]
+
+
+def main(jobs=1, cache=True, only=None, since_changed=False, stream=False, chunksize=streaming.CHUNK_ROWS,
+         decimate=True, decimate_method='minmax'):
+    if stream:
+        # summarize insurance.csv chunk by chunk instead of loading it
+        summary = streaming.summarize([datasets.INSURANCE_PATH], histograms={'bmi': 6}, chunksize=chunksize)
+        print(summary.statistics.describe)
+        render.render(stream_tasks(), summary, cache=False, only=only)
+        return
+
+    # load the data and read basic info.
+    insurance = datasets.load_insurance()
+    print(insurance.head())
+    print(stats.statistics(insurance, NUMERIC_COLUMNS).describe)
+    print(insurance.columns)
+
+    render.render(figure_tasks(insurance, decimate, decimate_method), insurance, jobs=jobs, cache=cache, nodes=NODES,
+                  only=only, since_changed=since_changed)
+
+
+if __name__ == '__main__':
+    parser = render.argument_parser(__doc__)
+    for add_arguments in [streaming.add_arguments, downsample.add_arguments,
+                          tracing.add_arguments, writer.add_arguments]:
+        add_arguments(parser)
+    args = vars(parser.parse_args())
+    with tracing.session(args.pop('trace'), args.pop('profile')):
+        with writer.session(args.pop('png_compression'), args.pop('write_queue')):
+            main(**args)
@@ -6,170 +6,298 @@ It may help wine manufacturers to develop new wine.
 """
 
 # Import libs and data preparation
-import pandas as pd
 import matplotlib.pyplot as plt
-import os
-import seaborn as sns
-from mpl_toolkits import mplot3d
 
-# load and organize the data in a pandas data frame format. (red wine and white wine)
-redwine_link = 'https://archive.ics.uci.edu/ml/machine-learning-databases/wine-quality/winequality-red.csv'
-whitewine_link = 'https://archive.ics.uci.edu/ml/machine-learning-databases/wine-quality/winequality-white.csv'
-redwine_table = pd.read_csv(redwine_link, ";", header=0)
-whitewine_table = pd.read_csv(whitewine_link, ";", header=0)
+from vizkit import (bootstrap, dag, datasets, facets, figpool, heatmap, kde, lazy, pairplot, render, scatter, schema,
+                    stats, streaming, tracing, writer)
 
-# Concatenate two datasets vertically (red wine has the same columns as white wine)
-wine = pd.concat([redwine_table, whitewine_table])
-print(wine.head())
+# seaborn is imported when the first figure using it is drawn (the 3d projection needs no import)
+sns = lazy.module('seaborn')
 
 # Create a python script (any name) and use your project dataset to generate many figures (10+) showing data with at
 # least *3* features at a time.
 
-# Plot each feature - Histogram/Seaborn
-os.makedirs('plots2/histogram_seaborn', exist_ok=True)
-sns.set(style="white")
-for col in wine.columns:
-    sns.distplot(wine[col])
+
+def quality_classes(wine):
+    # define 3,4,5-> bad quality; 6,7->medium quality, 8,9 -> good quality (see vizkit.schema.BINS)
+    return schema.binned(wine, 'quality_desc')
+
+
+def quality_intervals(wine, method='bootstrap'):
+    # mean and confidence interval of every column per quality: one resampling of each quality group for all the
+    # columns, shared by the bar charts and the line charts
+    return bootstrap.intervals(wine, 'quality', wine.columns.tolist(), method=method)
+
+
+def graph_nodes(interval='bootstrap'):
+    # the quality classes are computed once and shared by the distribution and density plots (see vizkit.dag); the
+    # rows of the 3D plot's bad / medium / good classes are grouped by a single sort (see vizkit.facets)
+    return [
+        dag.node('quality_desc', quality_classes),
+        dag.node('quality_facets', facets.partition, by='quality_class'),
+        dag.node('quality_intervals', quality_intervals, method=interval),
+    ]
+
+
+# the nodes with the default options (python -m vizkit, the plot server and the benchmarks read them)
+NODES = graph_nodes()
+
+
+def plot_distribution(wine, col, quality_desc):
+    # Plot each feature - Histogram/Seaborn
+    sns.set(style="white")
+    # (the figure of the previous column is cleared and reused)
+    figpool.figure('distribution')
+    # same cached curves as the quality comparison grid below
+    kde.distplot(wine[col], kde.density_curves(wine[col], quality_desc))
     plt.title(f"{col}'s distribution")
-    plt.savefig(f'plots2/histogram_seaborn/{col}_hist.png')
-    plt.close()
+    return plt.gcf()
+
 
-# Plot each feature vs target "quality" - Histogram/Seaborn
-sns.set(style="white")
-for col in wine.columns:
-    sns.barplot(wine['quality'], wine[col], data=wine)
+def plot_by_quality(wine, col, quality_intervals):
+    # Plot each feature vs target "quality" - Histogram/Seaborn
+    sns.set(style="white")
+    # the previous column's bar chart only gets new bar heights and error bars when the quality groups are the same
+    figpool.figure('by_quality', clear=False)
+    ax = plt.gca()
+    # error bars from the shared quality_intervals node (the line charts below use the same intervals)
+    if not bootstrap.update_barplot(ax, quality_intervals, col):
+        ax.cla()
+        bootstrap.barplot(ax, quality_intervals, col, color=sns.desaturate(sns.color_palette()[0], 0.75))
     plt.title(f"{col} by quality")
-    plt.savefig(f'plots2/histogram_seaborn/{col} & quality_hist.png')
-    plt.close()
-
-# Plot the Heatmap/Seaborn
-os.makedirs('plots2/heatmap', exist_ok=True)
-sns.set()
-fig, ax = plt.subplots(figsize=(12, 12))
-sns.heatmap(wine.corr(), annot=True)
-ax.set_xticklabels(wine.columns, rotation=45)
-ax.set_yticklabels(wine.columns, rotation=45)
-ax.set_title('Heatmap\n', fontdict={'fontweight': 'bold', 'fontsize': 18})
-plt.savefig('plots2/heatmap/wine_correlation.png')
-plt.close()
-
-# Plot the Pair plot/Seaborn
-os.makedirs('plots2/pairmap', exist_ok=True)
-sns.pairplot(wine)
-plt.title('Pair Correlations', fontdict={'fontweight': 'bold', 'fontsize': 18})
-plt.savefig('plots2/pairmap/wine_pairmap.png')
-plt.close()
-
-# Plot Line plots/Seaborn to see relation between each independent feature with dependent feature 'Quality'
-os.makedirs('plots2/line_charts', exist_ok=True)
-fig, ax = plt.subplots(ncols=6, nrows=2, figsize=(15, 5))
-ax = ax.flatten()
-index = 0
-sorted_by_quality_df = wine.sort_values('quality')
-for col in wine.columns:
-    if col != 'quality':
-        sns.lineplot(x='quality', y=col, data=sorted_by_quality_df, ax=ax[index])
-        plt.title(f'{col} to quality')
-        plt.xlabel('quality')
-        plt.ylabel(f'{col}')
-        index += 1
+    return plt.gcf()
+
+
+def plot_heatmap(wine, columns, heatmap_mode='auto', heatmap_cluster=False):
+    # Plot the Heatmap/Seaborn
+    return draw_heatmap(heatmap.correlation(wine, columns, mode=heatmap_mode, cluster=heatmap_cluster), heatmap_mode)
+
+
+def draw_heatmap(corr, heatmap_mode='auto'):
+    sns.set()
+    fig, ax = plt.subplots(figsize=(12, 12))
+    if heatmap.choose_mode(heatmap_mode, len(corr.columns)) == 'cells':
+        sns.heatmap(corr, annot=True)
+        ax.set_xticklabels(corr.columns, rotation=45)
+        ax.set_yticklabels(corr.columns, rotation=45)
+    else:
+        # one image; only the labels legible at this size
+        heatmap.draw(ax, corr, cmap=sns.color_palette('rocket', as_cmap=True), rotation=45)
+    ax.set_title('Heatmap\n', fontdict={'fontweight': 'bold', 'fontsize': 18})
+    return fig
+
 
-plt.tight_layout(pad=0.4)
-plt.savefig(f'plots2/line_charts/features_vs_quality.png', format='png')
-plt.clf()
-
-# Plotting Box plots/Seaborn to see if there are any outliers in our data (considering data between 25th and 75th
-# percentile as non outlier)
-os.makedirs('plots2/boxplots', exist_ok=True)
-fig, ax = plt.subplots(ncols=6, nrows=2, figsize=(15, 5))
-ax = ax.flatten()
-index = 0
-for column in wine.columns:
-    if column != 'quality':
-        sns.boxplot(y=column, data=wine, ax=ax[index])
+def plot_pairmap(wine, columns, pairplot_mode='auto'):
+    # Plot the Pair plot/Seaborn (binned density panels instead of scatters on large data)
+    sns.set()
+    pairplot.pairplot(wine, columns, mode=pairplot_mode)
+    plt.title('Pair Correlations', fontdict={'fontweight': 'bold', 'fontsize': 18})
+    return plt.gcf()
+
+
+def plot_line_charts(wine, columns, quality_intervals):
+    # Plot Line plots/Seaborn to see relation between each independent feature with dependent feature 'Quality'
+    sns.set()
+    fig, ax = plt.subplots(ncols=6, nrows=2, figsize=(15, 5))
+    ax = ax.flatten()
+    index = 0
+    features = [col for col in columns if col != 'quality']
+    for col in features:
+        bootstrap.lineplot(ax[index], quality_intervals, col, color=sns.color_palette()[0])
         plt.title(f'{col} to quality')
         plt.xlabel('quality')
         plt.ylabel(f'{col}')
         index += 1
-plt.tight_layout(pad=0.4)
-plt.savefig(f'plots2/boxplots/outliers_check.png', format='png')
-plt.close()
-# # ==> From the above box plots we can clearly see that there are outliers in all features.
-
-# Features Density plots/Seaborn grouped by quality class
-os.makedirs('plots2/quality_comparison', exist_ok=True)
-print(wine['quality'].value_counts())
-# define 3,4,5-> bad quality; 6,7->medium quality, 8,9 -> good quality
-bins = [3, 5, 7, 9]
-labels = ['Bad', 'Medium', 'Good']
-wine['quality_desc'] = pd.cut(wine['quality'], bins=bins, labels=labels)
-print(wine['quality_desc'].value_counts())
-col_names = wine.drop('quality_desc', axis=1).columns.tolist()
-
-plt.figure(figsize=(15, 10))
-i = 0
-for col in col_names:
-    if col != 'quality':
-        plt.subplot(3, 4, i + 1)
-        plt.grid(True, alpha=0.5)
-        sns.kdeplot(wine[col][wine['quality_desc'] == 'Bad'], label='Bad Quality')
-        sns.kdeplot(wine[col][wine['quality_desc'] == 'Medium'], label='Medium Quality')
-        sns.kdeplot(wine[col][wine['quality_desc'] == 'Good'], label='Good Quality')
-        plt.title(col + ' vs Quality', size=15)
-        plt.xlabel(col, size=12)
-        plt.ylabel('Density')
-        plt.legend()
-        plt.tight_layout()
-        i += 1
-plt.savefig(f'plots2/quality_comparison/Density_groupBy_quality.png', format='png')
-plt.clf()
-
-# Based on above plots,  we may noticed that alcohol, chlorides, volatile acidity, density are the features more
-# related to target 'quality'.
-
-# Plot 'volatile acidity', 'chlorides', 'density' correlation with 'alcohol'- Scatter plot/Seaborn
-os.makedirs('plots2/multi_scatter', exist_ok=True)
-sns.set(style="white")
-features = ['volatile acidity', 'chlorides', 'density']
-for feature in features:
-    sns.relplot(x="alcohol", y=feature, hue="quality", sizes=(40, 400), alpha=0.5,
-                height=6, data=wine)
+
+    plt.tight_layout(pad=0.4)
+    return fig
+
+
+def plot_boxplots(wine, columns):
+    # Plotting Box plots/Seaborn to see if there are any outliers in our data (considering data between 25th and 75th
+    # percentile as non outlier)
+    # (quartiles, whiskers and outliers come from the shared summary statistics)
+    return draw_boxplots(stats.statistics(wine, columns), columns)
+
+
+def draw_boxplots(summary, columns):
+    sns.set()
+    fig, ax = plt.subplots(ncols=6, nrows=2, figsize=(15, 5))
+    ax = ax.flatten()
+    index = 0
+    for column in columns:
+        if column != 'quality':
+            stats.boxplot(ax[index], summary.boxes[column], color=sns.color_palette()[0])
+            plt.title(f'{column} to quality')
+            plt.xlabel('quality')
+            plt.ylabel(f'{column}')
+            index += 1
+    plt.tight_layout(pad=0.4)
+    # # ==> From the above box plots we can clearly see that there are outliers in all features.
+    return fig
+
+
+def plot_density_by_quality(wine, columns, quality_desc):
+    # Features Density plots/Seaborn grouped by quality class
+    sns.set()
+    fig = plt.figure(figsize=(15, 10))
+    i = 0
+    for col in columns:
+        if col != 'quality':
+            plt.subplot(3, 4, i + 1)
+            plt.grid(True, alpha=0.5)
+            curves = kde.density_curves(wine[col], quality_desc)
+            plt.plot(curves.grid, curves.densities['Bad'], label='Bad Quality')
+            plt.plot(curves.grid, curves.densities['Medium'], label='Medium Quality')
+            plt.plot(curves.grid, curves.densities['Good'], label='Good Quality')
+            plt.title(col + ' vs Quality', size=15)
+            plt.xlabel(col, size=12)
+            plt.ylabel('Density')
+            plt.legend()
+            plt.tight_layout()
+            i += 1
+    # Based on above plots,  we may noticed that alcohol, chlorides, volatile acidity, density are the features more
+    # related to target 'quality'.
+    return fig
+
+
+def plot_alcohol_scatter(wine, feature, scatter_mode='auto', scatter_threshold=scatter.DENSITY_POINTS):
+    # Plot 'volatile acidity', 'chlorides', 'density' correlation with 'alcohol'- Scatter plot/Seaborn
+    sns.set(style="white")
+    if scatter.choose_mode(scatter_mode, len(wine), scatter_threshold) == 'markers':
+        sns.relplot(x="alcohol", y=feature, hue="quality", sizes=(40, 400), alpha=0.5,
+                    height=6, data=wine)
+    else:
+        # one density image with a layer per quality level, coloured like relplot's hue
+        fig, ax = plt.subplots(figsize=(7.2, 6))
+        cmap = sns.color_palette('ch:', as_cmap=True)
+        low, high = wine['quality'].min(), wine['quality'].max()
+        layers = [scatter.layer(part['alcohol'], part[feature], cmap((level - low) / max(high - low, 1)), level)
+                  for level, part in wine.groupby('quality')]
+        scatter.scatter(ax, layers, mode='density', alpha=0.5)
+        ax.legend(title='quality', loc='center left', bbox_to_anchor=(1, 0.5), frameon=False)
+        sns.despine(ax=ax)
+        fig.subplots_adjust(right=0.82)
     plt.title(f'{feature} to alcohol')
     plt.xlabel('alcohol')
     plt.ylabel(f'{feature}')
-    plt.savefig(f'plots2/multi_scatter/alcohol_{feature}_scatter.png', dpi=300)
-    plt.tight_layout()
-    plt.close()
+    return plt.gcf()
 
-# Plotting main features correlation with target "quality"- Violin plot/seaborn
-os.makedirs('plots2/violinplot', exist_ok=True)
-sns.set(style="white")
-features = ['alcohol', 'volatile acidity', 'chlorides', 'density']
 
-for feature in features:
+def plot_violin(wine, feature):
+    # Plotting main features correlation with target "quality"- Violin plot/seaborn
+    sns.set(style="white")
+    figpool.figure('violin')
     sns.violinplot(x="quality", y=feature, data=wine)
     plt.title(f'{feature} to quality')
     plt.xlabel('quality')
     plt.ylabel(f'{feature}')
-    plt.savefig(f'plots2/violinplot/quality_{feature}_violinplot.png', dpi=300)
-    plt.close()
-
-# 3D visualizations
-os.makedirs('plots2/3D', exist_ok=True)
-
-bad_wine = wine.loc[wine['quality'] < 5]
-medium_wine = wine.loc[(wine['quality'] > 5) & (wine['quality'] < 7)]
-good_wine = wine.loc[wine['quality'] > 7]
-
-fig = plt.figure()
-axes = fig.add_subplot(1, 1, 1, projection='3d')
-line1 = axes.scatter(bad_wine['quality'], bad_wine['alcohol'], bad_wine['volatile acidity'])
-line2 = axes.scatter(medium_wine['quality'], medium_wine['alcohol'], medium_wine['volatile acidity'])
-line3 = axes.scatter(good_wine['quality'], good_wine['alcohol'], good_wine['volatile acidity'])
-axes.legend((line1, line2, line3), ('Bad_wine', 'Medium_wine', 'Good_wine'))
-axes.set_title('Wine Quality Distribution - 3D')
-axes.set_xlabel('quality')
-axes.set_ylabel('alcohol')
-axes.set_zlabel('volatile acidity')
-plt.savefig(f'plots2/3D/quality_class_3d.png', dpi=300)
-plt.close()
+    return plt.gcf()
+
+
+def plot_quality_3d(wine, quality_facets):
+    # 3D visualizations
+    # (quality < 5 -> bad, 6 -> medium, > 7 -> good, see vizkit.facets.FACETS)
+    sns.set(style="white")
+
+    fig = plt.figure()
+    axes = fig.add_subplot(1, 1, 1, projection='3d')
+    lines, labels = [], []
+    for (quality_class,), rows in facets.groups(quality_facets, wine, ['quality', 'alcohol', 'volatile acidity']):
+        lines.append(axes.scatter(rows['quality'], rows['alcohol'], rows['volatile acidity']))
+        labels.append(f'{quality_class}_wine')
+    axes.legend(lines, labels)
+    axes.set_title('Wine Quality Distribution - 3D')
+    axes.set_xlabel('quality')
+    axes.set_ylabel('alcohol')
+    axes.set_zlabel('volatile acidity')
+    return fig
+
+
+def prepare(wine):
+    # the 'wine type' column is not used by the plots below
+    return wine.drop(columns='wine type')
+
+
+def figure_tasks(wine, scatter_mode='auto', scatter_threshold=scatter.DENSITY_POINTS, heatmap_mode='auto',
+                 heatmap_cluster=False, pairplot_mode='auto'):
+    # the measured columns (the quality classes grouping the density plots are the quality_desc node)
+    columns = wine.columns.tolist()
+    tasks = []
+    for col in columns:
+        tasks.append(render.task(f'plots2/histogram_seaborn/{col}_hist.png', plot_distribution,
+                                 uses=[col], needs=['quality_desc'], col=col))
+    for col in columns:
+        tasks.append(render.task(f'plots2/histogram_seaborn/{col} & quality_hist.png', plot_by_quality,
+                                 uses=['quality', col], needs=['quality_intervals'], col=col))
+    tasks += [
+        render.task('plots2/heatmap/wine_correlation.png', plot_heatmap, uses=columns, columns=columns,
+                    heatmap_mode=heatmap_mode, heatmap_cluster=heatmap_cluster),
+        render.task('plots2/pairmap/wine_pairmap.png', plot_pairmap, uses=columns, columns=columns,
+                    pairplot_mode=pairplot_mode),
+        render.task('plots2/line_charts/features_vs_quality.png', plot_line_charts, uses=columns,
+                    needs=['quality_intervals'], columns=columns),
+        render.task('plots2/boxplots/outliers_check.png', plot_boxplots, uses=columns, columns=columns),
+        render.task('plots2/quality_comparison/Density_groupBy_quality.png', plot_density_by_quality,
+                    uses=columns, needs=['quality_desc'], columns=columns),
+    ]
+    for feature in ['volatile acidity', 'chlorides', 'density']:
+        tasks.append(render.task(f'plots2/multi_scatter/alcohol_{feature}_scatter.png', plot_alcohol_scatter,
+                                 savefig={'dpi': 300}, uses=['alcohol', feature, 'quality'], feature=feature,
+                                 scatter_mode=scatter_mode, scatter_threshold=scatter_threshold))
+    for feature in ['alcohol', 'volatile acidity', 'chlorides', 'density']:
+        tasks.append(render.task(f'plots2/violinplot/quality_{feature}_violinplot.png', plot_violin,
+                                 savefig={'dpi': 300}, uses=['quality', feature], feature=feature))
+    tasks.append(render.task('plots2/3D/quality_class_3d.png', plot_quality_3d, savefig={'dpi': 300},
+                             uses=['quality', 'alcohol', 'volatile acidity'], needs=['quality_facets']))
+    return tasks
+
+
+def plot_streamed_heatmap(summary):
+    return draw_heatmap(summary.statistics.corr)
+
+
+def plot_streamed_boxplots(summary, columns):
+    return draw_boxplots(summary.statistics, columns)
+
+
+def stream_tasks(columns):
+    # the figures that can be drawn from streamed summaries (--stream)
+    return [
+        render.task('plots2/heatmap/wine_correlation.png', plot_streamed_heatmap),
+        render.task('plots2/boxplots/outliers_check.png', plot_streamed_boxplots, columns=columns),
+    ]
+
+
+def main(jobs=1, cache=True, only=None, since_changed=False, stream=False, chunksize=streaming.CHUNK_ROWS,
+         interval='bootstrap', scatter_mode='auto', scatter_threshold=scatter.DENSITY_POINTS, heatmap_mode='auto',
+         heatmap_cluster=False, pairplot_mode='auto'):
+    if stream:
+        # summarize the csv files chunk by chunk instead of loading them
+        summary = streaming.summarize([datasets.REDWINE_LINK, datasets.WHITEWINE_LINK], chunksize=chunksize, sep=';')
+        render.render(stream_tasks(summary.statistics.columns), summary, cache=False, only=only)
+        return
+
+    # load and organize the data in a pandas data frame format. (red wine and white wine)
+    # (concatenated and cached locally by the loader)
+    wine = prepare(datasets.load_wine())
+    print(wine.head())
+
+    print(wine['quality'].value_counts())
+    print(quality_classes(wine).value_counts())
+
+    tasks = figure_tasks(wine, scatter_mode, scatter_threshold, heatmap_mode, heatmap_cluster, pairplot_mode)
+    render.render(tasks, wine, jobs=jobs, cache=cache, nodes=graph_nodes(interval), only=only,
+                  since_changed=since_changed)
+
+
+if __name__ == '__main__':
+    parser = render.argument_parser(__doc__)
+    for add_arguments in [streaming.add_arguments, bootstrap.add_arguments,
+                          scatter.add_arguments, heatmap.add_arguments, pairplot.add_arguments,
+                          tracing.add_arguments, writer.add_arguments]:
+        add_arguments(parser)
+    args = vars(parser.parse_args())
+    with tracing.session(args.pop('trace'), args.pop('profile')):
+        with writer.session(args.pop('png_compression'), args.pop('write_queue')):
+            main(**args)
@@ -2,97 +2,132 @@
 Visualizing data with Seaborn
 """
 
-import pandas as pd
 import matplotlib.pyplot as plt
-import os
-import seaborn as sns
 
-# Loading dataset
-house = pd.read_csv('housing.data', sep='\s+', header=None)
+from vizkit import dag, datasets, heatmap, kde, lazy, pairplot, render, schema, stats, tracing, writer
 
-# Setting columns to dataset
-house.columns = ['CRIM', 'ZN', 'INDUS', 'CHAS', 'NOX', 'RM', 'AGE', 'DIS', 'RAD', 'TAX', 'PTRATIO', 'B', 'LSTAT',
-                 'MEDV']
+# seaborn is imported when the first figure using it is drawn
+sns = lazy.module('seaborn')
 
-print(house.describe())
 
 # 1. Recreate the previous plots from matplotlib using seaborn:
 # line plots -> sns.lineplot
-os.makedirs('plots3/lineplot', exist_ok=True)
-sns.set()
-sns.lineplot('MEDV', 'CRIM', data=house)
-plt.title('Crime to Boston house price')
-plt.xlabel('price')
-plt.ylabel('crime rate')
-plt.savefig(f'plots3/lineplot/crime_to_price.png')
-plt.close()
-# --> Plot is showing the house price is going down with the crime rate of town is decreasing.
+def plot_crime_to_price(house):
+    sns.set()
+    sns.lineplot(x='MEDV', y='CRIM', data=house)
+    plt.title('Crime to Boston house price')
+    plt.xlabel('price')
+    plt.ylabel('crime rate')
+    # --> Plot is showing the house price is going down with the crime rate of town is decreasing.
+    return plt.gcf()
+
 
 # scatter plots -> sns.scatterplot or sns.jointplot
-os.makedirs('plots3/joinplot', exist_ok=True)
-sns.set()
-sns.jointplot('MEDV', 'AGE', data=house)
-plt.title('Age to house price')
-plt.xlabel('price')
-plt.ylabel('age')
-plt.savefig(f'plots3/joinplot/age_to_price.png')
-plt.close()
-# --> With the house price up, the rate of house which was built prior to 1940 is dramatically decreasing.
+def plot_age_to_price(house):
+    sns.set()
+    sns.jointplot(x='MEDV', y='AGE', data=house)
+    plt.title('Age to house price')
+    plt.xlabel('price')
+    plt.ylabel('age')
+    # --> With the house price up, the rate of house which was built prior to 1940 is dramatically decreasing.
+    return plt.gcf()
+
 
 # histograms -> sns.distplot
-os.makedirs('plots3/distplot', exist_ok=True)
-sns.set()
-sns.distplot(house['MEDV'])
-plt.title('Boston house price')
-plt.xlabel('price')
-plt.savefig(f'plots3/distplot/price_hist.png')
-plt.close()
+def plot_price_hist(house):
+    sns.set()
+    kde.distplot(house['MEDV'], kde.density_curves(house['MEDV']))
+    plt.title('Boston house price')
+    plt.xlabel('price')
+    return plt.gcf()
+
 
 # 2. Choose a categorical variable of your dataset and plot it using the following categorical plots:
 # sns.countplot or sns.violinplot.
+def price_classes(house):
+    # price <= 20 -> 'low', 20 < price <= 35 -> 'mid', else 'high', cut in one pass (see vizkit.schema.BINS)
+    return schema.binned(house, 'priceClass')
 
-priceClass = []
-for price in house['MEDV']:
-    if price <= 20:
-        priceClass.append('low')
-    elif 35 >= price > 20:
-        priceClass.append('mid')
-    else:
-        priceClass.append('high')
-house['priceClass'] = priceClass
 
-os.makedirs('plots3/categorical_plot', exist_ok=True)
-sns.set()
-sns.countplot('priceClass', data=house, order=('low', 'mid', 'high'))
-plt.title('Boston house price class count')
-plt.savefig(f'plots3/categorical_plot/houseClass_count.png')
-plt.close()
+# the price classes are computed once for both categorical plots (see vizkit.dag)
+NODES = [dag.node('priceClass', price_classes)]
+
+
+def plot_house_class_count(house, priceClass):
+    sns.set()
+    sns.countplot(x=priceClass, order=('low', 'mid', 'high'))
+    plt.title('Boston house price class count')
+    return plt.gcf()
+
 
 # violinplot
-os.makedirs('plots3/categorical_plot', exist_ok=True)
+def plot_crime_violin(house, priceClass):
+    sns.set()
+    sns.violinplot(x=priceClass, y=house['CRIM'])
+    plt.title('Crime rate VS houseClass')
+    plt.xlabel('houseClass')
+    plt.ylabel('Crime rate')
+    return plt.gcf()
 
-sns.set()
-sns.violinplot('priceClass', 'CRIM', data=house)
-plt.title('Crime rate VS houseClass')
-plt.xlabel('houseClass')
-plt.ylabel('Crime rate')
-plt.savefig(f'plots3/categorical_plot/violinplot.png')
-plt.close()
 
 # 3. Create a correlation heatmap using sns.heatmap. Pass in the df.corr() to see the correlation heatmap for all of yours features!
-os.makedirs('plots3/heatmap', exist_ok=True)
-sns.set()
-fig, ax = plt.subplots(figsize=(12, 12))
-sns.heatmap(house.corr(), annot=True)
-ax.set_xticklabels(house.columns, rotation=45)
-ax.set_yticklabels(house.columns, rotation=45)
-ax.set_title('Heatmap\n', fontdict={'fontweight': 'bold', 'fontsize': 18})
-plt.savefig('plots3/heatmap/house_correlation.png')
-plt.close()
+def plot_heatmap(house, columns, heatmap_mode='auto', heatmap_cluster=False):
+    sns.set()
+    fig, ax = plt.subplots(figsize=(12, 12))
+    corr = heatmap.correlation(house, columns, mode=heatmap_mode, cluster=heatmap_cluster)
+    if heatmap.choose_mode(heatmap_mode, len(columns)) == 'cells':
+        sns.heatmap(corr, annot=True)
+        ax.set_xticklabels(corr.columns, rotation=45)
+        ax.set_yticklabels(corr.columns, rotation=45)
+    else:
+        # one image; only the labels legible at this size
+        heatmap.draw(ax, corr, cmap=sns.color_palette('rocket', as_cmap=True), rotation=45)
+    ax.set_title('Heatmap\n', fontdict={'fontweight': 'bold', 'fontsize': 18})
+    return fig
+
 
 # 4. Create the sns.pairplot for your entire dataset
-os.makedirs('plots3/pairmap', exist_ok=True)
-sns.pairplot(house)
-plt.title('Pair Correlations', fontdict={'fontweight': 'bold', 'fontsize': 18})
-plt.savefig('plots3/pairmap/house_pairmap.png')
-plt.close()
\ No newline at end of file
+def plot_pairmap(house, columns, pairplot_mode='auto'):
+    sns.set()
+    pairplot.pairplot(house, columns, mode=pairplot_mode)
+    plt.title('Pair Correlations', fontdict={'fontweight': 'bold', 'fontsize': 18})
+    return plt.gcf()
+
+
+def figure_tasks(house, heatmap_mode='auto', heatmap_cluster=False, pairplot_mode='auto'):
+    # the numeric columns (the priceClass node is only used by the categorical plots)
+    columns = datasets.HOUSING_COLUMNS
+    return [
+        render.task('plots3/lineplot/crime_to_price.png', plot_crime_to_price, uses=['MEDV', 'CRIM']),
+        render.task('plots3/joinplot/age_to_price.png', plot_age_to_price, uses=['MEDV', 'AGE']),
+        render.task('plots3/distplot/price_hist.png', plot_price_hist, uses=['MEDV']),
+        render.task('plots3/categorical_plot/houseClass_count.png', plot_house_class_count, uses=[],
+                    needs=['priceClass']),
+        render.task('plots3/categorical_plot/violinplot.png', plot_crime_violin, uses=['CRIM'],
+                    needs=['priceClass']),
+        render.task('plots3/heatmap/house_correlation.png', plot_heatmap, uses=columns, columns=columns,
+                    heatmap_mode=heatmap_mode, heatmap_cluster=heatmap_cluster),
+        render.task('plots3/pairmap/house_pairmap.png', plot_pairmap, uses=columns, columns=columns,
+                    pairplot_mode=pairplot_mode),
+    ]
+
+
+def main(jobs=1, cache=True, only=None, since_changed=False, heatmap_mode='auto', heatmap_cluster=False,
+         pairplot_mode='auto'):
+    # Loading dataset (the loader sets the column names and caches the parsed data)
+    house = datasets.load_housing()
+    print(stats.statistics(house, datasets.HOUSING_COLUMNS).describe)
+
+    tasks = figure_tasks(house, heatmap_mode, heatmap_cluster, pairplot_mode)
+    render.render(tasks, house, jobs=jobs, cache=cache, nodes=NODES, only=only, since_changed=since_changed)
+
+
+if __name__ == '__main__':
+    parser = render.argument_parser(__doc__)
+    for add_arguments in [heatmap.add_arguments, pairplot.add_arguments, tracing.add_arguments,
+                          writer.add_arguments]:
+        add_arguments(parser)
+    args = vars(parser.parse_args())
+    with tracing.session(args.pop('trace'), args.pop('profile')):
+        with writer.session(args.pop('png_compression'), args.pop('write_queue')):
+            main(**args)
@@ -5,163 +5,283 @@ It may help wine manufacturers to develop new wine.
 
 """
 # Import libs
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
-import numpy as np
-import os
-
-# load and organize the data in a pandas data frame format. (red wine and white wine)
-redwine_link = 'https://archive.ics.uci.edu/ml/machine-learning-databases/wine-quality/winequality-red.csv'
-whitewine_link = 'https://archive.ics.uci.edu/ml/machine-learning-databases/wine-quality/winequality-white.csv'
-redwine_table = pd.read_csv(redwine_link, ";", header=0)
-whitewine_table = pd.read_csv(whitewine_link, ";", header=0)
-
-# Concatenate two datasets vertically (red wine has the same columns as white wine)
-wine = pd.concat([redwine_table, whitewine_table])
-
-# Check and make sure the concatenation is correct
-assert redwine_table.shape[0] + whitewine_table.shape[0] == wine.shape[0], 'merge error'
-assert redwine_table.shape[1] == whitewine_table.shape[1] == wine.shape[1], 'merge error'
-
-# Check how the data is distributed on the combined wine DataFrame
-print(f"First 5 rows:\n{wine.head()}")
-
-# Show Information about wine DataFrame (columns and indexes)
-print("\nA concise summary of this DataFrame:\n")
-wine.info()
-# ==> All the data type are numeric numbers. No missing data.
-
-# Show a summary statistics information
-print(f"\nThe generate descriptive statistics of whole dataset:\n{wine.describe()}\n")
-# ==> mean quality is 5.818378, so we can think the quality over 7 is high quality wine.
-
-# Sort out the wine's quality > 7,8,9 to evaluate their statistics and compare with the whole dataset.
-print(f"Statistics for Wine quality 7:\n{wine[wine.quality == 7].describe()}")
-print(f"Statistics for Wine quality 8:\n{wine[wine.quality == 8].describe()}")
-print(f"Statistics for Wine quality 9:\n{wine[wine.quality == 9].describe()}")
-# ==> with the quality is getting higher, the alcohol is higher.
-
-# Show best wine (quality =9)
-print(f"Wine quality is 9:\n{wine[wine.quality == 9]}")
-
-# show correlation matrix
-pd.set_option('display.max_columns', None)  # to display all the columns in order to show all the correlations.
-print("correlation matrix is:\n", wine.corr())
-# ==> correlation between quality and alcohol is 0.444319.
-# ==> correlation between quality and density is -0.305858.
-# ==> correlation between density and residual sugar is 0.552517.
-# ==> correlation between alcohol and density is -0.686745.
+
+from vizkit import dag, datasets, downsample, facets, heatmap, render, scatter, stats, streaming, tracing, writer
+
+
+def describe_wine(wine):
+    # the summary statistics are computed once and shared with the heatmap below
+    summary = stats.statistics(wine, by=['quality'])
+
+    # Check how the data is distributed on the combined wine DataFrame
+    print(f"First 5 rows:\n{wine.head()}")
+
+    # Show Information about wine DataFrame (columns and indexes)
+    print("\nA concise summary of this DataFrame:\n")
+    wine.info()
+    # ==> All the data type are numeric numbers. No missing data.
+
+    # Show a summary statistics information
+    print(f"\nThe generate descriptive statistics of whole dataset:\n{summary.describe}\n")
+    # ==> mean quality is 5.818378, so we can think the quality over 7 is high quality wine.
+
+    # Sort out the wine's quality > 7,8,9 to evaluate their statistics and compare with the whole dataset.
+    print(f"Statistics for Wine quality 7:\n{stats.group(summary, 'quality', 7)}")
+    print(f"Statistics for Wine quality 8:\n{stats.group(summary, 'quality', 8)}")
+    print(f"Statistics for Wine quality 9:\n{stats.group(summary, 'quality', 9)}")
+    # ==> with the quality is getting higher, the alcohol is higher.
+
+    # Show best wine (quality =9)
+    print(f"Wine quality is 9:\n{wine[wine.quality == 9]}")
+
+    # show correlation matrix
+    pd.set_option('display.max_columns', None)  # to display all the columns in order to show all the correlations.
+    print("correlation matrix is:\n", summary.corr)
+    # ==> correlation between quality and alcohol is 0.444319.
+    # ==> correlation between quality and density is -0.305858.
+    # ==> correlation between density and residual sugar is 0.552517.
+    # ==> correlation between alcohol and density is -0.686745.
+
+
+# Data shared by several charts (computed once per run, see vizkit.dag)
+
+def quality_means(wine):
+    # mean alcohol & density of each quality level, in quality order
+    return wine.groupby('quality')[['alcohol', 'density']].mean()
+
+
+def sort_by_density(wine):
+    return wine[['density', 'alcohol', 'residual sugar']].sort_values('density')
+
+
+# the pH classes of the pie chart and the wine type x quality and quality x pH facets of the small multiples are
+# grouped by a single sort each, and the facet statistics computed by one groupby (see vizkit.facets)
+NODES = [
+    dag.node('quality_means', quality_means),
+    dag.node('sorted_by_density', sort_by_density),
+    dag.node('pH_facets', facets.partition, by='pH_class'),
+    dag.node('type_quality_facets', facets.partition, by=['wine type', 'quality_class']),
+    dag.node('type_quality_means', facets.aggregate, dag.DATA, 'type_quality_facets', columns=['alcohol']),
+    dag.node('quality_pH_facets', facets.partition, by=['quality_class', 'pH_class']),
+    dag.node('quality_pH_means', facets.aggregate, dag.DATA, 'quality_pH_facets', columns=['alcohol']),
+]
+
 
 # Visualize datasets
 
-# newly make a new folder for saving all the plotting charts under this project
-os.makedirs('plots/myproject', exist_ok=True)
-
-# show correlation heap map for easy exploring
-correlation = wine.corr().round(2)
-
-fig, axes = plt.subplots(1, 1, figsize=(10, 10))
-im = axes.imshow(correlation, cmap="coolwarm")
-cbar = axes.figure.colorbar(im, ax=axes)
-cbar.ax.set_ylabel('Correlation', rotation=-90, va="bottom")
-numrows = len(correlation.iloc[0])
-numcolumns = len(correlation.columns)
-axes.set_xticks(np.arange(numrows))
-axes.set_yticks(np.arange(numcolumns))
-axes.set_xticklabels(correlation.columns)
-axes.set_yticklabels(correlation.columns)
-plt.setp(axes.get_xticklabels(), rotation=45, ha='right', rotation_mode='anchor')
-for i in range(numrows):
-    for j in range(numcolumns):
-        text = axes.text(j, i, correlation.iloc[i, j], ha='center', va='center', color='w', size='medium')
-axes.set_title('Heatmap of Correlation of Dimensions', fontdict={'fontsize': 20, 'fontweight': 'bold'})
-fig.tight_layout()
-plt.savefig(f'plots/myproject/wine_correlation_heatmap.png', format='png')
-plt.clf()
-
-# Plotting by some line charts
-# The 1st sub line chart to show alcohol & density to quality
-sorted_by_quality_df = wine.sort_values('quality')
-quality_array = np.unique(sorted_by_quality_df['quality'])
-alcohol_list = []
-density_list = []
-
-for quality in quality_array:
-    alcohol_list.append(sorted_by_quality_df[sorted_by_quality_df['quality'] == quality]['alcohol'].mean())
-    density_list.append(sorted_by_quality_df[sorted_by_quality_df['quality'] == quality]['density'].mean())
-
-fig, ax1 = plt.subplots(3, 1, figsize=(15, 15))
-ax1[0].plot(quality_array, alcohol_list, 'b.-', label="alcohol")
-ax1[0].set_title('Effect of alcohol/density on wine quality', fontdict={'fontsize': 18, 'fontweight': 'bold'})
-ax1[0].set_xlabel('quality', fontdict={'fontsize': 16})
-ax1[0].set_ylabel('alcohol', fontdict={'fontsize': 16})
-ax1[0].set_xticklabels(quality_array)
-ax1[0].legend()
-
-# Density is not at the same scale of alcohol, so adding a y-axis label to secondary y-axis
-ax2 = ax1[0].twinx()  # instantiate a second axes that shares the same x-axis
-ax2.plot(quality_array, density_list, 'r.-', label="density")
-ax2.set_ylabel("density", fontdict={'fontsize': 16})
-ax2.legend()
-
-# Plotting the 2nd sub line chart to show alcohol to density
-sorted_by_density_df = wine.sort_values('density')
-ax1[1].plot(sorted_by_density_df['density'], sorted_by_density_df['alcohol'], 'b.-', label="alcohol")
-ax1[1].set_title('Effect of alcohol on wine density', fontdict={'fontsize': 18, 'fontweight': 'bold'})
-ax1[1].set_xlabel('density', fontdict={'fontsize': 16})
-ax1[1].set_ylabel('alcohol', fontdict={'fontsize': 16})
-ax1[1].legend()
-
-# Plotting the 3rd sub line chart to show residual sugar to density
-ax1[2].plot(sorted_by_density_df['density'], sorted_by_density_df['residual sugar'], 'r.-', label="residual sugar")
-ax1[2].set_title('Effect of residual sugar on wine density', fontdict={'fontsize': 18, 'fontweight': 'bold'})
-ax1[2].set_xlabel('density', fontdict={'fontsize': 16})
-ax1[2].set_ylabel('residual sugar', fontdict={'fontsize': 16})
-ax1[2].legend()
-fig.tight_layout(pad=3.0)
-plt.savefig(f'plots/myproject/alcohol_quality_lineChart.png', format='png')
-plt.clf()
-
-# Plotting histogram chart
-plt.figure(figsize=(12, 8))
-sorted_by_quality_df = wine.sort_values('quality')
-bins = np.unique(sorted_by_quality_df['quality'])
-# display the count over the bar and "+0.4 & +30" is to adjust the coordinates to show text in center of the bar top.
-winehist = plt.hist(wine.quality, bins=bins, color='y', rwidth=0.9)
-for i in range(len(bins)-1):
-    plt.text(winehist[1][i]+0.4, winehist[0][i]+30, str(winehist[0][i]), color='black', size='medium')
-
-plt.xticks(bins)
-plt.ylabel('Number of wine', fontdict={'fontsize': 12})
-plt.xlabel('wine quality', fontdict={'fontsize': 12})
-plt.title('Distribution of wine quality\n', fontdict={'fontsize': 18, 'fontweight': 'bold'})
-plt.savefig(f'plots/myproject/wine_quality_histogram.png', format='png')
-plt.clf()
-
-# Plotting scatter chart
-plt.style.use("bmh")
-fig, axes = plt.subplots(1, 1, figsize=(10, 10))
-axes.scatter(wine['chlorides'], wine['density'], alpha=0.5, label='density', s=20)
-axes.scatter(wine['chlorides'], wine['sulphates'], alpha=0.5, label='sulphates', s=20)
-axes.scatter(wine['chlorides'], wine['volatile acidity'], alpha=0.5, label='volatile acidity', s=20)
-axes.set_xlabel('chlorides')
-axes.set_ylabel('volatile acidity / sulphates / density')
-axes.set_title('Chlorides comparison in wine\n', fontdict={'fontsize': 18, 'fontweight': 'bold'})
-axes.legend()
-plt.savefig(f'plots/myproject/chlorides_comparision_scatter.png', format='png')
-plt.clf()
-
-# Plotting pie chart
-labels = ['pH<3', '3.5>pH>3', "pH>3.5"]
-# google: color picker to get HEX# for customizing colors
-colors = ['#abcdef', '#4287f5', '#6f747a']
-low_pH = wine.loc[wine['pH'] < 3].count()[0]
-medium_pH = wine.loc[(wine['pH'] > 3) & (wine['pH'] < 3.5)].count()[0]
-high_pH = wine.loc[wine['pH'] > 3.5].count()[0]
-
-fig, axes = plt.subplots(1, 1, figsize=(8, 8))
-axes.pie([low_pH, medium_pH, high_pH], labels=labels, colors=colors, autopct='%.2f %%')
-axes.set_title('pH analysis of wine', fontdict={'fontsize': 18, 'fontweight': 'bold'})
-axes.legend()
-plt.savefig(f'plots/myproject/pH_comparison_pieChart.png', format='png')
-plt.clf()
+def plot_correlation_heatmap(wine, heatmap_mode='auto', heatmap_cluster=False):
+    # show correlation heap map for easy exploring
+    # (wide tables get a float32 correlation, optionally reordered by clustering)
+    # (a float32 correlation is rounded in float64, so the labels are the 2-decimal values)
+    correlation = heatmap.correlation(wine, mode=heatmap_mode, cluster=heatmap_cluster).astype(float)
+    return draw_correlation_heatmap(correlation.round(2))
+
+
+def plot_streamed_correlation_heatmap(summary):
+    return draw_correlation_heatmap(summary.statistics.corr.round(2))
+
+
+def draw_correlation_heatmap(correlation):
+    fig, axes = plt.subplots(1, 1, figsize=(10, 10))
+    im = axes.imshow(correlation, cmap="coolwarm")
+    cbar = axes.figure.colorbar(im, ax=axes)
+    cbar.ax.set_ylabel('Correlation', rotation=-90, va="bottom")
+    # only as many tick labels and cell labels as are legible at this size
+    heatmap.label_axes(axes, correlation.columns)
+    plt.setp(axes.get_xticklabels(), rotation=45, ha='right', rotation_mode='anchor')
+    heatmap.annotate(axes, correlation, fmt=heatmap.two_decimals, color='w', size='medium')
+    axes.set_title('Heatmap of Correlation of Dimensions', fontdict={'fontsize': 20, 'fontweight': 'bold'})
+    fig.tight_layout()
+    return fig
+
+
+def plot_line_charts(wine, quality_means, sorted_by_density, decimate=True, decimate_method='minmax'):
+    # Plotting by some line charts
+    # The 1st sub line chart to show alcohol & density to quality
+    quality_array = quality_means.index.to_numpy()
+    alcohol_list = quality_means['alcohol']
+    density_list = quality_means['density']
+
+    fig, ax1 = plt.subplots(3, 1, figsize=(15, 15))
+    ax1[0].plot(quality_array, alcohol_list, 'b.-', label="alcohol")
+    ax1[0].set_title('Effect of alcohol/density on wine quality', fontdict={'fontsize': 18, 'fontweight': 'bold'})
+    ax1[0].set_xlabel('quality', fontdict={'fontsize': 16})
+    ax1[0].set_ylabel('alcohol', fontdict={'fontsize': 16})
+    ax1[0].set_xticklabels(quality_array)
+    ax1[0].legend()
+
+    # Density is not at the same scale of alcohol, so adding a y-axis label to secondary y-axis
+    ax2 = ax1[0].twinx()  # instantiate a second axes that shares the same x-axis
+    ax2.plot(quality_array, density_list, 'r.-', label="density")
+    ax2.set_ylabel("density", fontdict={'fontsize': 16})
+    ax2.legend()
+
+    # Plotting the 2nd sub line chart to show alcohol to density
+    # (the dense density-sorted lines keep only the vertices visible at the figure's resolution)
+    downsample.plot(ax1[1], sorted_by_density['density'], sorted_by_density['alcohol'], 'b.-', label="alcohol",
+                    enabled=decimate, method=decimate_method)
+    ax1[1].set_title('Effect of alcohol on wine density', fontdict={'fontsize': 18, 'fontweight': 'bold'})
+    ax1[1].set_xlabel('density', fontdict={'fontsize': 16})
+    ax1[1].set_ylabel('alcohol', fontdict={'fontsize': 16})
+    ax1[1].legend()
+
+    # Plotting the 3rd sub line chart to show residual sugar to density
+    downsample.plot(ax1[2], sorted_by_density['density'], sorted_by_density['residual sugar'], 'r.-',
+                    label="residual sugar", enabled=decimate, method=decimate_method)
+    ax1[2].set_title('Effect of residual sugar on wine density', fontdict={'fontsize': 18, 'fontweight': 'bold'})
+    ax1[2].set_xlabel('density', fontdict={'fontsize': 16})
+    ax1[2].set_ylabel('residual sugar', fontdict={'fontsize': 16})
+    ax1[2].legend()
+    fig.tight_layout(pad=3.0)
+    return fig
+
+
+def plot_quality_histogram(wine, quality_means):
+    # Plotting histogram chart
+    bins = quality_means.index.to_numpy()
+    return draw_quality_histogram(wine.quality, bins)
+
+
+def plot_streamed_quality_histogram(summary):
+    # the distinct quality values are the bins, their counts the weights
+    quality_counts = summary.value_counts['quality']
+    return draw_quality_histogram(quality_counts.index, quality_counts.index, weights=quality_counts.to_numpy())
+
+
+def draw_quality_histogram(quality, bins, weights=None):
+    fig = plt.figure(figsize=(12, 8))
+    # display the count over the bar and "+0.4 & +30" is to adjust the coordinates to show text in center of the bar
+    # top.
+    winehist = plt.hist(quality, bins=bins, weights=weights, color='y', rwidth=0.9)
+    for i in range(len(bins)-1):
+        plt.text(winehist[1][i]+0.4, winehist[0][i]+30, str(winehist[0][i]), color='black', size='medium')
+
+    plt.xticks(bins)
+    plt.ylabel('Number of wine', fontdict={'fontsize': 12})
+    plt.xlabel('wine quality', fontdict={'fontsize': 12})
+    plt.title('Distribution of wine quality\n', fontdict={'fontsize': 18, 'fontweight': 'bold'})
+    return fig
+
+
+def plot_chlorides_scatter(wine, scatter_mode='auto', scatter_threshold=scatter.DENSITY_POINTS):
+    # Plotting scatter chart
+    # (on large data the three scatters are drawn as one alpha-composited density image)
+    fig, axes = plt.subplots(1, 1, figsize=(10, 10))
+    scatter.scatter(axes, [scatter.layer(wine['chlorides'], wine['density'], 'C0', 'density'),
+                           scatter.layer(wine['chlorides'], wine['sulphates'], 'C1', 'sulphates'),
+                           scatter.layer(wine['chlorides'], wine['volatile acidity'], 'C2', 'volatile acidity')],
+                    mode=scatter_mode, alpha=0.5, s=20, threshold=scatter_threshold)
+    axes.set_xlabel('chlorides')
+    axes.set_ylabel('volatile acidity / sulphates / density')
+    axes.set_title('Chlorides comparison in wine\n', fontdict={'fontsize': 18, 'fontweight': 'bold'})
+    axes.legend()
+    return fig
+
+
+def plot_pH_pie(wine, pH_facets):
+    # Plotting pie chart
+    # (pH < 3, between 3 and 3.5, > 3.5: the row counts of the pH classes, see vizkit.facets.FACETS)
+    labels = pH_facets.levels[0]
+    # google: color picker to get HEX# for customizing colors
+    colors = ['#abcdef', '#4287f5', '#6f747a']
+
+    fig, axes = plt.subplots(1, 1, figsize=(8, 8))
+    axes.pie(facets.sizes(pH_facets), labels=labels, colors=colors, autopct='%.2f %%')
+    axes.set_title('pH analysis of wine', fontdict={'fontsize': 18, 'fontweight': 'bold'})
+    axes.legend()
+    return fig
+
+
+def plot_type_quality_facets(wine, type_quality_facets, type_quality_means):
+    # Small multiples: the alcohol distribution of red and white wine (rows) per quality class (columns)
+    return draw_alcohol_facets(wine, type_quality_facets, type_quality_means, 'Alcohol by wine type and quality',
+                               figsize=(15, 8))
+
+
+def plot_alcohol_facets(wine, quality_pH_facets, quality_pH_means):
+    # Small multiples: the alcohol distribution of each quality class (rows) and pH class (columns)
+    return draw_alcohol_facets(wine, quality_pH_facets, quality_pH_means, 'Alcohol by wine quality and pH',
+                               figsize=(15, 12))
+
+
+def draw_alcohol_facets(wine, split, means, title, figsize):
+    # one histogram per facet on shared bins, with the facet's row count and mean alcohol
+    bins = np.histogram_bin_edges(wine['alcohol'], bins=20)
+
+    def draw(axes, rows, key):
+        count, mean = means.loc[key, 'alcohol']
+        axes.hist(rows['alcohol'], bins=bins, color='y')
+        axes.text(0.97, 0.95, f'n = {count:.0f}\nmean = {mean:.2f}', transform=axes.transAxes, ha='right', va='top')
+
+    fig = facets.small_multiples(split, wine, draw, columns=['alcohol'], figsize=figsize, sharex=True)
+    for axes in fig.axes[-len(split.levels[-1]):]:
+        axes.set_xlabel('alcohol')
+    fig.suptitle(title, fontsize=18, fontweight='bold')
+    fig.tight_layout()
+    return fig
+
+
+def figure_tasks(wine, decimate=True, decimate_method='minmax', scatter_mode='auto',
+                 scatter_threshold=scatter.DENSITY_POINTS, heatmap_mode='auto', heatmap_cluster=False):
+    # all the plotting charts of this project are saved in plots/myproject
+    return [
+        render.task('plots/myproject/wine_correlation_heatmap.png', plot_correlation_heatmap,
+                    heatmap_mode=heatmap_mode, heatmap_cluster=heatmap_cluster),
+        render.task('plots/myproject/alcohol_quality_lineChart.png', plot_line_charts,
+                    uses=[], needs=['quality_means', 'sorted_by_density'], decimate=decimate,
+                    decimate_method=decimate_method),
+        render.task('plots/myproject/wine_quality_histogram.png', plot_quality_histogram, uses=['quality'],
+                    needs=['quality_means']),
+        render.task('plots/myproject/chlorides_comparision_scatter.png', plot_chlorides_scatter, style='bmh',
+                    uses=['chlorides', 'density', 'sulphates', 'volatile acidity'], scatter_mode=scatter_mode,
+                    scatter_threshold=scatter_threshold),
+        render.task('plots/myproject/pH_comparison_pieChart.png', plot_pH_pie, style='bmh', uses=[],
+                    needs=['pH_facets']),
+        render.task('plots/myproject/alcohol_type_quality_facets.png', plot_type_quality_facets, style='bmh',
+                    uses=['alcohol'], needs=['type_quality_facets', 'type_quality_means']),
+        render.task('plots/myproject/alcohol_quality_pH_facets.png', plot_alcohol_facets, style='bmh',
+                    uses=['alcohol'], needs=['quality_pH_facets', 'quality_pH_means']),
+    ]
+
+
+def stream_tasks():
+    # the figures that can be drawn from streamed summaries (--stream)
+    return [
+        render.task('plots/myproject/wine_correlation_heatmap.png', plot_streamed_correlation_heatmap),
+        render.task('plots/myproject/wine_quality_histogram.png', plot_streamed_quality_histogram),
+    ]
+
+
+def main(jobs=1, cache=True, only=None, since_changed=False, stream=False, chunksize=streaming.CHUNK_ROWS,
+         decimate=True, decimate_method='minmax', scatter_mode='auto', scatter_threshold=scatter.DENSITY_POINTS,
+         heatmap_mode='auto', heatmap_cluster=False):
+    if stream:
+        # summarize the csv files chunk by chunk instead of loading them
+        summary = streaming.summarize([datasets.REDWINE_LINK, datasets.WHITEWINE_LINK], chunksize=chunksize, sep=';')
+        print(f"The generate descriptive statistics of whole dataset:\n{summary.statistics.describe}\n")
+        render.render(stream_tasks(), summary, cache=False, only=only)
+        return
+
+    # load and organize the data in a pandas data frame format. (red wine and white wine)
+    # The loader concatenates red and white wine, checks the merge and caches the result locally, so only the first
+    # run downloads the csv files.
+    # (the 'wine type' column added by the loader is kept for the wine type facets)
+    wine = datasets.load_wine()
+    describe_wine(wine)
+    tasks = figure_tasks(wine, decimate, decimate_method, scatter_mode, scatter_threshold, heatmap_mode,
+                         heatmap_cluster)
+    render.render(tasks, wine, jobs=jobs, cache=cache, nodes=NODES, only=only, since_changed=since_changed)
+
+
+if __name__ == '__main__':
+    parser = render.argument_parser(__doc__)
+    for add_arguments in [streaming.add_arguments, downsample.add_arguments, scatter.add_arguments,
+                          heatmap.add_arguments, tracing.add_arguments, writer.add_arguments]:
+        add_arguments(parser)
+    args = vars(parser.parse_args())
+    with tracing.session(args.pop('trace'), args.pop('profile')):
+        with writer.session(args.pop('png_compression'), args.pop('write_queue')):
+            main(**args)
@@ -0,0 +1,7 @@
+"""
+vizkit - shared helpers behind the homework plotting scripts.
+
+The scripts at the top of the repository (myproject.py, Class6homework_basic_plotting_charts.py,
+Class7homework_basic.py and Class7homework_reach_seaborn.py) keep their figure code; this package holds the
+pieces they have in common, starting with how the datasets are loaded.
+"""
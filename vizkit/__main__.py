@@ -0,0 +1,6 @@
+"""python -m vizkit: see vizkit.cli."""
+import sys
+
+from vizkit import cli
+
+sys.exit(cli.main())
@@ -0,0 +1,251 @@
+"""
+Benchmarks of every figure of the four scripts on scaled synthetic datasets.
+
+    python -m vizkit.benchmark run [--scripts myproject ...] [--scales 1,10,100,1000] [--figures PATTERN]
+                                   [--output results.json]
+    python -m vizkit.benchmark compare OLD.json NEW.json [--threshold 1.25]
+
+For every (script, scale) pair a fresh process writes a synthetic copy of the script's dataset ``scale`` times the
+shipped row count, in the same file format, and times:
+
+* load: parsing the synthetic files through vizkit.datasets (cold column cache), then the memory-mapped reload;
+* per figure, drawn the way the scripts draw it (render.draw inside a vizkit.writer session, so pooled figures are
+  reused and the PNG files are encoded in the background): nodes (the shared nodes it is the first to need), draw
+  (render.draw: the figure function and the Agg rendering) and write (waiting for its file to be encoded), with the
+  peak RSS of the process while the figure was drawn.
+
+A figure's peak RSS is how far the resident set grew above its size before the figure, from the high-water mark reset
+before each figure (/proc/self/clear_refs, Linux only; elsewhere it is left out), so a figure's memory regression
+shows even after a bigger figure of the same case. The case's peak RSS is that of its whole process.
+
+The synthetic rows are drawn with replacement from the real dataset, and the continuous columns get a little noise
+(NOISE times their standard deviation); discrete columns (few distinct values, or text) keep the sampled values, so
+schemas, marginals and correlations match the shipped data. Scale 1 is the shipped data itself.
+
+Results are written as JSON (under .cache/benchmarks by default). ``compare`` lists the timings that got slower by
+more than ``threshold`` times (and the figure peaks that grew as much) and exits with status 1 when there are any,
+so it can run after every change.
+"""
+import argparse
+import fnmatch
+import importlib
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from vizkit import dag, datasets, render, render_cache, writer
+from vizkit.cli import SCRIPTS
+
+SCALES = [1, 10, 100, 1000]
+SEED = 0
+NOISE = 0.02
+# Columns with at most this many distinct values are resampled without noise.
+MAX_DISCRETE = 32
+# Timings of every figure.
+MEASURES = ['nodes', 'draw', 'write']
+# Timings shorter than this, and figure peaks smaller than this, are not reported as regressions (too noisy).
+MIN_SECONDS = 0.05
+MIN_MB = 16
+
+
+def synthetic(frame, scale, seed=SEED):
+    """``scale`` times as many rows as ``frame``, resampled, with noise on the continuous columns."""
+    if scale == 1:
+        return frame.copy()
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, len(frame), size=len(frame) * scale)
+    result = frame.iloc[rows].reset_index(drop=True)
+    for col in result.columns:
+        values = frame[col]
+        if not pd.api.types.is_numeric_dtype(values) or values.nunique() <= MAX_DISCRETE:
+            continue
+        noisy = result[col].to_numpy(dtype=float) + rng.normal(0, NOISE * values.std(), size=len(result))
+        # stay inside the observed range (no negative charges, densities, ...)
+        noisy = np.clip(noisy, values.min(), values.max())
+        result[col] = noisy.round().astype(values.dtype) if pd.api.types.is_integer_dtype(values) else noisy
+    return result
+
+
+def write_sources(name, frame, directory):
+    """Write ``frame`` in the file format(s) of the dataset ``name``; return the paths."""
+    if name == 'wine':
+        paths = [os.path.join(directory, 'winequality-red.csv'), os.path.join(directory, 'winequality-white.csv')]
+        for path, kind in zip(paths, ['red', 'white']):
+            part = frame[frame['wine type'] == kind].drop(columns='wine type')
+            part.to_csv(path, sep=';', index=False)
+        return paths
+    if name == 'insurance':
+        path = os.path.join(directory, 'insurance.csv')
+        frame.to_csv(path, index=False)
+        return [path]
+    path = os.path.join(directory, 'housing.data')
+    frame.to_csv(path, sep=' ', header=False, index=False)
+    return [path]
+
+
+def load_sources(name, paths):
+    parse = {'wine': datasets._parse_wine, 'insurance': datasets._parse_insurance,
+             'housing': datasets._parse_housing}[name]
+    return datasets.cached(f'{name}-benchmark', paths, parse)
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def status_mb(field):
+    """A memory field of /proc/self/status (VmRSS, VmHWM) in MB."""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1]) / 1024
+    raise OSError(f'no {field} in /proc/self/status')
+
+
+def reset_peak_rss():
+    """Reset the process's RSS high-water mark and return the current RSS in MB (None where that is not supported)."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return status_mb('VmRSS')
+    except OSError:
+        return None
+
+
+def run_case(script, scale, figures=None, seed=SEED):
+    """Benchmark one script at one scale; meant to run in a fresh process."""
+    import matplotlib
+    matplotlib.use('Agg')
+
+    name = SCRIPTS[script]
+    real = datasets.load(name)
+    module = importlib.import_module(script)
+    with tempfile.TemporaryDirectory(prefix='vizkit-benchmark-') as directory:
+        # a private cache, so nothing computed by earlier runs (columns, KDE curves) is reused
+        datasets.CACHE_DIR = os.path.join(directory, 'cache')
+        paths = write_sources(name, synthetic(real, scale, seed), directory)
+        start = time.perf_counter()
+        data = load_sources(name, paths)
+        load_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        data = load_sources(name, paths)
+        reload_seconds = time.perf_counter() - start
+        if hasattr(module, 'prepare'):
+            data = module.prepare(data)
+
+        graph = dag.Graph(getattr(module, 'NODES', ()))
+        values = {}
+        results = []
+        with writer.session():
+            for task in module.figure_tasks(data):
+                if figures and not fnmatch.fnmatch(task.output, figures):
+                    continue
+                task = task._replace(output=os.path.join(directory, 'figures', task.output))
+                os.makedirs(os.path.dirname(task.output), exist_ok=True)
+                resident = reset_peak_rss()
+                start = time.perf_counter()
+                values.update(graph.compute([name for name in task.needs if name not in values], data))
+                nodes_seconds = time.perf_counter() - start
+                start = time.perf_counter()
+                render.draw(task, data, values)
+                draw_seconds = time.perf_counter() - start
+                start = time.perf_counter()
+                writer.flush()
+                write_seconds = time.perf_counter() - start
+                results.append({'figure': os.path.relpath(task.output, os.path.join(directory, 'figures')),
+                                'nodes': nodes_seconds, 'draw': draw_seconds, 'write': write_seconds,
+                                'bytes': os.path.getsize(task.output),
+                                'peak_rss_mb': None if resident is None else status_mb('VmHWM') - resident})
+    return {'script': script, 'scale': scale, 'rows': len(data), 'load': load_seconds, 'reload': reload_seconds,
+            'figures': results, 'peak_rss_mb': peak_rss_mb()}
+
+
+def run(scripts, scales, figures=None, seed=SEED):
+    """Run every (script, scale) case in its own process and return the results document."""
+    cases = []
+    context = multiprocessing.get_context('spawn')
+    for script in scripts:
+        for scale in scales:
+            with context.Pool(1) as pool:
+                case = pool.apply(run_case, (script, scale, figures, seed))
+            seconds = sum(figure[measure] for figure in case['figures'] for measure in MEASURES)
+            print(f"{script} x{scale}: {case['rows']} rows, load {case['load']:.2f}s, "
+                  f"{len(case['figures'])} figures in {seconds:.2f}s, peak RSS {case['peak_rss_mb']:.0f} MB")
+            cases.append(case)
+    return {'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'seed': seed, 'python': platform.python_version(),
+            'machine': platform.machine(), 'libraries': render_cache.library_versions(), 'cases': cases}
+
+
+def timings(document):
+    """Flatten a results document to {(script, scale, figure or '', measure): seconds or MB}."""
+    flat = {}
+    for case in document['cases']:
+        key = (case['script'], case['scale'])
+        flat[key + ('', 'load')] = case['load']
+        for figure in case['figures']:
+            for measure in MEASURES + ['peak_rss_mb']:
+                if figure.get(measure) is not None:
+                    flat[key + (figure['figure'], measure)] = figure[measure]
+    return flat
+
+
+def compare(old, new, threshold=1.25):
+    """Timings (and figure peaks) of ``new`` more than ``threshold`` times those of ``old``: [(key, old, new)]."""
+    before, after = timings(old), timings(new)
+    return [(key, before[key], after[key]) for key in sorted(after, key=str)
+            if key in before and after[key] > (MIN_MB if key[-1] == 'peak_rss_mb' else MIN_SECONDS)
+            and after[key] > threshold * max(before[key], 1e-9)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m vizkit.benchmark', description='Benchmark the figures.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='benchmark the scripts on synthetic datasets')
+    run_parser.add_argument('--scripts', nargs='+', choices=list(SCRIPTS), default=list(SCRIPTS))
+    run_parser.add_argument('--scales', default=','.join(map(str, SCALES)),
+                            help='comma separated multiples of the shipped row counts')
+    run_parser.add_argument('--figures', default=None, metavar='PATTERN',
+                            help='only the figures whose output path matches this glob pattern')
+    run_parser.add_argument('--seed', type=int, default=SEED)
+    run_parser.add_argument('--output', default=None, help='results file (default: .cache/benchmarks/<time>.json)')
+    compare_parser = commands.add_parser('compare', help='list the timings that got slower')
+    compare_parser.add_argument('old')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=1.25,
+                                help='report timings more than this many times slower')
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        document = run(args.scripts, [int(scale) for scale in args.scales.split(',')], args.figures, args.seed)
+        output = args.output or datasets.cache_path('benchmarks', time.strftime('%Y%m%d-%H%M%S') + '.json')
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(document, f, indent=1)
+        print(f'results written to {output}')
+        return 0
+
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    regressions = compare(old, new, args.threshold)
+    for (script, scale, figure, measure), before, after in regressions:
+        unit = ' MB' if measure == 'peak_rss_mb' else 's'
+        print(f'{script} x{scale} {figure or "-"} {measure}: {before:.3f}{unit} -> {after:.3f}{unit} '
+              f'({after / max(before, 1e-9):.2f}x)')
+    print(f'{len(regressions)} regressions')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""
+Confidence intervals of per-group estimates for bar and line charts.
+
+sns.barplot and sns.lineplot bootstrap every (group, column) pair on their own, so drawing a bar chart per column
+and a line chart of the same columns resamples every group twice per column. intervals() sorts the rows by group
+once, draws the resample indices of a group once and evaluates the estimator for all columns together: for the mean
+the resamples become a (n_boot x rows) matrix of counts and all bootstrap means are one matrix product. The random
+generator is seeded from (seed, group position), so intervals do not change between runs or with the columns asked
+for. Results are memoized per (grouping, column, estimator, method), the MEMO_SIZE most recently used ones. Scripts
+compute the intervals of all their columns once as a shared node (see vizkit.dag) and give it to both chart
+families.
+
+method='se' skips resampling and uses the normal interval mean +/- z * std / sqrt(n) instead.
+
+    result = bootstrap.intervals(wine, 'quality', ['alcohol', 'pH'])
+    result.estimate['alcohol']        # mean alcohol per quality
+    result.low['alcohol'], result.high['alcohol']
+"""
+from collections import OrderedDict, namedtuple
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from vizkit import datasets, tracing
+
+Intervals = namedtuple('Intervals', ['estimate', 'low', 'high'])
+
+N_BOOT = 1000
+CI = 95
+SEED = 0
+METHODS = ['bootstrap', 'se']
+# Upper bound on the resampled values held in memory at once.
+BLOCK_SIZE = 4_000_000
+# How many column intervals stay memoized per process.
+MEMO_SIZE = 64
+
+_memo = OrderedDict()
+
+
+def resample_counts(rng, rows, n_boot):
+    """(n_boot x rows) matrix: how often each row is drawn in each resample."""
+    draws = rng.integers(0, rows, size=(n_boot, rows))
+    flat = (np.arange(n_boot)[:, None] * rows + draws).ravel()
+    return np.bincount(flat, minlength=n_boot * rows).reshape(n_boot, rows)
+
+
+def bootstrap_group(values, rng, estimator, n_boot, ci):
+    """Estimate and percentile interval of every column of one group's (rows x columns) matrix."""
+    rows = len(values)
+    # resamples are processed in blocks so big groups stay within BLOCK_SIZE values at a time
+    parts = []
+    if estimator == 'mean':
+        block = max(1, BLOCK_SIZE // rows)
+        for start in range(0, n_boot, block):
+            parts.append(resample_counts(rng, rows, min(block, n_boot - start)) @ values / rows)
+    else:
+        block = max(1, BLOCK_SIZE // (rows * values.shape[1]))
+        for start in range(0, n_boot, block):
+            draws = rng.integers(0, rows, size=(min(block, n_boot - start), rows))
+            parts.append(getattr(np, estimator)(values[draws], axis=1))
+    estimates = np.concatenate(parts)
+    low, high = np.percentile(estimates, [50 - ci / 2, 50 + ci / 2], axis=0)
+    return getattr(np, estimator)(values, axis=0), low, high
+
+
+def standard_error_group(values, estimator, ci):
+    rows = len(values)
+    estimate = getattr(np, estimator)(values, axis=0)
+    if rows < 2:
+        return estimate, np.full_like(estimate, np.nan), np.full_like(estimate, np.nan)
+    half_width = NormalDist().inv_cdf(0.5 + ci / 200) * values.std(axis=0, ddof=1) / np.sqrt(rows)
+    return estimate, estimate - half_width, estimate + half_width
+
+
+def compute(values, keys, estimator, method, n_boot, ci, seed):
+    """Intervals of the columns of a float matrix without missing values, per key; arrays are groups x columns."""
+    order = np.argsort(keys, kind='stable')
+    sorted_keys, sorted_values = keys[order], values[order]
+    groups, starts = np.unique(sorted_keys, return_index=True)
+    ends = np.append(starts[1:], len(sorted_keys))
+    results = []
+    for position, (start, end) in enumerate(zip(starts, ends)):
+        part = sorted_values[start:end]
+        if method == 'se':
+            results.append(standard_error_group(part, estimator, ci))
+        else:
+            results.append(bootstrap_group(part, np.random.default_rng([seed, position]), estimator, n_boot, ci))
+    return groups, [np.array(parts) for parts in zip(*results)]
+
+
+@tracing.traced('bootstrap')
+def intervals(frame, by, columns, estimator='mean', method='bootstrap', n_boot=N_BOOT, ci=CI, seed=SEED):
+    """
+    Estimate and ``ci``% interval of each of ``columns`` for every value of the column ``by``.
+
+    Returns Intervals of three DataFrames (groups x columns). ``estimator`` is a NumPy reduction name ('mean',
+    'median', ...); ``method`` is 'bootstrap' or 'se'. Rows missing a value are left out of that column only.
+    """
+    if method not in METHODS:
+        raise ValueError(f'unknown interval method {method!r}, expected one of {METHODS}')
+    settings = (datasets.column_digest(frame[by]), estimator, method, n_boot, ci, seed)
+    digests = {col: datasets.column_digest(frame[col]) for col in columns}
+    stored = {}
+    for col in columns:
+        key = settings + (digests[col],)
+        if key in _memo:
+            _memo.move_to_end(key)
+            stored[col] = _memo[key]
+    missing = [col for col in columns if col not in stored]
+    if missing:
+        values = frame[missing].to_numpy(dtype=float)
+        keys = frame[by].to_numpy()
+        complete = ~np.isnan(values).any(axis=0)
+        # the columns without missing values share one pass; the others are done one by one on their rows
+        passes = [(np.flatnonzero(complete), slice(None))]
+        passes += [([i], ~np.isnan(values[:, i])) for i in np.flatnonzero(~complete)]
+        for indices, rows in passes:
+            if len(indices) == 0:
+                continue
+            groups, (estimate, low, high) = compute(values[rows][:, indices], keys[rows], estimator, method,
+                                                    n_boot, ci, seed)
+            for j, i in enumerate(indices):
+                stored[missing[i]] = (groups, estimate[:, j], low[:, j], high[:, j])
+                _memo[settings + (digests[missing[i]],)] = stored[missing[i]]
+        while len(_memo) > MEMO_SIZE:
+            _memo.popitem(last=False)
+    tables = []
+    for part in range(1, 4):
+        tables.append(pd.concat({col: pd.Series(stored[col][part], index=stored[col][0]) for col in columns},
+                                axis=1).rename_axis(by))
+    return Intervals(*tables)
+
+
+def barplot(ax, result, column, color='C0'):
+    """Bars with error bars of one column, laid out like sns.barplot(x=by, y=column)."""
+    estimate = result.estimate[column].dropna()
+    positions = np.arange(len(estimate))
+    ax.bar(positions, estimate.to_numpy(), width=0.8, color=color)
+    low, high = result.low[column][estimate.index], result.high[column][estimate.index]
+    ax.vlines(positions, low.to_numpy(), high.to_numpy(), color='.26', linewidth=2.25)
+    ax.set_xticks(positions)
+    ax.set_xticklabels([str(label) for label in estimate.index])
+    ax.set_xlim(-0.5, len(estimate) - 0.5)
+    ax.set_xlabel(result.estimate.index.name or '')
+    ax.set_ylabel(column)
+    return ax
+
+
+def update_barplot(ax, result, column):
+    """
+    Replace the bars and error bars barplot() drew on ``ax`` with those of ``column``, rescaling the y axis.
+
+    Returns False (and changes nothing) unless ``ax`` holds exactly one barplot() of the same groups.
+    """
+    estimate = result.estimate[column].dropna()
+    labels = [str(label) for label in estimate.index]
+    if (len(ax.containers) != 1 or len(ax.collections) != 1 or len(ax.containers[0]) != len(estimate)
+            or [label.get_text() for label in ax.get_xticklabels()] != labels):
+        return False
+    positions = np.arange(len(estimate))
+    low = result.low[column][estimate.index].to_numpy()
+    high = result.high[column][estimate.index].to_numpy()
+    for bar, height in zip(ax.containers[0], estimate.to_numpy()):
+        bar.set_height(height)
+    ax.collections[0].set_segments([[(x, y0), (x, y1)] for x, y0, y1 in zip(positions, low, high)])
+    ax.set_ylabel(column)
+    # the data limits of a fresh barplot(): the bars, then the error bars
+    ax.relim()
+    ax.update_datalim(np.column_stack([np.concatenate([positions, positions]), np.concatenate([low, high])]))
+    ax.autoscale_view()
+    return True
+
+
+def lineplot(ax, result, column, color='C0'):
+    """Line of the estimates with a shaded interval band, laid out like sns.lineplot(x=by, y=column)."""
+    estimate = result.estimate[column].dropna()
+    ax.plot(estimate.index, estimate.to_numpy(), color=color)
+    ax.fill_between(estimate.index, result.low[column][estimate.index].to_numpy(),
+                    result.high[column][estimate.index].to_numpy(), color=color, alpha=0.2, linewidth=0)
+    ax.set_xlabel(result.estimate.index.name or '')
+    ax.set_ylabel(column)
+    return ax
+
+
+def add_arguments(parser):
+    """--interval option of the scripts drawing bar / line charts with error bars."""
+    parser.add_argument('--interval', choices=METHODS, default='bootstrap',
+                        help="error bars from bootstrap resampling or from the analytic standard error ('se')")
+    return parser
@@ -0,0 +1,147 @@
+"""
+Decision boundaries of a classifier, predicted only where the class changes.
+
+The KNN cells of Class7homework_reach_sklearn.ipynb call knn.predict on every point of a 100 x 100 meshgrid and draw
+it with pcolormesh; a sharp 2000 x 2000 picture that way costs four million predictions, nearly all of them in the
+middle of a region whose class is already known. regions() evaluates a lattice of ``resolution`` points per side as a
+quadtree instead:
+
+* level 0 predicts the corners of a coarse grid of COARSE x COARSE cells;
+* a cell whose four corners have the same class is kept for filling with it; the others are split in four, and the
+  edge midpoints and centres of all the split cells of a level are predicted in one batch (one predict() per level);
+* a kept cell is split after all when a neighbour's refinement finds another class on their shared edge, which
+  catches the regions that reach into it without covering a corner;
+* the refinement stops at single lattice cells, so the boundary is as sharp as with the full grid.
+
+A region that lies entirely inside one cell and touches none of its edge points is still missed. Cells containing
+one of ``points`` are always split for that reason: with the training samples, no region of a nearest-neighbour
+classifier is lost (each 1-NN region holds its sample), and with k > 1 only small islands can be. draw() shows the
+result as one image laid out like pcolormesh(xx, yy, Z) of the same lattice.
+"""
+import numpy as np
+
+# Cells per side of the first level.
+COARSE = 32
+# Lattice points per side of the finest level (rounded up to COARSE * 2 ** k + 1).
+RESOLUTION = 2000
+
+
+def lattice_levels(resolution, coarse):
+    """Number of refinements below the coarse grid for at least ``resolution`` points per side."""
+    return max(0, int(np.ceil(np.log2(max(1, resolution - 1) / coarse))))
+
+
+def cell_edges(rows, cols, step):
+    """Lattice rows and columns of the points on the edges of the cells of size ``step``, one row per cell."""
+    offsets = np.arange(step)
+    edge_rows = np.concatenate([offsets * 0, offsets, offsets * 0 + step, step - offsets])
+    edge_cols = np.concatenate([offsets, offsets * 0 + step, step - offsets, offsets * 0])
+    return rows[:, None] + edge_rows, cols[:, None] + edge_cols
+
+
+def uniform_edges(labels, known, rows, cols, steps):
+    """True for the cells whose known edge points (the corners at least) all have the class of the first corner."""
+    uniform = np.ones(len(rows), dtype=bool)
+    for step in np.unique(steps):
+        cells = np.flatnonzero(steps == step)
+        edge_rows, edge_cols = cell_edges(rows[cells], cols[cells], step)
+        values = labels[edge_rows, edge_cols]
+        uniform[cells] = ((values == values[:, :1]) | ~known[edge_rows, edge_cols]).all(axis=1)
+    return uniform
+
+
+def occupancy(point_rows, point_cols, size):
+    """Summed-area table of the points per lattice cell: cell counts of any block in four lookups."""
+    inside = (point_rows >= 0) & (point_rows < size - 1) & (point_cols >= 0) & (point_cols < size - 1)
+    counts = np.zeros((size, size), dtype=np.int32)
+    np.add.at(counts, (point_rows[inside] + 1, point_cols[inside] + 1), 1)
+    return counts.cumsum(axis=0).cumsum(axis=1)
+
+
+def contains(table, rows, cols, steps):
+    """True for the cells with at least one point inside, from the occupancy() table."""
+    return (table[rows + steps, cols + steps] - table[rows, cols + steps] - table[rows + steps, cols]
+            + table[rows, cols]) > 0
+
+
+def regions(predict, x_range, y_range, resolution=RESOLUTION, coarse=COARSE, points=None):
+    """
+    Classes of a lattice over ``x_range`` x ``y_range``, predicted by quadtree refinement.
+
+    ``predict`` takes an (n, 2) array of x, y and returns n classes (e.g. knn.predict). Returns the lattice x and y
+    values, the (len(y), len(x)) array of classes and the number of points that were predicted.
+    """
+    size = coarse * 2 ** lattice_levels(resolution, coarse) + 1
+    xs = np.linspace(*x_range, size)
+    ys = np.linspace(*y_range, size)
+    known = np.zeros((size, size), dtype=bool)
+    labels = None
+    predicted = 0
+
+    def evaluate(rows, cols):
+        # one predict() for every lattice point of the level not known yet
+        nonlocal labels, predicted
+        flat = np.unique(rows * size + cols)
+        flat = flat[~known.flat[flat]]
+        if not len(flat):
+            return
+        rows, cols = np.divmod(flat, size)
+        values = np.asarray(predict(np.column_stack([xs[cols], ys[rows]])))
+        if labels is None:
+            labels = np.empty((size, size), dtype=values.dtype)
+        labels[rows, cols] = values
+        known[rows, cols] = True
+        predicted += len(flat)
+
+    step = size // coarse
+    grid = np.arange(0, size, step)
+    rows, cols = (index.ravel() for index in np.meshgrid(grid, grid, indexing='ij'))
+    evaluate(rows, cols)
+    # lower-left lattice corner and size of every cell still to resolve, and of the uniform ones
+    rows, cols = (index.ravel() for index in np.meshgrid(grid[:-1], grid[:-1], indexing='ij'))
+    steps = np.full(len(rows), step)
+    done = np.zeros((3, 0), dtype=np.int64)
+    if points is not None:
+        points = np.asarray(points, dtype=float)
+        table = occupancy(np.searchsorted(ys, points[:, 1], side='right') - 1,
+                          np.searchsorted(xs, points[:, 0], side='right') - 1, size)
+    while len(rows):
+        split = steps > 1
+        split[split] = ~uniform_edges(labels, known, rows[split], cols[split], steps[split])
+        if points is not None:
+            split |= contains(table, rows, cols, steps) & (steps > 1)
+        # (cells of a single lattice step have nothing left to fill)
+        finished = ~split & (steps > 1)
+        done = np.concatenate([done, [rows[finished], cols[finished], steps[finished]]], axis=1)
+        rows, cols, steps = rows[split], cols[split], steps[split]
+        half = steps // 2
+        evaluate(np.concatenate([rows + half, rows, rows + half, rows + half, rows + steps]),
+                 np.concatenate([cols, cols + half, cols + half, cols + steps, cols + half]))
+        # a region reaching into a uniform cell across its edge shows up on the edge once the neighbour is refined
+        reopen = ~uniform_edges(labels, known, *done)
+        rows = np.concatenate([rows, rows + half, rows, rows + half, done[0, reopen]])
+        cols = np.concatenate([cols, cols, cols + half, cols + half, done[1, reopen]])
+        steps = np.concatenate([half, half, half, half, done[2, reopen]])
+        done = done[:, ~reopen]
+    for row, col, step in done.T:
+        block = slice(row, row + step + 1), slice(col, col + step + 1)
+        labels[block] = np.where(known[block], labels[block], labels[row, col])
+    return xs, ys, labels, predicted
+
+
+def draw(ax, xs, ys, labels, cmap=None, **kwargs):
+    """The classes of regions() as one image, placed like ax.pcolormesh(xx, yy, labels) (cells centred on points)."""
+    if not np.issubdtype(labels.dtype, np.number):
+        labels = np.unique(labels, return_inverse=True)[1].reshape(labels.shape)
+    dx = (xs[-1] - xs[0]) / (len(xs) - 1) / 2
+    dy = (ys[-1] - ys[0]) / (len(ys) - 1) / 2
+    return ax.imshow(labels, cmap=cmap, origin='lower', interpolation='nearest', aspect='auto',
+                     extent=(xs[0] - dx, xs[-1] + dx, ys[0] - dy, ys[-1] + dy), **kwargs)
+
+
+def plot(ax, predict, x_range, y_range, resolution=RESOLUTION, coarse=COARSE, points=None, cmap=None, **kwargs):
+    """regions() then draw(); prints how many predictions the full lattice would have needed."""
+    xs, ys, labels, predicted = regions(predict, x_range, y_range, resolution, coarse, points)
+    print(f'decision boundary: {predicted} of {labels.size} lattice points predicted '
+          f'({labels.size / predicted:.0f}x fewer)')
+    return draw(ax, xs, ys, labels, cmap=cmap, **kwargs)
@@ -0,0 +1,114 @@
+"""
+Command line entry point for regenerating single figures quickly.
+
+    python -m vizkit render --figure heatmap            # every figure whose output path contains 'heatmap'
+    python -m vizkit render --figure 'plots2/*/wine_*'  # glob patterns match the whole output path
+    python -m vizkit render --script myproject --list   # show the figures without drawing them
+    python -m vizkit serve --port 8000                  # draw them on request over HTTP (see vizkit.server)
+    python -m vizkit notebook myproject.ipynb           # re-execute a notebook from its first changed cell
+
+The Agg backend is selected before pyplot is imported (no interactive backend probe), the datasets are opened
+memory-mapped from the column cache, only the matching figures are drawn, and seaborn is imported only when one of
+them uses it (see vizkit.lazy). The import time of every step is reported at the end.
+"""
+import argparse
+import importlib
+import time
+from contextlib import contextmanager
+
+from vizkit import lazy
+
+# script module -> dataset it plots
+SCRIPTS = {
+    'myproject': 'wine',
+    'Class6homework_basic_plotting_charts': 'insurance',
+    'Class7homework_basic': 'wine',
+    'Class7homework_reach_seaborn': 'housing',
+}
+
+
+class ImportTimer:
+    """Wall time of each import step, in the order they ran."""
+
+    def __init__(self):
+        self.times = []
+
+    @contextmanager
+    def __call__(self, name):
+        start = time.perf_counter()
+        yield
+        self.times.append((name, time.perf_counter() - start))
+
+    def report(self):
+        steps = self.times + [(f'{name} (deferred)', seconds) for name, seconds in lazy.IMPORT_TIMES.items()]
+        total = sum(seconds for name, seconds in steps)
+        print(f'imports {total:.2f}s: ' + ', '.join(f'{name} {seconds:.2f}s' for name, seconds in steps))
+
+
+def figure_tasks(script, patterns, timer):
+    """The script's tasks matching ``patterns``, the data they are drawn from and the script's shared nodes."""
+    from vizkit import datasets, render
+    with timer(script):
+        module = importlib.import_module(script)
+    data = datasets.load(SCRIPTS[script])
+    if hasattr(module, 'prepare'):
+        data = module.prepare(data)
+    tasks = [task for task in module.figure_tasks(data) if render.matches(task.output, patterns)]
+    return tasks, data, getattr(module, 'NODES', ())
+
+
+def main(argv=None):
+    timer = ImportTimer()
+    with timer('matplotlib (Agg)'):
+        import matplotlib
+        matplotlib.use('Agg')
+    with timer('numpy, pandas'):
+        importlib.import_module('pandas')
+    with timer('matplotlib.pyplot'):
+        importlib.import_module('matplotlib.pyplot')
+    with timer('vizkit'):
+        from vizkit import notebooks, render, server, tracing, writer
+
+    parser = argparse.ArgumentParser(prog='python -m vizkit', description='Regenerate figures of the scripts.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    render_parser = commands.add_parser('render', help='draw the figures matching --figure')
+    render_parser.add_argument('--figure', action='append', default=[], metavar='PATTERN',
+                               help='output path substring or glob pattern (repeatable; default: every figure)')
+    render_parser.add_argument('--script', action='append', choices=list(SCRIPTS), default=None,
+                               help='only look at these scripts (repeatable)')
+    render_parser.add_argument('--list', action='store_true', help='print the matching figures, do not draw them')
+    render_parser.add_argument('--jobs', type=int, default=1,
+                               help='number of processes drawing figures in parallel (0 = one per CPU)')
+    render_parser.add_argument('--no-cache', dest='cache', action='store_false',
+                               help='draw every figure even if the render cache has it')
+    render_parser.add_argument('--since-changed', action='store_true',
+                               help='only draw the figures whose inputs or code changed since their last render')
+    tracing.add_arguments(render_parser)
+    writer.add_arguments(render_parser)
+    serve_parser = commands.add_parser('serve', help='serve the figures over HTTP, drawn on demand')
+    serve_parser.add_argument('--script', action='append', choices=list(SCRIPTS), default=None,
+                              help='only serve the figures of these scripts (repeatable)')
+    server.add_arguments(serve_parser)
+    notebooks.add_arguments(commands.add_parser('notebook', help='execute notebooks from their first changed cell'))
+    args = parser.parse_args(argv)
+    if args.command == 'serve':
+        return server.serve(args.script or list(SCRIPTS), args.host, args.port, args.workers, args.cache_mb)
+    if args.command == 'notebook':
+        return 0 if all([notebooks.run(path, args.force) for path in args.notebooks]) else 1
+
+    found = 0
+    with tracing.session(args.trace, args.profile), writer.session(args.png_compression, args.write_queue):
+        for script in args.script or SCRIPTS:
+            tasks, data, nodes = figure_tasks(script, args.figure, timer)
+            found += len(tasks)
+            if args.list:
+                for task in tasks:
+                    print(task.output)
+            elif tasks:
+                render.render(tasks, data, jobs=args.jobs, cache=args.cache, nodes=nodes,
+                              since_changed=args.since_changed)
+    timer.report()
+    if not found:
+        print(f'no figure matches {args.figure}')
+        return 1
+    return 0
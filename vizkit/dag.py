@@ -0,0 +1,115 @@
+"""
+Shared data nodes of the figures of a script.
+
+The frames several figures are drawn from (sorted copies, binned columns, per-group means) are declared once per
+script as nodes of a dependency graph: dataset -> derived frames -> figures.
+
+    NODES = [
+        dag.node('by_density', sort_by_density),               # computed from the dataset ('data')
+        dag.node('quality_means', quality_means, 'by_quality'),  # computed from another node
+    ]
+    render.task('plots/lines.png', plot_lines, needs=['by_density', 'quality_means'])
+    render.render(tasks, wine, nodes=NODES)
+
+A node function takes the values of its inputs (the dataset by default) plus its params; a figure function gets the
+nodes it ``needs`` as keyword arguments named after them. The scheduler computes each node at most once per run and
+only when a figure that is drawn needs it (directly or through another node); nodes whose inputs are ready run
+concurrently on a thread pool while the figures that need no node are already being drawn.
+
+A node's key is a hash of its function's source, its params and the keys of its inputs, the dataset's key the digest
+of its columns, so a figure's render-cache fingerprint covers its nodes without computing them: figures taken from
+the cache (or skipped by ``--since-changed``) never run their nodes.
+"""
+import hashlib
+import json
+import os
+from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from vizkit import datasets, render_cache, tracing
+
+# Name of the dataset itself as an input.
+DATA = 'data'
+# Bump when the node keys change meaning.
+KEY_VERSION = 1
+
+Node = namedtuple('Node', ['name', 'func', 'inputs', 'params'])
+
+
+def node(name, func, *inputs, **params):
+    """Build a Node computed by ``func(*input values, **params)``; the input is the dataset when none is given."""
+    return Node(name, func, inputs or (DATA,), params)
+
+
+class Graph:
+    """The nodes of a script, checked for unknown inputs and cycles."""
+
+    def __init__(self, nodes=()):
+        self.nodes = {}
+        for item in nodes:
+            if item.name in self.nodes or item.name == DATA:
+                raise ValueError(f'duplicate node {item.name!r}')
+            self.nodes[item.name] = item
+        for item in self.nodes.values():
+            for name in item.inputs:
+                if name != DATA and name not in self.nodes:
+                    raise ValueError(f'node {item.name!r} reads unknown node {name!r}')
+        self.order(self.nodes)
+
+    def order(self, names):
+        """``names`` and every node they read, inputs before the nodes reading them."""
+        ordered, visiting = [], set()
+
+        def visit(name):
+            if name == DATA or name in ordered:
+                return
+            if name not in self.nodes:
+                raise ValueError(f'unknown node {name!r}')
+            if name in visiting:
+                raise ValueError(f'node {name!r} depends on itself')
+            visiting.add(name)
+            for input_name in self.nodes[name].inputs:
+                visit(input_name)
+            ordered.append(name)
+
+        for name in names:
+            visit(name)
+        return ordered
+
+    def keys(self, names, data):
+        """Key of each of ``names`` (and of the nodes they read), without computing any of them."""
+        keys = {DATA: datasets.fingerprint(data)} if names else {}
+        for name in self.order(names):
+            item = self.nodes[name]
+            description = {'version': KEY_VERSION, 'name': name, 'code': render_cache.function_source(item.func),
+                           'params': item.params, 'inputs': [keys[input_name] for input_name in item.inputs]}
+            text = json.dumps(description, sort_keys=True, default=repr)
+            keys[name] = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        return keys
+
+    def start(self, names, data, executor):
+        """Submit ``names`` and the nodes they read to ``executor``; return {name: Future}."""
+        futures = {DATA: Future()}
+        futures[DATA].set_result(data)
+        # submitted inputs first: a node waiting for its inputs only waits for nodes already taken off the queue
+        for name in self.order(names):
+            item = self.nodes[name]
+            futures[name] = executor.submit(self._compute, item, [futures[input_name] for input_name in item.inputs])
+        return futures
+
+    @staticmethod
+    def _compute(item, inputs):
+        values = [future.result() for future in inputs]
+        with tracing.phase('node', node=item.name):
+            return item.func(*values, **item.params)
+
+    def compute(self, names, data):
+        """Values of ``names`` (computed concurrently where the graph allows): {name: value}."""
+        with executor(len(self.order(names))) as pool:
+            futures = self.start(names, data, pool)
+            return {name: futures[name].result() for name in names}
+
+
+def executor(nodes):
+    """Thread pool for computing ``nodes`` nodes."""
+    return ThreadPoolExecutor(max(1, min(nodes, os.cpu_count() or 1)), thread_name_prefix='dag')
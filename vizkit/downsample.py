@@ -0,0 +1,110 @@
+"""
+Decimation of dense line charts before they are drawn.
+
+A line with far more vertices than the axes has pixel columns looks the same when only a few vertices per pixel
+column are kept, but matplotlib still transforms, clips and rasterizes every one of them. plot() keeps:
+
+* 'minmax' (default, also known as M4): in every pixel column the first, lowest, highest and last vertex, in their
+  original order, so the envelope and the connections between columns are the same as with all the vertices;
+* 'lttb': Largest-Triangle-Three-Buckets, one vertex per bucket chosen to keep the triangle area with its neighbours
+  largest, for smoother downsampled lines with a fixed number of vertices.
+
+Lines with fewer than MIN_POINTS_PER_PIXEL vertices per pixel column are drawn unchanged, and the reduction is
+printed for the lines that were decimated.
+"""
+import numpy as np
+
+METHODS = ['minmax', 'lttb']
+# Lines with fewer vertices than this per pixel column of the axes are drawn as they are.
+MIN_POINTS_PER_PIXEL = 4
+
+
+def axes_pixels(ax, dpi=None):
+    """Width of ``ax`` in pixels at ``dpi`` (the figure's dpi by default)."""
+    fig = ax.figure
+    return max(1, int(ax.get_position().width * fig.get_size_inches()[0] * (dpi or fig.dpi)))
+
+
+def pixel_buckets(x, n_buckets):
+    """Bucket (pixel column) of every x value; x must be sorted, or be the row positions."""
+    low, high = x[0], x[-1]
+    if high <= low:
+        return np.zeros(len(x), dtype=np.int64)
+    return np.minimum(((x - low) / (high - low) * n_buckets).astype(np.int64), n_buckets - 1)
+
+
+def segment_extreme(y, buckets, starts, reduce):
+    """Index of the first vertex of every bucket whose y equals the bucket's reduce (minimum / maximum)."""
+    extreme = np.repeat(reduce.reduceat(y, starts), np.diff(np.append(starts, len(y))))
+    hits = np.flatnonzero(y == extreme)
+    return hits[np.unique(buckets[hits], return_index=True)[1]]
+
+
+def minmax_indices(x, y, n_buckets):
+    """Indices of the first, lowest, highest and last vertex of every pixel column, in order."""
+    buckets = pixel_buckets(x, n_buckets)
+    starts = np.flatnonzero(np.diff(buckets, prepend=-1))
+    ends = np.append(starts[1:], len(x))
+    return np.unique(np.concatenate([starts, ends - 1, segment_extreme(y, buckets, starts, np.minimum),
+                                     segment_extreme(y, buckets, starts, np.maximum)]))
+
+
+def lttb_indices(x, y, n_out):
+    """Indices chosen by Largest-Triangle-Three-Buckets (first and last vertex always kept)."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    chosen = np.empty(n_out, dtype=np.int64)
+    chosen[0], chosen[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # the next bucket is represented by its average point (the last vertex for the final bucket)
+        following = slice(end, edges[bucket + 2]) if bucket + 2 < len(edges) else slice(n - 1, n)
+        next_x, next_y = x[following].mean(), y[following].mean()
+        area = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        chosen[bucket + 1] = previous
+    return chosen
+
+
+def decimate(x, y, n_pixels, method='minmax'):
+    """Return the indices of the vertices to keep for a line ``n_pixels`` wide."""
+    if method not in METHODS:
+        raise ValueError(f'unknown decimation method {method!r}, expected one of {METHODS}')
+    if len(x) < MIN_POINTS_PER_PIXEL * n_pixels:
+        return np.arange(len(x))
+    if method == 'lttb':
+        return lttb_indices(x, y, 2 * n_pixels)
+    return minmax_indices(x, y, n_pixels)
+
+
+def plot(ax, x, y, *args, method='minmax', enabled=True, dpi=None, **kwargs):
+    """
+    ax.plot(x, y, *args, **kwargs) with the line decimated to the width of ``ax`` first.
+
+    ``x`` must be sorted (or None to plot against the row positions, like ax.plot(y)); rows with a missing x or y
+    are dropped. ``enabled=False`` draws every vertex.
+    """
+    y = np.asarray(y, dtype=float)
+    positions = np.arange(len(y)) if x is None else np.asarray(x, dtype=float)
+    keep = ~(np.isnan(positions) | np.isnan(y))
+    if not enabled or keep.all() and len(y) < MIN_POINTS_PER_PIXEL * axes_pixels(ax, dpi):
+        return ax.plot(*([y] if x is None else [x, y]), *args, **kwargs)
+    positions, y = positions[keep], y[keep]
+    indices = decimate(positions, y, axes_pixels(ax, dpi), method)
+    if len(indices) < len(y):
+        print(f"{kwargs.get('label', 'line')}: drew {len(indices)} of {len(y)} vertices "
+              f"({len(y) / len(indices):.1f}x fewer, {method})")
+    return ax.plot(positions[indices], y[indices], *args, **kwargs)
+
+
+def add_arguments(parser):
+    """--no-decimate / --decimate-method options of the scripts drawing dense line charts."""
+    parser.add_argument('--no-decimate', dest='decimate', action='store_false',
+                        help='draw every vertex of the dense line charts')
+    parser.add_argument('--decimate-method', choices=METHODS, default='minmax',
+                        help='vertices kept per pixel column: first/min/max/last (minmax) or LTTB')
+    return parser
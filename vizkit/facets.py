@@ -0,0 +1,122 @@
+"""
+Facets of a dataset: the rows split once into groups, for grouped figures and small multiples.
+
+The grouped wine figures used to select each group with its own boolean mask (bad / medium / good wine, one
+wine.loc[...] per pH slice of the pie chart), a scan of the whole frame per group, so every added dimension
+multiplied the scans. partition() computes the facet code of every row for each dimension (wine type, a quality
+class, a pH bin...), combines them into one code and sorts the row positions by it once (a stable sort, so the rows
+of a facet keep their order); every facet is then a contiguous slice of that order:
+
+    split = facets.partition(wine, ['quality_class', 'pH_class'])
+    facets.sizes(split)                          # rows per facet, in facets.keys(split) order
+    for key, rows in facets.groups(split, wine, ['alcohol']):
+        ...                                      # key == ('Bad', 'pH<3'), rows the frame of that facet
+    means = facets.aggregate(wine, split, ['alcohol'])  # one groupby for every facet and statistic
+
+A dimension is a column of FACETS (open intervals of a numeric column, the masks the scripts used: quality 5 and 7,
+pH 3 and 3.5 belong to no class), a binned column of vizkit.schema.BINS, or any column of the frame (one facet per
+value, e.g. 'wine type'). Rows outside every facet of a dimension are left out. grid() lays out the facets as small
+multiples: the first dimension in rows, the second in columns.
+"""
+import itertools
+from collections import namedtuple
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from vizkit import schema
+
+Partition = namedtuple('Partition', ['by', 'levels', 'order', 'bounds'])
+
+# facet column -> (source column, open intervals (low, high), labels)
+FACETS = {
+    # < 5 -> bad, 6 -> medium, > 7 -> good
+    'quality_class': ('quality', [(-np.inf, 5), (5, 7), (7, np.inf)], ['Bad', 'Medium', 'Good']),
+    'pH_class': ('pH', [(-np.inf, 3), (3, 3.5), (3.5, np.inf)], ['pH<3', '3.5>pH>3', 'pH>3.5']),
+}
+
+
+def codes(frame, name):
+    """(facet index of every row, -1 for rows in none of them; facet labels) of the dimension ``name``."""
+    if name in FACETS:
+        source, intervals, labels = FACETS[name]
+        values = frame[source].to_numpy(dtype=float)
+        lows, highs = np.array(intervals, dtype=float).T
+        index = np.searchsorted(lows, values, side='left') - 1
+        # (NaN sorts after every low and is below no high)
+        inside = (index >= 0) & (values < highs[index.clip(0)])
+        return np.where(inside, index, -1), list(labels)
+    column = schema.binned(frame, name) if name in schema.BINS else frame[name].astype('category')
+    return column.cat.codes.to_numpy().astype(np.int64), list(column.cat.categories)
+
+
+def partition(frame, by):
+    """The rows of ``frame`` grouped by the dimensions ``by`` (a name or a list of names) with a single sort."""
+    by = [by] if isinstance(by, str) else list(by)
+    combined = np.zeros(len(frame), dtype=np.int64)
+    outside = np.zeros(len(frame), dtype=bool)
+    levels = []
+    for name in by:
+        index, labels = codes(frame, name)
+        combined = combined * len(labels) + index
+        outside |= index < 0
+        levels.append(labels)
+    count = int(np.prod([len(labels) for labels in levels]))
+    combined[outside] = count
+    order = np.argsort(combined, kind='stable')
+    bounds = np.concatenate([[0], np.bincount(combined, minlength=count + 1)[:count].cumsum()])
+    return Partition(by, levels, order[:bounds[-1]], bounds)
+
+
+def keys(split):
+    """The facets of ``split`` as label tuples, in the order of its slices."""
+    return list(itertools.product(*split.levels))
+
+
+def sizes(split):
+    """Rows of every facet of ``split``, in keys() order."""
+    return np.diff(split.bounds)
+
+
+def index(split):
+    """keys() as a pandas index (a MultiIndex for several dimensions)."""
+    if len(split.by) == 1:
+        return pd.Index(split.levels[0], name=split.by[0])
+    return pd.MultiIndex.from_product(split.levels, names=split.by)
+
+
+def groups(split, frame, columns=None):
+    """(key, rows of ``frame`` in that facet, only ``columns`` if given) for every facet of ``split``."""
+    frame = frame if columns is None else frame[columns]
+    for key, start, stop in zip(keys(split), split.bounds[:-1], split.bounds[1:]):
+        yield key, frame.iloc[split.order[start:stop]]
+
+
+def aggregate(frame, split, columns, funcs=('count', 'mean')):
+    """``funcs`` of ``columns`` for every facet of ``split`` from one groupby (NaN rows for empty facets)."""
+    facet = np.repeat(np.arange(len(split.bounds) - 1), sizes(split))
+    table = frame[columns].iloc[split.order].groupby(facet, sort=True).agg(list(funcs))
+    table = table.reindex(np.arange(len(split.bounds) - 1))
+    table.index = index(split)
+    return table
+
+
+def grid(split, figsize=None, **kwargs):
+    """Figure with one axes per facet of ``split`` (at most two dimensions): (fig, {key: axes})."""
+    if len(split.by) > 2:
+        raise ValueError(f'a grid has two dimensions, not {len(split.by)} ({split.by})')
+    shape = [len(labels) for labels in split.levels] + [1] * (2 - len(split.by))
+    if len(split.by) == 1:
+        shape.reverse()
+    fig, axes = plt.subplots(*shape, figsize=figsize, squeeze=False, **kwargs)
+    return fig, dict(zip(keys(split), axes.ravel()))
+
+
+def small_multiples(split, frame, draw, columns=None, figsize=None, **kwargs):
+    """grid() with ``draw(ax, rows, key)`` called for the rows of every facet; each axes is titled by its key."""
+    fig, axes = grid(split, figsize, **kwargs)
+    for key, rows in groups(split, frame, columns):
+        draw(axes[key], rows, key)
+        axes[key].set_title(', '.join(str(label) for label in key))
+    return fig
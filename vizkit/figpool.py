@@ -0,0 +1,67 @@
+"""
+Figure reuse for the per-column figure loops.
+
+The per-column figures of a script (one distribution plot, bar chart or violin plot per column) are identical up to
+their data, yet each of them builds a new Figure, canvas and Axes with their tick machinery and is closed after
+savefig. A figure function that starts with
+
+    fig = figpool.figure('distribution')
+
+gets the figure the same function used for the previous column, cleared (each Axes is reset with cla() instead of
+being rebuilt), instead of a new one. Figures are pooled per key, size and dpi, so every pooled figure is only reused
+by the function (and style) that created it. Keeping the canvas also keeps its Agg renderer while the size does not
+change, and matplotlib's text layout cache is keyed on the renderer, so tick labels and titles measured for one
+column are not measured again for the next.
+
+``figpool.figure(key, clear=False)`` leaves the previous drawing in place, for functions that only replace the data
+of their artists (see vizkit.bootstrap.update_barplot). render.draw calls release() instead of closing the figure:
+pooled figures are detached from pyplot (plt.gcf() never returns an idle pooled figure) and kept. Set
+VIZKIT_FIGURE_POOL=0 to build a new figure every time.
+"""
+import os
+
+import matplotlib
+import matplotlib.pyplot as plt
+from matplotlib._pylab_helpers import Gcf
+
+ENABLED = os.environ.get('VIZKIT_FIGURE_POOL', '1') != '0'
+
+# (key, size, dpi) -> Figure
+_figures = {}
+
+
+def figure(key, figsize=None, clear=True):
+    """The pooled figure of ``key``, made current for pyplot; a new figure the first time."""
+    figsize = tuple(figsize or matplotlib.rcParams['figure.figsize'])
+    if not ENABLED:
+        return plt.figure(figsize=figsize)
+    pool_key = (key, figsize, matplotlib.rcParams['figure.dpi'])
+    fig = _figures.get(pool_key)
+    if fig is None or fig.canvas.manager is None:
+        fig = _figures[pool_key] = plt.figure(figsize=figsize)
+        return fig
+    Gcf.set_active(fig.canvas.manager)
+    if clear:
+        for ax in fig.axes:
+            ax.cla()
+    return fig
+
+
+def pooled(fig):
+    """True when ``fig`` will be drawn into again after it is released."""
+    return any(fig is candidate for candidate in _figures.values())
+
+
+def release(fig):
+    """Close ``fig``, or detach it from pyplot and keep it when it belongs to the pool."""
+    if pooled(fig) and fig.canvas.manager is not None:
+        Gcf.figs.pop(fig.canvas.manager.num, None)
+    else:
+        plt.close(fig)
+
+
+def clear():
+    """Close every pooled figure."""
+    for fig in _figures.values():
+        plt.close(fig)
+    _figures.clear()
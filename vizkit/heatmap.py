@@ -0,0 +1,200 @@
+"""
+Correlation heatmaps that stay fast on wide tables.
+
+The heatmaps of the scripts draw one Text artist per cell (a Python loop over correlation.iloc[i, j], or
+sns.heatmap(annot=True)) and one tick label per column; with a few hundred columns that is a hundred thousand
+artists to lay out, most of them too small to read. This module provides:
+
+* correlation(): the correlation matrix, from the shared summary statistics on narrow tables and, on wide ones, in
+  float32 with one matrix product over the standardized columns (no describe() or quantiles); with ``cluster`` the
+  rows and columns are reordered by average-linkage hierarchical clustering on 1 - |r| so correlated blocks sit
+  together;
+* draw(): the matrix as a single image with a colour bar ('image' mode);
+* annotate() / label_axes(): the cell labels and tick labels that are legible at the output size. Cells too small
+  for their label are grouped into b x b blocks just large enough for one, each labelled with the block's mean;
+  tick labels are thinned to every k-th column.
+
+'auto' (default) keeps the scripts' own drawing ('cells') up to IMAGE_COLUMNS columns and switches to 'image' above.
+"""
+import warnings
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from matplotlib.font_manager import FontProperties
+
+from vizkit import datasets, stats, tracing
+
+MODES = ['auto', 'cells', 'image']
+# Above this many columns 'auto' draws the float32 correlation as one image.
+IMAGE_COLUMNS = 40
+# Width of a digit relative to the font size, and line height, used to decide what fits in a cell.
+CHAR_WIDTH = 0.6
+LINE_HEIGHT = 1.2
+MEMO_SIZE = 8
+
+_memo = OrderedDict()
+
+
+def choose_mode(mode, columns, threshold=IMAGE_COLUMNS):
+    """'cells' or 'image' for a matrix of ``columns`` columns."""
+    if mode not in MODES:
+        raise ValueError(f'unknown heatmap mode {mode!r}, expected one of {MODES}')
+    if mode == 'auto':
+        return 'image' if columns > threshold else 'cells'
+    return mode
+
+
+def float32_correlation(frame, columns):
+    """Pearson correlation of ``columns`` computed in float32 (pairwise-complete pandas corr() with missing values)."""
+    values = np.empty((len(frame), len(columns)), dtype=np.float32)
+    for index, col in enumerate(columns):
+        values[:, index] = frame[col].to_numpy(dtype=np.float32)
+    if np.isnan(values).any():
+        return frame[columns].corr().astype(np.float32)
+    values -= values.mean(axis=0, dtype=np.float64).astype(np.float32)
+    norms = np.sqrt(np.einsum('ij,ij->j', values, values))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        values /= norms
+    corr = np.clip(values.T @ values, -1, 1)
+    np.fill_diagonal(corr, np.where(norms > 0, 1, np.nan))
+    return pd.DataFrame(corr, index=columns, columns=columns)
+
+
+def cluster_order(corr):
+    """Leaf order of the average-linkage clustering of the columns, with 1 - |r| as distance."""
+    distance = 1 - np.abs(np.nan_to_num(np.asarray(corr, dtype=float)))
+    np.fill_diagonal(distance, np.inf)
+    sizes = np.ones(len(distance))
+    members = [[index] for index in range(len(distance))]
+    last = 0
+    for _ in range(len(distance) - 1):
+        i, j = np.unravel_index(np.argmin(distance), distance.shape)
+        # the merged cluster's distance to every other one is the size-weighted mean of its parts'
+        merged = (distance[i] * sizes[i] + distance[j] * sizes[j]) / (sizes[i] + sizes[j])
+        distance[i, :] = merged
+        distance[:, i] = merged
+        distance[i, i] = np.inf
+        distance[j, :] = np.inf
+        distance[:, j] = np.inf
+        sizes[i] += sizes[j]
+        members[i] += members[j]
+        last = i
+    return members[last]
+
+
+@tracing.traced('correlation')
+def correlation(frame, columns=None, mode='auto', threshold=IMAGE_COLUMNS, cluster=False):
+    """Correlation matrix of ``columns`` (the numeric columns by default) for a heatmap drawn in ``mode``."""
+    columns = list(frame.select_dtypes('number').columns if columns is None else columns)
+    if choose_mode(mode, len(columns), threshold) == 'cells':
+        corr = stats.statistics(frame, columns).corr
+    else:
+        key = (tuple(columns), datasets.fingerprint(frame, columns))
+        if key not in _memo:
+            _memo[key] = float32_correlation(frame, columns)
+            if len(_memo) > MEMO_SIZE:
+                _memo.popitem(last=False)
+        corr = _memo[key]
+    if cluster:
+        order = cluster_order(corr)
+        corr = corr.iloc[order, order]
+    return corr
+
+
+def cell_points(ax, rows, columns):
+    """Width and height of one cell of a rows x columns matrix filling ``ax``, in points."""
+    box = ax.get_window_extent()
+    scale = 72 / ax.figure.dpi
+    return box.width * scale / columns, box.height * scale / rows
+
+
+def block_size(ax, rows, columns, text, size):
+    """Smallest b such that a b x b block of cells holds ``text`` at font ``size``."""
+    width, height = cell_points(ax, rows, columns)
+    points = FontProperties(size=size).get_size_in_points()
+    needed = max(CHAR_WIDTH * points * len(text) / width, LINE_HEIGHT * points / height, 1)
+    return int(np.ceil(needed))
+
+
+def two_decimals(value):
+    return f'{value:.2f}'
+
+
+def annotate(ax, corr, fmt=two_decimals, color_of=None, size='medium', **kwargs):
+    """
+    Label the cells of ``corr`` (drawn with cell (i, j) centered on x=j, y=i) with ``fmt(value)`` (2 decimals by
+    default: the values are converted to float64, and str() of a float32 value shows its binary expansion).
+
+    Where the labels do not fit, b x b blocks of cells get one label with their mean (rounded to 2 decimals)
+    instead. ``color_of`` optionally maps an array of values to their text colours; returns the number of labels.
+    """
+    values = np.asarray(corr, dtype=float)
+    rows, columns = values.shape
+    # the widest label decides what fits (a sample of them on big matrices)
+    sample = values.ravel()[::max(1, values.size // 1000)]
+    widest = max((fmt(value) for value in sample if not np.isnan(value)), key=len, default='')
+    block = block_size(ax, rows, columns, widest, size)
+    if block >= max(rows, columns):
+        return 0
+    if block > 1:
+        padded = np.full((-(-rows // block) * block, -(-columns // block) * block), np.nan)
+        padded[:rows, :columns] = values
+        with warnings.catch_warnings():
+            # blocks of missing values only
+            warnings.simplefilter('ignore', RuntimeWarning)
+            values = np.nanmean(padded.reshape(len(padded) // block, block, -1, block), axis=(1, 3))
+        values = np.round(values, 2)
+    colors = None if color_of is None else color_of(values)
+    labels = 0
+    for i in range(values.shape[0]):
+        for j in range(values.shape[1]):
+            if np.isnan(values[i, j]):
+                continue
+            color = kwargs.get('color') if colors is None else colors[i, j]
+            ax.text(j * block + (block - 1) / 2, i * block + (block - 1) / 2, fmt(values[i, j]),
+                    **dict(kwargs, color=color, size=size, ha='center', va='center'))
+            labels += 1
+    return labels
+
+
+def label_axes(ax, labels, size='medium', **kwargs):
+    """Tick labels of a square matrix on both axes, thinned to every k-th one when they would overlap."""
+    labels = list(labels)
+    width, height = cell_points(ax, len(labels), len(labels))
+    points = FontProperties(size=size).get_size_in_points()
+    step = int(np.ceil(max(LINE_HEIGHT * points / min(width, height), 1)))
+    ticks = np.arange(0, len(labels), step)
+    ax.set_xticks(ticks)
+    ax.set_yticks(ticks)
+    ax.set_xticklabels([labels[tick] for tick in ticks], size=size, **kwargs)
+    ax.set_yticklabels([labels[tick] for tick in ticks], size=size, **kwargs)
+
+
+def text_colors(image, values):
+    """Dark or white text for ``values`` drawn on ``image``, whichever contrasts with their colour."""
+    rgba = image.cmap(image.norm(values))
+    luminance = rgba[..., :3] @ [0.2126, 0.7152, 0.0722]
+    return np.where(luminance > 0.408, '.15', 'w')
+
+
+def draw(ax, corr, cmap=None, vmin=None, vmax=None, rotation=0, annot=True, fmt=two_decimals):
+    """Draw ``corr`` as one image with a colour bar, legible annotations and tick labels; return the image."""
+    image = ax.imshow(np.asarray(corr, dtype=float), cmap=cmap, vmin=vmin, vmax=vmax, interpolation='nearest',
+                      aspect='auto')
+    ax.figure.colorbar(image, ax=ax)
+    ax.grid(False)
+    label_axes(ax, corr.columns, rotation=rotation)
+    if annot:
+        annotate(ax, corr, fmt=fmt, color_of=lambda values: text_colors(image, values))
+    return image
+
+
+def add_arguments(parser):
+    """--heatmap-mode / --heatmap-cluster options of the scripts drawing correlation heatmaps."""
+    parser.add_argument('--heatmap-mode', choices=MODES, default='auto',
+                        help=f"'image' draws the float32 correlation as one image with only the legible labels, "
+                             f"'cells' the classic heatmap; 'auto' switches above {IMAGE_COLUMNS} columns")
+    parser.add_argument('--heatmap-cluster', action='store_true',
+                        help='order the heatmap rows and columns by hierarchical clustering')
+    return parser
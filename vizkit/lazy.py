@@ -0,0 +1,34 @@
+"""
+Deferred imports of heavy optional modules.
+
+    sns = lazy.module('seaborn')
+
+binds a placeholder that imports seaborn the first time one of its attributes is used, so a run that only draws
+figures without seaborn never pays for importing it. How long each deferred import took is kept in IMPORT_TIMES
+(the render CLI reports it).
+"""
+import importlib
+import sys
+import time
+import types
+
+# module name -> seconds the deferred import took
+IMPORT_TIMES = {}
+
+
+class LazyModule(types.ModuleType):
+    """Placeholder of a module that is imported on first attribute access."""
+
+    def __getattr__(self, attribute):
+        name = self.__name__
+        start = time.perf_counter()
+        real = importlib.import_module(name)
+        IMPORT_TIMES.setdefault(name, time.perf_counter() - start)
+        # later lookups find the attributes on the placeholder itself
+        self.__dict__.update(real.__dict__)
+        return getattr(real, attribute)
+
+
+def module(name):
+    """Return a placeholder for the module ``name`` (the module itself when it is already imported)."""
+    return sys.modules.get(name) or LazyModule(name)
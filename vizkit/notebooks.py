@@ -0,0 +1,422 @@
+"""
+Headless, incremental execution of the notebooks.
+
+    python -m vizkit notebook myproject.ipynb Class7homework_reach_sklearn.ipynb
+
+runs the code cells in an in-process IPython shell with the Agg backend and writes their outputs back into the
+notebook the way Jupyter stores them: streams, rich results, errors, and every figure still open when plt.show() is
+called or the cell ends as a PNG (closed afterwards, like the inline backend).
+
+Each code cell gets a key, a hash of its source and of the content of the data files it names (string literals ending
+in a DATA_EXTENSIONS suffix: URLs, checksummed in the download cache, and existing local files) chained to the key of
+the cell before it (the first one starts from the library versions), stored in the cell's metadata. A changed data
+file therefore re-executes the notebook from the first cell naming it. A cell whose key did not change keeps its stored outputs; the
+run starts at the first cell whose key did, so editing a cell re-executes it and everything below it and nothing
+above it. After every cell the user namespace (and the matplotlib rcParams, which plt.style.use changes) is pickled
+under .cache/notebooks/<notebook>/<key>.pkl, each value once under the digest of its pickle, and the run resumes
+from the snapshot of the cell before the first changed one. Imported modules are imported again; values that cannot
+be pickled are left out, and so are values holding a figure (the figures of a cell are closed when it ends). When a
+cell that still has to run reads one of the left-out names before assigning it, the run starts from an earlier
+snapshot that has it (at worst from the top). ``--force`` runs every cell.
+
+CSV files read from URLs with pd.read_csv go through the dataset download cache (vizkit.datasets.fetch), so the
+notebooks only download them once. A cell raising an exception stops the run; it and the cells below it lose their
+keys, so the next run executes them again.
+"""
+import ast
+import base64
+import builtins
+import hashlib
+import importlib
+import io
+import json
+import os
+import pickle
+import sys
+import types
+from contextlib import contextmanager
+
+import matplotlib
+from matplotlib.figure import Figure
+
+from vizkit import datasets, render_cache
+
+# Bump when the keys or the snapshots change meaning.
+VERSION = 2
+# Suffixes of the data files whose content is part of the keys of the cells naming them.
+DATA_EXTENSIONS = ('.csv', '.data', '.txt', '.json', '.xls', '.xlsx', '.npy', '.npz')
+# Resolution of the figures stored in the notebooks (the inline backend's).
+FIGURE_DPI = 72
+
+
+def load(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save(notebook, path):
+    # the layout Jupyter writes, so saving an unchanged notebook changes nothing
+    with open(path + '.partial', 'w', encoding='utf-8') as f:
+        f.write(json.dumps(notebook, indent=1, sort_keys=True, ensure_ascii=False) + '\n')
+    os.replace(path + '.partial', path)
+
+
+def lines(text):
+    """Text in the list-of-lines form of the notebook format."""
+    return text.splitlines(keepends=True)
+
+
+def data_files(source, directory):
+    """The URLs and existing files (relative to ``directory``) with a data file suffix named in a cell source."""
+    from IPython.core.inputtransformer2 import TransformerManager
+    try:
+        tree = ast.parse(TransformerManager().transform_cell(source))
+    except SyntaxError:
+        return []
+    files = set()
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Constant) and isinstance(node.value, str)
+                and node.value.lower().endswith(DATA_EXTENSIONS)):
+            continue
+        if datasets.is_url(node.value) or os.path.isfile(os.path.join(directory, node.value)):
+            files.add(node.value)
+    return sorted(files)
+
+
+def data_digest(files, directory):
+    """Digest of the names and contents of ``files`` (URLs read from the download cache)."""
+    digest = hashlib.sha256()
+    for name in files:
+        try:
+            checksum = datasets.file_checksum(datasets.fetch(name) if datasets.is_url(name)
+                                              else os.path.join(directory, name))
+        except OSError:
+            # not downloadable now: the cell runs again once it is
+            checksum = 'unavailable'
+        digest.update(f'{name}\0{checksum}\0'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def cell_keys(sources, directory='.'):
+    """Chained key of every code cell source and the data files it names."""
+    key = hashlib.sha256(json.dumps([VERSION, render_cache.library_versions()], sort_keys=True).encode()).hexdigest()
+    keys = []
+    for source in sources:
+        files = data_files(source, directory)
+        data = data_digest(files, directory) if files else ''
+        key = hashlib.sha256(f'{key}\0{source}\0{data}'.encode('utf-8')).hexdigest()
+        keys.append(key)
+    return keys
+
+
+def names_read(shell, sources):
+    """
+    The names the cells read before assigning them (in source order), or None when one of them cannot be parsed.
+
+    These are the values the cells take from the namespace they start in.
+    """
+    read, assigned = set(), set()
+    for source in sources:
+        try:
+            tree = ast.parse(shell.transform_cell(source))
+        except SyntaxError:
+            return None
+        augmented = {id(node.target) for node in ast.walk(tree) if isinstance(node, ast.AugAssign)}
+        names = sorted((node for node in ast.walk(tree) if isinstance(node, ast.Name)),
+                       key=lambda node: (node.lineno, node.col_offset))
+        for node in names:
+            if isinstance(node.ctx, ast.Load) or id(node) in augmented:
+                if node.id not in assigned:
+                    read.add(node.id)
+            else:
+                assigned.add(node.id)
+    return read
+
+
+def snapshot_dir(notebook_path):
+    name = os.path.splitext(os.path.basename(notebook_path))[0]
+    return os.path.abspath(datasets.cache_path('notebooks', name))
+
+
+def user_names(shell):
+    hidden = set(shell.user_ns_hidden) | set(dir(builtins))
+    return [name for name in shell.user_ns if not name.startswith('_') and name not in hidden]
+
+
+class SnapshotPickler(pickle.Pickler):
+    """Refuses values holding a matplotlib Figure: the figures of a cell are closed when it ends."""
+
+    def persistent_id(self, obj):
+        if isinstance(obj, Figure):
+            raise pickle.PicklingError('figure')
+        return None
+
+
+def dumps(value):
+    buffer = io.BytesIO()
+    SnapshotPickler(buffer, protocol=pickle.HIGHEST_PROTOCOL).dump(value)
+    return buffer.getvalue()
+
+
+def write_atomic(path, content):
+    with open(path + '.partial', 'wb') as f:
+        f.write(content)
+    os.replace(path + '.partial', path)
+
+
+def write_snapshot(shell, snapshots, key):
+    """
+    Pickle the user namespace and the rcParams as the snapshot ``key``; returns the names that could not be pickled.
+
+    Every value is stored once under the digest of its pickle, so the values most cells leave alone (the datasets)
+    are not written again for every cell.
+    """
+    values, modules, dropped = {}, {}, []
+    os.makedirs(os.path.join(snapshots, 'objects'), exist_ok=True)
+    for name in user_names(shell):
+        value = shell.user_ns[name]
+        if isinstance(value, types.ModuleType):
+            modules[name] = value.__name__
+            continue
+        try:
+            content = dumps(value)
+        except Exception:
+            dropped.append(name)
+            continue
+        values[name] = hashlib.sha256(content).hexdigest()
+        stored = os.path.join(snapshots, 'objects', values[name] + '.pkl')
+        if not os.path.exists(stored):
+            write_atomic(stored, content)
+    snapshot = {'values': values, 'modules': modules, 'dropped': dropped, 'rc': dict(matplotlib.rcParams)}
+    write_atomic(os.path.join(snapshots, key + '.pkl'), pickle.dumps(snapshot, protocol=pickle.HIGHEST_PROTOCOL))
+    return dropped
+
+
+def read_snapshot(snapshots, key):
+    try:
+        with open(os.path.join(snapshots, key + '.pkl'), 'rb') as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+
+
+def restore(shell, snapshots, snapshot):
+    """Put a snapshot back into a fresh shell; False when one of its values cannot be read back."""
+    try:
+        for name, module in snapshot['modules'].items():
+            shell.user_ns[name] = importlib.import_module(module)
+        for name, digest in snapshot['values'].items():
+            with open(os.path.join(snapshots, 'objects', digest + '.pkl'), 'rb') as f:
+                shell.user_ns[name] = pickle.load(f)
+    except Exception:
+        return False
+    matplotlib.rcParams.update(snapshot['rc'])
+    return True
+
+
+def figure_outputs():
+    """display_data outputs of the open pyplot figures, which are closed."""
+    import matplotlib.pyplot as plt
+    outputs = []
+    for number in plt.get_fignums():
+        fig = plt.figure(number)
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png', dpi=FIGURE_DPI, bbox_inches='tight')
+        width, height = fig.get_size_inches() * fig.dpi
+        outputs.append({'data': {'image/png': base64.b64encode(buffer.getvalue()).decode('ascii') + '\n',
+                                 'text/plain': [f'<Figure size {width:g}x{height:g} with {len(fig.axes)} Axes>']},
+                        'metadata': {'needs_background': 'light'}, 'output_type': 'display_data'})
+        plt.close(fig)
+    return outputs
+
+
+class CellRecorder:
+    """Collects the outputs of one cell in notebook form, in the order they were produced."""
+
+    def __init__(self):
+        self.outputs = []
+        self.error = None
+
+    def stream(self, name, text):
+        if not text:
+            return
+        if self.outputs and self.outputs[-1]['output_type'] == 'stream' and self.outputs[-1]['name'] == name:
+            self.outputs[-1]['text'] = lines(''.join(self.outputs[-1]['text']) + text)
+        else:
+            self.outputs.append({'name': name, 'output_type': 'stream', 'text': lines(text)})
+
+    def rich(self, output_type, data, metadata=None, execution_count=None):
+        data = {mime: lines(value) if isinstance(value, str) and not mime.startswith('image/') else value
+                for mime, value in data.items()}
+        output = {'data': data,
+                  'metadata': metadata or {}, 'output_type': output_type}
+        if output_type == 'execute_result':
+            output['execution_count'] = execution_count
+        self.outputs.append(output)
+
+
+class Stream(io.TextIOBase):
+    """sys.stdout / sys.stderr of a running cell."""
+
+    def __init__(self, name, recorder):
+        self.name = name
+        self.recorder = recorder
+
+    def write(self, text):
+        self.recorder.stream(self.name, text)
+        return len(text)
+
+
+@contextmanager
+def download_cache():
+    """pd.read_csv of http(s) URLs reads the copy in the dataset download cache."""
+    import pandas as pd
+    read_csv = pd.read_csv
+
+    def cached_read_csv(source, *args, **kwargs):
+        if isinstance(source, str) and datasets.is_url(source):
+            source = datasets.fetch(source)
+        return read_csv(source, *args, **kwargs)
+
+    pd.read_csv = cached_read_csv
+    try:
+        yield
+    finally:
+        pd.read_csv = read_csv
+
+
+class Executor:
+    """An in-process IPython shell running cells headlessly and recording their outputs."""
+
+    def __init__(self):
+        from IPython.core.interactiveshell import InteractiveShell
+        from traitlets.config import Config
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+        config = Config()
+        config.HistoryManager.enabled = False
+        self.shell = InteractiveShell(config=config)
+        self.recorder = None
+        # the hooks a Jupyter kernel replaces: tracebacks, display() and the value of a cell's last expression
+        self.shell._showtraceback = self._showtraceback
+        self.shell.display_pub.publish = self._publish
+        self.shell.displayhook.write_output_prompt = lambda: None
+        self.shell.displayhook.write_format_data = self._write_format_data
+        self.shell.displayhook.finish_displayhook = lambda: None
+        # plt.show() emits the open figures, as the inline backend does
+        self.show = plt.show
+        plt.show = lambda *args, **kwargs: self.recorder.outputs.extend(figure_outputs())
+
+    def _showtraceback(self, etype, evalue, stb):
+        self.recorder.error = {'ename': etype.__name__, 'evalue': str(evalue), 'output_type': 'error',
+                               'traceback': stb}
+
+    def _publish(self, data, metadata=None, **kwargs):
+        self.recorder.rich('display_data', data, metadata)
+
+    def _write_format_data(self, format_dict, md_dict=None):
+        self.recorder.rich('execute_result', format_dict, md_dict, self.shell.execution_count)
+
+    def run(self, source, execution_count):
+        """Outputs of ``source`` and whether it ran without an exception."""
+        self.recorder = CellRecorder()
+        self.shell.execution_count = execution_count
+        stdout, stderr = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = Stream('stdout', self.recorder), Stream('stderr', self.recorder)
+        try:
+            result = self.shell.run_cell(source, store_history=False)
+        finally:
+            sys.stdout, sys.stderr = stdout, stderr
+        self.recorder.outputs.extend(figure_outputs())
+        if self.recorder.error:
+            self.recorder.outputs.append(self.recorder.error)
+        return self.recorder.outputs, result.success
+
+    def close(self):
+        import matplotlib.pyplot as plt
+        plt.show = self.show
+        plt.close('all')
+
+
+def resume_point(shell, snapshots, keys, sources, first_changed):
+    """Index of the first code cell to run and the snapshot to start from (None: an empty namespace)."""
+    for start in range(first_changed, 0, -1):
+        snapshot = read_snapshot(snapshots, keys[start - 1])
+        if snapshot is None:
+            continue
+        read = names_read(shell, sources[start:])
+        if read is not None and not read & set(snapshot['dropped']):
+            return start, snapshot
+    return 0, None
+
+
+def run(path, force=False):
+    """Execute the code cells of the notebook at ``path`` from the first changed one; returns True on success."""
+    notebook = load(path)
+    cells = [cell for cell in notebook['cells'] if cell['cell_type'] == 'code']
+    sources = [''.join(cell['source']) for cell in cells]
+    keys = cell_keys(sources, os.path.dirname(os.path.abspath(path)))
+    stored = [cell.get('metadata', {}).get('vizkit', {}).get('key') for cell in cells]
+    first_changed = 0 if force else next((i for i, (key, old) in enumerate(zip(keys, stored)) if key != old),
+                                         len(cells))
+    if first_changed == len(cells):
+        print(f'{path}: {len(cells)} code cells unchanged')
+        return True
+
+    snapshots = snapshot_dir(path)
+    executor = Executor()
+    cwd = os.getcwd()
+    # the cells run in the notebook's directory, as in Jupyter
+    os.chdir(os.path.dirname(os.path.abspath(path)))
+    success = True
+    try:
+        with download_cache():
+            start, snapshot = resume_point(executor.shell, snapshots, keys, sources, first_changed)
+            if snapshot is not None and not restore(executor.shell, snapshots, snapshot):
+                start = 0
+            for i in range(start, len(cells)):
+                metadata = cells[i].setdefault('metadata', {})
+                if not success:
+                    # not run: the stored outputs stay, but the cell runs next time
+                    metadata.pop('vizkit', None)
+                    continue
+                cells[i]['execution_count'] = i + 1
+                cells[i]['outputs'], success = executor.run(sources[i], i + 1)
+                if success:
+                    metadata['vizkit'] = {'key': keys[i]}
+                    write_snapshot(executor.shell, snapshots, keys[i])
+                else:
+                    metadata.pop('vizkit', None)
+                    error = cells[i]['outputs'][-1]
+                    print(f'{path}: cell {i + 1} raised {error["ename"]}: {error["evalue"]}')
+    finally:
+        executor.close()
+        os.chdir(cwd)
+    save(notebook, path)
+    prune(snapshots, keys)
+    print(f'{path}: {start} code cells reused, {len(cells) - start} executed from cell {start + 1}')
+    return success
+
+
+def prune(snapshots, keys):
+    """Delete the snapshots no current cell key refers to, and the values only they referred to."""
+    if not os.path.isdir(snapshots):
+        return
+    referenced = set()
+    for name in os.listdir(snapshots):
+        if name.endswith('.pkl') and name[:-len('.pkl')] not in keys:
+            os.remove(os.path.join(snapshots, name))
+        elif name.endswith('.pkl'):
+            snapshot = read_snapshot(snapshots, name[:-len('.pkl')])
+            referenced.update(snapshot['values'].values() if snapshot else ())
+    objects = os.path.join(snapshots, 'objects')
+    for name in os.listdir(objects) if os.path.isdir(objects) else ():
+        if name[:-len('.pkl')] not in referenced:
+            os.remove(os.path.join(objects, name))
+
+
+def add_arguments(parser):
+    """Arguments of ``python -m vizkit notebook``."""
+    parser.add_argument('notebooks', nargs='+', metavar='NOTEBOOK', help='.ipynb files to execute')
+    parser.add_argument('--force', action='store_true', help='execute every cell, even the unchanged ones')
+    return parser
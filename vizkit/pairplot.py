@@ -0,0 +1,120 @@
+"""
+Pair plots that stay fast on large datasets.
+
+sns.pairplot draws every row as a marker in every off-diagonal panel, so its cost grows with rows x pairs artists.
+density_pairplot bins the data instead: each column is converted to bin indices once, every pair of columns is
+counted with np.bincount into a 2D histogram, and each panel is drawn as a single image. The diagonal histograms
+come from the same bin indices. Rows are processed in chunks, so memory stays bounded on very large frames.
+
+pairplot() picks the seaborn scatter version for small frames (same figure as before) and the density version above
+DENSITY_ROWS rows.
+"""
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.colors import LogNorm
+
+from vizkit import lazy, tracing
+
+sns = lazy.module('seaborn')
+
+MODES = ['auto', 'scatter', 'density']
+# Above this many rows pairplot() switches to the density version.
+DENSITY_ROWS = 100_000
+CHUNK_ROWS = 1_000_000
+
+
+def column_ranges(frame, columns):
+    """(min, max) of every column; constant columns get a unit-wide range so they still bin."""
+    values = frame[columns]
+    low = values.min().to_numpy(dtype=float)
+    high = values.max().to_numpy(dtype=float)
+    high = np.where(high > low, high, low + 1)
+    return low, high
+
+
+@tracing.traced('pair histograms')
+def pair_histograms(frame, columns, bins=64):
+    """
+    Return (counts, low, high) for the columns of ``frame``.
+
+    ``counts[i, j]`` is the bins x bins histogram of column i (rows) against column j (columns); the diagonal holds
+    the 1D histogram of each column in ``counts[i, i, 0]``. Missing values are left out of the pairs they appear in.
+    """
+    n = len(columns)
+    low, high = column_ranges(frame, columns)
+    counts = np.zeros((n, n, bins, bins), dtype=np.int64)
+    scale = bins / (high - low)
+    for start in range(0, len(frame), CHUNK_ROWS):
+        chunk = frame[columns].iloc[start:start + CHUNK_ROWS].to_numpy(dtype=float)
+        valid = ~np.isnan(chunk).T
+        complete = valid.all()
+        # one contiguous row of bin indices per column
+        index = np.clip(np.nan_to_num((chunk - low) * scale), 0, bins - 1).astype(np.intp).T.copy()
+        for i in range(n):
+            counts[i, i, 0] += np.bincount(index[i] if complete else index[i][valid[i]], minlength=bins)
+            row_offset = index[i] * bins
+            for j in range(i + 1, n):
+                codes = row_offset + index[j]
+                if not complete:
+                    codes = codes[valid[i] & valid[j]]
+                pair = np.bincount(codes, minlength=bins * bins).reshape(bins, bins)
+                counts[i, j] += pair
+                counts[j, i] += pair.T
+    return counts, low, high
+
+
+def density_pairplot(frame, columns=None, bins=64, height=1.5, cmap='Blues', color='C0'):
+    """Draw a pair plot of binned 2D histograms (log colour scale) and return the Figure."""
+    columns = list(frame.select_dtypes('number').columns if columns is None else columns)
+    counts, low, high = pair_histograms(frame, columns, bins)
+    n = len(columns)
+    fig, axes = plt.subplots(n, n, figsize=(n * height, n * height), squeeze=False)
+    for i in range(n):
+        for j in range(n):
+            ax = axes[i, j]
+            if i == j:
+                edges = np.linspace(low[i], high[i], bins + 1)
+                ax.hist(edges[:-1], bins=edges, weights=counts[i, i, 0], histtype='stepfilled', color=color)
+                ax.set_xlim(low[i], high[i])
+                ax.set_yticks([])
+            else:
+                # counts[i, j] is indexed [bin of column i, bin of column j]: column j on x, column i on y
+                panel = counts[i, j].astype(float)
+                panel[panel == 0] = np.nan
+                ax.imshow(panel, origin='lower', aspect='auto', cmap=cmap, norm=LogNorm(),
+                          extent=(low[j], high[j], low[i], high[i]), interpolation='nearest')
+            if i == n - 1:
+                ax.set_xlabel(columns[j])
+            else:
+                ax.set_xticklabels([])
+            if j == 0 and i != 0:
+                ax.set_ylabel(columns[i])
+            elif j != 0:
+                ax.set_yticklabels([])
+    # fixed spacing: tight_layout has to measure every tick label of n x n axes
+    fig.subplots_adjust(left=0.9 / (n * height), bottom=0.9 / (n * height), right=0.99, top=0.99,
+                        wspace=0.08, hspace=0.08)
+    return fig
+
+
+def pairplot(frame, columns=None, mode='auto', **kwargs):
+    """
+    Pair plot of ``columns``; ``mode`` is 'scatter' (sns.pairplot), 'density' or 'auto'.
+
+    'auto' keeps the seaborn scatter version up to DENSITY_ROWS rows. Extra keyword arguments go to the function
+    doing the drawing.
+    """
+    if mode not in MODES:
+        raise ValueError(f'unknown pairplot mode {mode!r}, expected one of {MODES}')
+    columns = list(frame.select_dtypes('number').columns if columns is None else columns)
+    if mode == 'density' or (mode == 'auto' and len(frame) > DENSITY_ROWS):
+        return density_pairplot(frame, columns, **kwargs)
+    return sns.pairplot(frame[columns], **kwargs).fig
+
+
+def add_arguments(parser):
+    """--pairplot-mode option of the scripts drawing pair plots."""
+    parser.add_argument('--pairplot-mode', choices=MODES, default='auto',
+                        help=f"draw pair plots with seaborn scatters, as binned density panels, or switch to the "
+                             f"density panels above {DENSITY_ROWS} rows ('auto')")
+    return parser
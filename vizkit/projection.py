@@ -0,0 +1,167 @@
+"""
+PCA projections for the projection scatter plots, fitted out of core and cached.
+
+The sklearn notebook projects the digits and Boston housing data with PCA(n_components=2).fit_transform, a dense SVD
+of the whole matrix, every time the cell runs. project() gives the same coordinates from a pass over the rows in
+chunks of CHUNK_ROWS, so the data may be a memory-mapped array (np.load(mmap_mode='r'), the dataset column cache) or
+a DataFrame larger than what fits in memory as float64:
+
+    proj = projection.project(digits.data)         # (n, 2) coordinates
+    projection.scatter(plt.gca(), digits.data, c=digits.target)
+
+fit() finds the components from the streamed covariance matrix (vizkit.streaming.Covariance, exact, one pass) when
+the data has at most COVARIANCE_COLUMNS columns; wider data uses the randomized eigensolver (a range finder with
+power iterations on the covariance operator, one pass per iteration and d x (k + OVERSAMPLE) memory). Each component
+is signed so its largest loading is positive, so the coordinates may differ from sklearn's by a sign per axis.
+
+The fitted components and the coordinates are stored under .cache/projections/, keyed by the fingerprint of the data
+and the fit options; later runs read them instead of fitting again.
+"""
+import hashlib
+import os
+from collections import namedtuple
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from vizkit import datasets, streaming, tracing
+
+Projection = namedtuple('Projection', ['mean', 'components', 'explained_variance'])
+
+METHODS = ['auto', 'covariance', 'randomized']
+# Rows per chunk read from the data.
+CHUNK_ROWS = 100_000
+# Up to this many columns 'auto' fits from the full covariance matrix.
+COVARIANCE_COLUMNS = 2000
+# Extra random directions and power iterations of the randomized eigensolver.
+OVERSAMPLE = 10
+POWER_ITERATIONS = 7
+# Bump when fit() changes its result, so old cached projections are not reused.
+VERSION = 1
+
+
+def rows(data, start, stop):
+    """Rows start:stop of ``data`` (array, memory map or DataFrame) as a float64 array."""
+    if isinstance(data, pd.DataFrame):
+        return data.iloc[start:stop].to_numpy(dtype=float)
+    return np.asarray(data[start:stop], dtype=float)
+
+
+def chunks(data, chunk_rows=CHUNK_ROWS):
+    """The rows of ``data`` in float64 blocks of ``chunk_rows``; rows with missing values are dropped."""
+    for start in range(0, len(data), chunk_rows):
+        block = rows(data, start, start + chunk_rows)
+        yield block[~np.isnan(block).any(axis=1)]
+
+
+def data_fingerprint(data, chunk_rows=CHUNK_ROWS):
+    """Digest of the values of ``data``, read in chunks."""
+    if isinstance(data, pd.DataFrame):
+        return datasets.fingerprint(data)
+    digest = hashlib.sha256(f'{np.shape(data)}\0{np.asarray(data[:0]).dtype}\0'.encode('ascii'))
+    for start in range(0, len(data), chunk_rows):
+        digest.update(np.ascontiguousarray(data[start:start + chunk_rows]).tobytes())
+    return digest.hexdigest()
+
+
+def signed(components):
+    """``components`` (one per row) with each row's largest absolute loading made positive."""
+    largest = components[np.arange(len(components)), np.abs(components).argmax(axis=1)]
+    return components * np.where(largest < 0, -1, 1)[:, None]
+
+
+def covariance_fit(data, n_components, chunk_rows):
+    covariance = streaming.Covariance(data.shape[1])
+    for block in chunks(data, chunk_rows):
+        covariance.update(block)
+    values, vectors = np.linalg.eigh(covariance.comoment / max(1, covariance.count - 1))
+    top = np.argsort(values)[::-1][:n_components]
+    return Projection(covariance.mean, signed(vectors[:, top].T), values[top])
+
+
+def covariance_product(data, mean, count, vectors, chunk_rows):
+    """C @ vectors for the covariance matrix C of ``data``, accumulated over the chunks."""
+    product = np.zeros_like(vectors)
+    for block in chunks(data, chunk_rows):
+        centered = block - mean
+        product += centered.T @ (centered @ vectors)
+    return product / max(1, count - 1)
+
+
+def randomized_fit(data, n_components, chunk_rows, seed=0):
+    moments = streaming.Moments(data.shape[1])
+    for block in chunks(data, chunk_rows):
+        moments.update(block)
+    mean, count = moments.mean, int(moments.count.min())
+    width = min(data.shape[1], n_components + OVERSAMPLE)
+    basis = np.random.default_rng(seed).standard_normal((data.shape[1], width))
+    for _ in range(POWER_ITERATIONS):
+        basis = np.linalg.qr(covariance_product(data, mean, count, basis, chunk_rows))[0]
+    small = basis.T @ covariance_product(data, mean, count, basis, chunk_rows)
+    values, vectors = np.linalg.eigh((small + small.T) / 2)
+    top = np.argsort(values)[::-1][:n_components]
+    return Projection(mean, signed((basis @ vectors[:, top]).T), values[top])
+
+
+def fit(data, n_components=2, method='auto', chunk_rows=CHUNK_ROWS):
+    """Principal components of ``data`` from chunked passes over its rows."""
+    if method not in METHODS:
+        raise ValueError(f'unknown projection method {method!r}, expected one of {METHODS}')
+    if method == 'auto':
+        method = 'covariance' if data.shape[1] <= COVARIANCE_COLUMNS else 'randomized'
+    with tracing.phase('pca fit', method=method):
+        if method == 'covariance':
+            return covariance_fit(data, n_components, chunk_rows)
+        return randomized_fit(data, n_components, chunk_rows)
+
+
+def transform(projection, data, chunk_rows=CHUNK_ROWS):
+    """Coordinates of the rows of ``data`` on the components (NaN for rows with missing values)."""
+    coordinates = np.full((len(data), len(projection.components)), np.nan)
+    for start in range(0, len(data), chunk_rows):
+        block = rows(data, start, start + chunk_rows)
+        coordinates[start:start + len(block)] = (block - projection.mean) @ projection.components.T
+    return coordinates
+
+
+def cache_file(data, n_components, method, chunk_rows):
+    key = hashlib.sha256(f'{VERSION}\0{data_fingerprint(data, chunk_rows)}\0{n_components}\0{method}'
+                         .encode('ascii')).hexdigest()[:16]
+    return datasets.cache_path('projections', f'{key}.npz')
+
+
+def load(data, n_components=2, method='auto', chunk_rows=CHUNK_ROWS, cache=True):
+    """(Projection, coordinates) of ``data``, fitted and stored on a cache miss."""
+    path = cache_file(data, n_components, method, chunk_rows) if cache else None
+    if path is not None and os.path.exists(path):
+        with np.load(path) as stored:
+            return Projection(*(stored[field] for field in Projection._fields)), stored['coordinates']
+    projection = fit(data, n_components, method, chunk_rows)
+    with tracing.phase('pca transform'):
+        coordinates = transform(projection, data, chunk_rows)
+    if path is not None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # written next to its final name and renamed, so readers never see half a file
+        with open(path + '.partial', 'wb') as f:
+            np.savez(f, coordinates=coordinates, **projection._asdict())
+        os.replace(path + '.partial', path)
+    return projection, coordinates
+
+
+def project(data, n_components=2, method='auto', chunk_rows=CHUNK_ROWS, cache=True):
+    """(n, n_components) PCA coordinates of ``data``, read from the projection cache when it has them."""
+    return load(data, n_components, method, chunk_rows, cache)[1]
+
+
+def scatter(ax, data, c=None, n_components=2, method='auto', **kwargs):
+    """Scatter of the first two PCA coordinates of ``data`` (coloured by ``c``) on ``ax``.
+
+    When ``ax`` is the current pyplot axes the collection becomes the current image, like plt.scatter does, so a
+    following plt.colorbar() maps its colours.
+    """
+    coordinates = project(data, n_components, method)
+    collection = ax.scatter(coordinates[:, 0], coordinates[:, 1], c=c, **kwargs)
+    if plt.get_fignums() and plt.gca() is ax:
+        plt.sci(collection)
+    return collection
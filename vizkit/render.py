@@ -0,0 +1,181 @@
+"""
+Figure rendering for the homework scripts.
+
+A script describes each of its figures as a FigureTask: the output file, the function that draws it, that
+function's keyword arguments, the matplotlib style to draw it in, the extra savefig arguments and the dataset columns
+the figure reads (``uses``, None for all of them). A figure function
+takes the dataset (plus its params) and returns the matplotlib Figure it drew; saving and closing is done here.
+
+    tasks = [render.task('plots/myproject/wine_quality_histogram.png', plot_quality_histogram)]
+    render.render(tasks, wine, jobs=8)
+
+With jobs > 1 the figures are drawn by a process pool. The dataset is written once as memory-mapped columns (see
+vizkit.datasets.write_columns) and every worker opens that copy read-only, so it is not pickled for each task.
+
+Figures whose inputs did not change since the last run are copied from the render cache instead of being drawn
+again (see vizkit.render_cache); ``cache=False`` / ``--no-cache`` always draws them.
+
+Frames shared by several figures are nodes of the script's graph (see vizkit.dag): a task lists the nodes it
+``needs`` and gets them as keyword arguments. ``--only PATTERN`` draws only the figures whose output path matches,
+``--since-changed`` only those whose fingerprint differs from the last render of their output path (the others,
+and the nodes only they need, are not touched at all).
+
+Figures are saved through vizkit.writer, which encodes PNG files on background threads inside a writer session.
+"""
+import argparse
+import fnmatch
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+import matplotlib.pyplot as plt
+
+from vizkit import dag, datasets, figpool, render_cache, tracing, writer
+
+FigureTask = namedtuple('FigureTask', ['output', 'func', 'params', 'style', 'savefig', 'uses', 'needs'])
+
+
+def task(output, func, style='default', savefig=None, uses=None, needs=(), **params):
+    """Build a FigureTask; ``params`` and the ``needs`` nodes are passed to ``func`` after the dataset."""
+    return FigureTask(output, func, params, style, savefig or {}, uses, tuple(needs))
+
+
+def call(figure_task, data, inputs=None):
+    """Run the figure function of ``figure_task`` with its params and the values of the nodes it needs."""
+    inputs = inputs or {}
+    return figure_task.func(data, **figure_task.params, **{name: inputs[name] for name in figure_task.needs})
+
+
+def draw(figure_task, data, inputs=None):
+    """Draw one figure, save it to its output path and close it."""
+    with tracing.figure(figure_task.output), plt.style.context(figure_task.style):
+        with tracing.phase('figure function'):
+            fig = call(figure_task, data, inputs)
+        writer.savefig(fig, figure_task.output, **figure_task.savefig)
+    # (figures of vizkit.figpool are kept for the next task drawing the same kind of figure)
+    figpool.release(fig)
+    return figure_task.output
+
+
+def matches(output, patterns):
+    """True when ``output`` matches one of the patterns (glob when it has wildcards, substring otherwise)."""
+    if not patterns:
+        return True
+    for pattern in patterns:
+        if any(char in pattern for char in '*?['):
+            if fnmatch.fnmatch(output, pattern):
+                return True
+        elif pattern.lower() in output.lower():
+            return True
+    return False
+
+
+# Dataset of a pool worker, opened once by _init_worker.
+_worker_data = None
+
+
+def _init_worker(directory, trace_settings=None, writer_settings=None):
+    global _worker_data
+    matplotlib.use('Agg')
+    tracing.start_worker(trace_settings)
+    writer.start_worker(writer_settings)
+    _worker_data = datasets.read_columns(directory)
+
+
+def _draw_in_worker(figure_task, inputs):
+    output = draw(figure_task, _worker_data, inputs)
+    # the parent stores the file in the render cache as soon as the task returns
+    writer.flush()
+    return output, tracing.take_events()
+
+
+def node_values(futures, figure_task):
+    """Values of the nodes ``figure_task`` needs, waiting for the ones still being computed."""
+    return {name: futures[name].result() for name in figure_task.needs}
+
+
+def draw_all(tasks, data, jobs=1, graph=None):
+    """Draw every task, in a process pool when ``jobs`` > 1; the nodes they need are computed on threads meanwhile."""
+    graph = graph or dag.Graph()
+    needed = sorted({name for figure_task in tasks for name in figure_task.needs})
+    # the figures needing no node go first, while the nodes are being computed
+    tasks = sorted(tasks, key=lambda figure_task: bool(figure_task.needs))
+    jobs = min(jobs or os.cpu_count(), len(tasks))
+    with dag.executor(len(graph.order(needed))) as threads:
+        futures = graph.start(needed, data, threads)
+        if jobs <= 1:
+            outputs = [draw(figure_task, data, node_values(futures, figure_task)) for figure_task in tasks]
+            writer.flush()
+            return outputs
+
+        os.makedirs(datasets.cache_path(), exist_ok=True)
+        shared = tempfile.mkdtemp(prefix='render-', dir=datasets.cache_path())
+        try:
+            directory = os.path.join(shared, 'data')
+            datasets.write_columns(data, directory)
+            with ProcessPoolExecutor(jobs, initializer=_init_worker,
+                                     initargs=(directory, tracing.worker_settings(),
+                                               writer.worker_settings())) as pool:
+                drawing = [pool.submit(_draw_in_worker, figure_task, node_values(futures, figure_task))
+                           for figure_task in tasks]
+                outputs = []
+                for future in drawing:
+                    output, events = future.result()
+                    tracing.add_events(events)
+                    outputs.append(output)
+                return outputs
+        finally:
+            shutil.rmtree(shared, ignore_errors=True)
+
+
+def render(tasks, data, jobs=1, cache=True, nodes=(), only=None, since_changed=False):
+    """
+    Render the tasks matching ``only`` and return their output paths in the order of ``tasks``.
+
+    ``nodes`` are the shared data nodes the tasks may need; with ``since_changed`` the figures rendered last time with
+    the same fingerprint are left as they are.
+    """
+    tasks = [figure_task for figure_task in tasks if matches(figure_task.output, only)]
+    graph = dag.Graph(nodes)
+    for figure_task in tasks:
+        os.makedirs(os.path.dirname(figure_task.output) or '.', exist_ok=True)
+    if not cache and not since_changed:
+        draw_all(tasks, data, jobs, graph)
+        return [figure_task.output for figure_task in tasks]
+
+    manifest = render_cache.load_manifest()
+    needed = sorted({name for figure_task in tasks for name in figure_task.needs})
+    keys = render_cache.fingerprints(tasks, data, graph.keys(needed, data))
+    if since_changed:
+        latest = render_cache.latest(manifest)
+        changed = [(figure_task, key) for figure_task, key in zip(tasks, keys)
+                   if latest.get(figure_task.output) != key or not os.path.exists(figure_task.output)]
+        print(f'{len(tasks) - len(changed)} figures unchanged since their last render')
+    else:
+        changed = list(zip(tasks, keys))
+    missing = [(figure_task, key) for figure_task, key in changed
+               if not cache or not render_cache.restore(manifest, key, figure_task.output)]
+    draw_all([figure_task for figure_task, key in missing], data, jobs, graph)
+    for figure_task, key in missing:
+        render_cache.store(manifest, key, figure_task.output)
+    render_cache.save_manifest(manifest)
+    print(f'rendered {len(missing)} figures, {len(changed) - len(missing)} unchanged figures taken from the cache')
+    return [figure_task.output for figure_task in tasks]
+
+
+def argument_parser(description):
+    """Command line options shared by the plotting scripts."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='number of processes drawing figures in parallel (0 = one per CPU)')
+    parser.add_argument('--no-cache', dest='cache', action='store_false',
+                        help='draw every figure even if the render cache has it')
+    parser.add_argument('--only', action='append', default=None, metavar='PATTERN',
+                        help='only draw the figures whose output path contains this text or matches this glob '
+                             '(repeatable)')
+    parser.add_argument('--since-changed', action='store_true',
+                        help='only draw the figures whose inputs or code changed since their last render')
+    return parser
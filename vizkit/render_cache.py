@@ -0,0 +1,226 @@
+"""
+Content-hash cache of rendered figures.
+
+A figure's fingerprint covers everything that can change its pixels: the dataset columns the task reads (see
+FigureTask.uses), the keys of the shared nodes it needs (see vizkit.dag), its params, style and savefig options, the
+source of its drawing function, digests of the module defining it (the draw_* helpers it calls) and of the vizkit
+package sources (the drawing modules), and the versions of the plotting libraries. Rendered files are kept under
+.cache/render/objects/<fingerprint>.<ext>; manifest.json records fingerprint -> output path and when the entry was
+last used. When a fingerprint is already in the cache the stored file is copied to the output path instead of drawing
+the figure again.
+
+Stale entries are removed with:
+
+    python -m vizkit.render_cache clean [--max-age DAYS]
+
+which drops entries whose file is gone, entries replaced by a newer render of the same output path and (with
+--max-age) entries not used for that many days, then deletes object files no entry refers to. It also deletes the
+KDE curves stored under .cache/kde (see vizkit.kde): all of them, or with --max-age those not used for that many
+days. They are recomputed when a figure needs them again.
+"""
+import argparse
+import hashlib
+import importlib.metadata
+import inspect
+import json
+import os
+import shutil
+import sys
+import time
+
+from vizkit import datasets
+
+# Bump when the fingerprint itself changes meaning, so old entries are not reused.
+FINGERPRINT_VERSION = 2
+LIBRARIES = ['numpy', 'pandas', 'matplotlib', 'seaborn']
+
+# {path: digest} of the source files hashed so far in this process
+_source_digests = {}
+
+
+def cache_dir():
+    return datasets.cache_path('render')
+
+
+def manifest_path():
+    return os.path.join(cache_dir(), 'manifest.json')
+
+
+def object_path(key, output):
+    return os.path.join(cache_dir(), 'objects', key + os.path.splitext(output)[1])
+
+
+def library_versions():
+    # read from the installed package metadata, so lazily imported libraries count before they are imported
+    versions = {}
+    for name in LIBRARIES:
+        try:
+            versions[name] = importlib.metadata.version(name)
+        except importlib.metadata.PackageNotFoundError:
+            pass
+    return versions
+
+
+def function_source(func):
+    try:
+        return inspect.getsource(func)
+    except (OSError, TypeError):
+        return func.__module__ + '.' + func.__qualname__
+
+
+def file_digest(path):
+    if path not in _source_digests:
+        try:
+            with open(path, 'rb') as f:
+                _source_digests[path] = hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            _source_digests[path] = None
+    return _source_digests[path]
+
+
+def module_digest(func):
+    """Digest of the source file of the module defining ``func`` (None when it has none)."""
+    path = getattr(sys.modules.get(func.__module__), '__file__', None)
+    return file_digest(os.path.abspath(path)) if path else None
+
+
+def package_digest():
+    """Digest of the sources of the vizkit package."""
+    package = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(package)):
+        if name.endswith('.py'):
+            digest.update(f'{name}\0{file_digest(os.path.join(package, name))}\0'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def fingerprints(tasks, data, node_keys=None):
+    """Return the fingerprint of every task; each column of ``data`` is hashed at most once."""
+    digests = {}
+    versions = library_versions()
+    package = package_digest()
+    keys = []
+    for task in tasks:
+        columns = list(data.columns) if task.uses is None else list(task.uses)
+        for col in columns:
+            if col not in digests:
+                digests[col] = datasets.column_digest(data[col])
+        description = {
+            'version': FINGERPRINT_VERSION,
+            'columns': [[col, digests[col]] for col in columns],
+            'params': task.params,
+            'style': task.style,
+            'savefig': task.savefig,
+            'code': function_source(task.func),
+            'module': module_digest(task.func),
+            'package': package,
+            'libraries': versions,
+            'format': os.path.splitext(task.output)[1],
+        }
+        if task.needs:
+            description['nodes'] = [[name, node_keys[name]] for name in task.needs]
+        text = json.dumps(description, sort_keys=True, default=repr)
+        keys.append(hashlib.sha256(text.encode('utf-8')).hexdigest())
+    return keys
+
+
+def load_manifest():
+    try:
+        with open(manifest_path()) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_manifest(manifest):
+    os.makedirs(cache_dir(), exist_ok=True)
+    with open(manifest_path() + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(manifest_path() + '.tmp', manifest_path())
+
+
+def restore(manifest, key, output):
+    """Copy the cached file for ``key`` to ``output``; return False when there is nothing cached."""
+    stored = object_path(key, output)
+    if key not in manifest or not os.path.exists(stored):
+        return False
+    shutil.copyfile(stored, output)
+    manifest[key] = {'output': output, 'used': time.time()}
+    return True
+
+
+def store(manifest, key, output):
+    """Keep a copy of a freshly rendered ``output`` under ``key``."""
+    stored = object_path(key, output)
+    os.makedirs(os.path.dirname(stored), exist_ok=True)
+    shutil.copyfile(output, stored + '.tmp')
+    os.replace(stored + '.tmp', stored)
+    manifest[key] = {'output': output, 'used': time.time()}
+
+
+def latest(manifest):
+    """{output path: key of its most recently used entry}."""
+    newest = {}
+    for key, entry in manifest.items():
+        if entry['output'] not in newest or entry['used'] > manifest[newest[entry['output']]]['used']:
+            newest[entry['output']] = key
+    return newest
+
+
+def clean(max_age_days=None):
+    """Remove stale entries and unreferenced object files; return the number of entries removed."""
+    manifest = load_manifest()
+    newest = latest(manifest)
+    oldest_allowed = None if max_age_days is None else time.time() - max_age_days * 86400
+    stale = []
+    for key, entry in manifest.items():
+        if (newest[entry['output']] != key or not os.path.exists(object_path(key, entry['output']))
+                or (oldest_allowed is not None and entry['used'] < oldest_allowed)):
+            stale.append(key)
+    for key in stale:
+        del manifest[key]
+    save_manifest(manifest)
+
+    referenced = {os.path.basename(object_path(key, entry['output'])) for key, entry in manifest.items()}
+    objects = os.path.join(cache_dir(), 'objects')
+    if os.path.isdir(objects):
+        for name in os.listdir(objects):
+            if name not in referenced:
+                os.remove(os.path.join(objects, name))
+    return len(stale)
+
+
+def clean_kde(max_age_days=None):
+    """Remove the stored KDE curves (only those unused for ``max_age_days`` if given); return how many."""
+    directory = datasets.cache_path('kde')
+    if not os.path.isdir(directory):
+        return 0
+    oldest_allowed = None if max_age_days is None else time.time() - max_age_days * 86400
+    removed = 0
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if oldest_allowed is None or os.path.getmtime(path) < oldest_allowed:
+            os.remove(path)
+            removed += 1
+    return removed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m vizkit.render_cache', description='Manage the figure cache.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    clean_parser = commands.add_parser('clean', help='remove stale cache entries')
+    clean_parser.add_argument('--max-age', type=float, default=None, metavar='DAYS',
+                              help='also remove entries not used for this many days')
+    commands.add_parser('list', help='show the cached figures')
+    args = parser.parse_args(argv)
+
+    if args.command == 'clean':
+        print(f'removed {clean(args.max_age)} stale entries and {clean_kde(args.max_age)} stored KDE curves')
+    else:
+        for key, entry in sorted(load_manifest().items(), key=lambda item: item[1]['output']):
+            print(f"{key[:12]}  {time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['used']))}  "
+                  f"{entry['output']}")
+
+
+if __name__ == '__main__':
+    main()
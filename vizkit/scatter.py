@@ -0,0 +1,98 @@
+"""
+Scatter plots whose drawing cost does not grow with the number of rows.
+
+Every marker of ax.scatter is a separate path that the renderer fills and blends, so big scatters are slow to draw
+and (in vector formats) produce huge files. scatter() draws a list of layers (one per hue level or per y column):
+
+* 'markers': one ax.scatter collection per layer, as before; above RASTER_POINTS points the collections are
+  rasterized, so vector outputs embed one image instead of millions of paths;
+* 'density': every layer is counted into a 2D histogram with cells about one marker wide, and the layers are
+  composited into a single RGBA image. A cell holding n points of a layer gets that layer's colour with opacity
+  1 - (1 - alpha) ** n, which is how n overlapping markers with that alpha blend, so the picture keeps the look of
+  the alpha-blended scatter while its cost depends on the figure size only;
+* 'auto' (default): 'density' above DENSITY_POINTS points in total, 'markers' otherwise.
+"""
+import numpy as np
+from matplotlib.colors import to_rgb
+
+MODES = ['auto', 'markers', 'density']
+# Above this many points in total 'auto' draws the density image.
+DENSITY_POINTS = 100_000
+# Marker collections with more points than this are rasterized.
+RASTER_POINTS = 10_000
+
+
+def choose_mode(mode, points, threshold=DENSITY_POINTS):
+    """'markers' or 'density' for ``points`` points in total."""
+    if mode not in MODES:
+        raise ValueError(f'unknown scatter mode {mode!r}, expected one of {MODES}')
+    if mode == 'auto':
+        return 'density' if points > threshold else 'markers'
+    return mode
+
+
+def layer(x, y, color, label=None):
+    """One group of points of a scatter(): x / y values, colour and legend label."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    keep = ~(np.isnan(x) | np.isnan(y))
+    return {'x': x[keep], 'y': y[keep], 'color': color, 'label': label}
+
+
+def cell_grid(ax, layers, s):
+    """Bin edges on x and y, about one marker (diameter sqrt(s) points) per cell."""
+    fig = ax.figure
+    position = ax.get_position()
+    width, height = fig.get_size_inches() * [position.width, position.height] * 72 / np.sqrt(s)
+    x = np.concatenate([part['x'] for part in layers])
+    y = np.concatenate([part['y'] for part in layers])
+    edges = []
+    for values, cells in [(x, width), (y, height)]:
+        low, high = values.min(), values.max()
+        high = high if high > low else low + 1
+        edges.append(np.linspace(low, high, max(1, int(cells)) + 1))
+    return edges
+
+
+def density_image(layers, x_edges, y_edges, alpha):
+    """RGBA image (rows = y cells, bottom first) of the layers composited in order, later layers on top."""
+    image = np.zeros((len(y_edges) - 1, len(x_edges) - 1, 4))
+    for part in layers:
+        counts = np.histogram2d(part['y'], part['x'], bins=[y_edges, x_edges])[0]
+        opacity = (1 - (1 - alpha) ** counts)[..., None]
+        below = image[..., 3:]
+        total = opacity + below * (1 - opacity)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rgb = (np.asarray(to_rgb(part['color'])) * opacity + image[..., :3] * below * (1 - opacity)) / total
+        image[..., :3] = np.nan_to_num(rgb)
+        image[..., 3:] = total
+    return image
+
+
+def scatter(ax, layers, mode='auto', alpha=0.5, s=20, threshold=DENSITY_POINTS, **kwargs):
+    """
+    Draw the layers (see layer()) on ``ax`` in the given mode; ``threshold`` is the point count above which 'auto'
+    switches to the density image. Extra keyword arguments go to ax.scatter in 'markers' mode.
+    """
+    if choose_mode(mode, sum(len(part['x']) for part in layers), threshold) == 'markers':
+        for part in layers:
+            ax.scatter(part['x'], part['y'], color=part['color'], label=part['label'], alpha=alpha, s=s,
+                       rasterized=len(part['x']) > RASTER_POINTS, **kwargs)
+        return ax
+
+    x_edges, y_edges = cell_grid(ax, layers, s)
+    ax.imshow(density_image(layers, x_edges, y_edges, alpha), origin='lower', aspect='auto', interpolation='nearest',
+              extent=(x_edges[0], x_edges[-1], y_edges[0], y_edges[-1]))
+    # empty collections carry the legend entries of the layers
+    for part in layers:
+        ax.scatter([], [], color=part['color'], label=part['label'], alpha=alpha, s=s)
+    return ax
+
+
+def add_arguments(parser):
+    """--scatter-mode / --scatter-threshold options of the scripts drawing large scatter plots."""
+    parser.add_argument('--scatter-mode', choices=MODES, default='auto',
+                        help="draw scatter plots as markers, as a density image, or pick by point count ('auto')")
+    parser.add_argument('--scatter-threshold', type=int, default=DENSITY_POINTS,
+                        help="point count above which --scatter-mode auto draws the density image")
+    return parser
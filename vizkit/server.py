@@ -0,0 +1,241 @@
+"""
+Local HTTP server drawing single figures on demand.
+
+    python -m vizkit serve --port 8000 --workers 4
+    curl 'http://127.0.0.1:8000/wine/heatmap?dpi=150' > heatmap.png
+
+A figure is addressed as /<dataset or script>/<pattern>: the first figure of those scripts (in --list order) whose
+output path matches the pattern (see render.matches), an exact output path without its extension winning over the
+rest, so /wine/plots2/heatmap/wine_correlation names one figure precisely. ``dpi`` overrides the figure's savefig
+resolution. GET / lists the figure paths as JSON.
+
+The figures are drawn by a pool of worker processes (pyplot is not thread-safe, so the HTTP threads only wait for
+them). Each worker opens the scripts' datasets once and keeps them resident, with the shared nodes it computed, for
+the requests that follow. The PNG bytes are kept in a LRU cache of at most --cache-mb megabytes; requests for a
+figure that is being drawn wait for that drawing. The ETag of a response is the render cache fingerprint of the
+figure (see vizkit.render_cache, computed for every figure at startup) with its dpi, known without drawing it, so a
+client revalidating with If-None-Match gets 304 Not Modified even for figures the server has not drawn since it
+started.
+"""
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import matplotlib
+import matplotlib.pyplot as plt
+
+from vizkit import cli, dag, figpool, render, render_cache
+
+# Cache size for the encoded figures, in megabytes.
+CACHE_MB = 256
+# Allowed range of the dpi parameter.
+DPI_RANGE = (10, 600)
+
+Figure = namedtuple('Figure', ['path', 'script', 'task', 'key'])
+
+
+class PngCache:
+    """Least recently used PNG bytes, at most ``limit`` bytes in total."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+            return self.entries.get(key)
+
+    def put(self, key, png):
+        if len(png) > self.limit:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.size -= len(self.entries.pop(key))
+            self.entries[key] = png
+            self.size += len(png)
+            while self.size > self.limit:
+                self.size -= len(self.entries.popitem(last=False)[1])
+
+
+def load_scripts(scripts):
+    """{script: (its figure tasks, its dataset, its node graph)}."""
+    loaded = {}
+    for script in scripts:
+        tasks, data, nodes = cli.figure_tasks(script, [], cli.ImportTimer())
+        loaded[script] = tasks, data, dag.Graph(nodes)
+    return loaded
+
+
+def catalog(loaded):
+    """The figures of the loaded scripts, with their render cache fingerprints."""
+    figures = []
+    for script, (tasks, data, graph) in loaded.items():
+        needed = sorted({name for figure_task in tasks for name in figure_task.needs})
+        keys = render_cache.fingerprints(tasks, data, graph.keys(needed, data))
+        for figure_task, key in zip(tasks, keys):
+            path = '/' + cli.SCRIPTS[script] + '/' + os.path.splitext(figure_task.output)[0]
+            figures.append(Figure(path, script, figure_task, key))
+    return figures
+
+
+def find(figures, path):
+    """The figure addressed by ``path`` (/<dataset or script>/<pattern>), or None."""
+    prefix, _, pattern = path.strip('/').partition('/')
+    candidates = [figure for figure in figures if prefix in (figure.script, cli.SCRIPTS[figure.script])]
+    for figure in candidates:
+        if os.path.splitext(figure.task.output)[0] == pattern:
+            return figure
+    for figure in candidates:
+        if pattern and render.matches(figure.task.output, [pattern]):
+            return figure
+    return None
+
+
+# {script: (tasks by output path, dataset, node graph, computed node values)} of a pool worker, set by _init_worker.
+_worker = {}
+
+
+def _init_worker(scripts):
+    matplotlib.use('Agg')
+    for script, (tasks, data, graph) in load_scripts(scripts).items():
+        _worker[script] = {figure_task.output: figure_task for figure_task in tasks}, data, graph, {}
+
+
+def _ready():
+    return os.getpid()
+
+
+def _draw_png(script, output, dpi):
+    tasks, data, graph, nodes = _worker[script]
+    figure_task = tasks[output]
+    missing = [name for name in figure_task.needs if name not in nodes]
+    if missing:
+        nodes.update(graph.compute(missing, data))
+    savefig = dict(figure_task.savefig, **({'dpi': dpi} if dpi else {}))
+    with plt.style.context(figure_task.style):
+        fig = render.call(figure_task, data, nodes)
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png', **savefig)
+    figpool.release(fig)
+    return buffer.getvalue()
+
+
+class PlotServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, scripts, workers, cache_bytes):
+        super().__init__(address, Handler)
+        self.figures = catalog(load_scripts(scripts))
+        self.pngs = PngCache(cache_bytes)
+        self.drawing = {}
+        self.lock = threading.Lock()
+        self.pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(list(scripts),))
+        # start every worker now, before the request threads exist
+        for future in [self.pool.submit(_ready) for _ in range(workers)]:
+            future.result()
+
+    def png(self, figure, dpi):
+        """The PNG bytes of ``figure`` at ``dpi``, from the cache or drawn by the pool."""
+        etag = etag_of(figure, dpi)
+        png = self.pngs.get(etag)
+        if png is not None:
+            return png
+        with self.lock:
+            future = self.drawing.get(etag)
+            if future is None:
+                future = self.drawing[etag] = self.pool.submit(_draw_png, figure.script, figure.task.output, dpi)
+        try:
+            png = future.result()
+            self.pngs.put(etag, png)
+        finally:
+            with self.lock:
+                self.drawing.pop(etag, None)
+        return png
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(cancel_futures=True)
+
+
+def etag_of(figure, dpi):
+    return '"' + hashlib.sha256(f'{figure.key}\0{dpi}'.encode('ascii')).hexdigest()[:32] + '"'
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = 'vizkit'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        path = unquote(url.path)
+        if path in ('', '/'):
+            return self.reply(HTTPStatus.OK, 'application/json',
+                              json.dumps({'figures': [figure.path for figure in self.server.figures]}, indent=1))
+        figure = find(self.server.figures, path)
+        if figure is None:
+            return self.reply(HTTPStatus.NOT_FOUND, 'text/plain', f'no figure matches {path}\n')
+        try:
+            dpi = int(parse_qs(url.query).get('dpi', [0])[-1]) or None
+        except ValueError:
+            dpi = -1
+        if dpi is not None and not DPI_RANGE[0] <= dpi <= DPI_RANGE[1]:
+            return self.reply(HTTPStatus.BAD_REQUEST, 'text/plain', f'dpi must be between {DPI_RANGE[0]} and '
+                                                                    f'{DPI_RANGE[1]}\n')
+        etag = etag_of(figure, dpi)
+        if etag in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+            return self.reply(HTTPStatus.NOT_MODIFIED, None, b'', etag)
+        try:
+            png = self.server.png(figure, dpi)
+        except Exception as error:
+            return self.reply(HTTPStatus.INTERNAL_SERVER_ERROR, 'text/plain', f'{figure.path}: {error!r}\n')
+        self.reply(HTTPStatus.OK, 'image/png', png, etag)
+
+    def reply(self, status, content_type, body, etag=None):
+        body = body.encode('utf-8') if isinstance(body, str) else body
+        self.send_response(status)
+        if content_type:
+            self.send_header('Content-Type', content_type)
+        if etag:
+            self.send_header('ETag', etag)
+            # always revalidate: the ETag changes with the data, the code and the options of the figure
+            self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    do_HEAD = do_GET
+
+
+def serve(scripts, host='127.0.0.1', port=8000, workers=None, cache_mb=CACHE_MB):
+    """Serve the figures of ``scripts`` until interrupted."""
+    server = PlotServer((host, port), scripts, workers or os.cpu_count() or 1, int(cache_mb * 2 ** 20))
+    print(f'serving {len(server.figures)} figures on http://{host}:{server.server_port}/')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def add_arguments(parser):
+    """--host / --port / --workers / --cache-mb options of ``python -m vizkit serve``."""
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on (default 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8000, help='port to listen on (default 8000, 0 picks one)')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='processes drawing figures (default 0 = one per CPU)')
+    parser.add_argument('--cache-mb', type=float, default=CACHE_MB,
+                        help=f'memory for the encoded figures, in megabytes (default {CACHE_MB})')
+    return parser
@@ -0,0 +1,151 @@
+"""
+Summary statistics shared by the printouts and the figures.
+
+statistics() turns the numeric columns into one float matrix and computes from it, with a few vectorized NumPy
+calls, the correlation matrix, a describe() table (count, mean, std, min, quartiles, max), the box plot statistics
+of every column and the same describe() tables per value of each ``by`` column. The result is memoized on the
+fingerprint of the columns involved, so the heatmap, the describe printouts and the box plots of one run share a
+single computation.
+
+    summary = stats.statistics(wine, by=['quality'])
+    summary.corr                      # == wine.corr()
+    summary.describe                  # == wine.describe()
+    summary.grouped['quality'][9]     # == wine[wine.quality == 9].describe()
+    stats.group(summary, 'quality', 9)  # the same, and an empty describe() when no wine has quality 9
+
+Columns with missing values fall back to pandas (pairwise-complete corr(), describe() per column).
+"""
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pandas as pd
+
+from vizkit import datasets, tracing
+
+Statistics = namedtuple('Statistics', ['columns', 'corr', 'describe', 'boxes', 'grouped'])
+
+DESCRIBE_INDEX = ['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']
+QUANTILES = [0, 0.25, 0.5, 0.75, 1]
+# How many summaries stay memoized per process.
+MEMO_SIZE = 16
+
+_memo = OrderedDict()
+
+
+def describe_matrix(values, columns):
+    """describe() table of a float matrix without missing values."""
+    count = len(values)
+    if count == 0:
+        table = pd.DataFrame(np.nan, index=DESCRIBE_INDEX, columns=columns)
+        table.loc['count'] = 0.0
+        return table
+    with np.errstate(invalid='ignore', divide='ignore'):
+        std = values.std(axis=0, ddof=1) if count > 1 else np.full(len(columns), np.nan)
+    quantiles = np.quantile(values, QUANTILES, axis=0)
+    table = np.vstack([np.full(len(columns), float(count)), values.mean(axis=0), std, quantiles])
+    return pd.DataFrame(table, index=DESCRIBE_INDEX, columns=columns)
+
+
+def correlation_matrix(values, columns):
+    """Pearson correlation of the columns of a float matrix without missing values."""
+    centered = values - values.mean(axis=0)
+    covariance = centered.T @ centered
+    scale = np.sqrt(np.diag(covariance))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        corr = covariance / np.outer(scale, scale)
+    np.fill_diagonal(corr, np.where(scale > 0, 1.0, np.nan))
+    return pd.DataFrame(corr, index=columns, columns=columns)
+
+
+def box_statistics(values, describe, columns, whis=1.5):
+    """Box plot statistics per column in the form matplotlib's Axes.bxp() takes."""
+    q1, median, q3 = (describe.loc[name].to_numpy() for name in ['25%', '50%', '75%'])
+    iqr = q3 - q1
+    low_fence, high_fence = q1 - whis * iqr, q3 + whis * iqr
+    inside = (values >= low_fence) & (values <= high_fence)
+    whislo = np.where(inside, values, np.inf).min(axis=0)
+    whishi = np.where(inside, values, -np.inf).max(axis=0)
+    boxes = {}
+    for i, col in enumerate(columns):
+        boxes[col] = {'label': col, 'med': median[i], 'q1': q1[i], 'q3': q3[i],
+                      'whislo': whislo[i], 'whishi': whishi[i], 'fliers': values[~inside[:, i], i],
+                      'mean': describe.loc['mean', col]}
+    return boxes
+
+
+def grouped_describe(values, keys, columns):
+    """describe() table of the rows of every key value, from one stable sort of the keys."""
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    sorted_values = values[order]
+    groups, starts = np.unique(sorted_keys, return_index=True)
+    ends = np.append(starts[1:], len(sorted_keys))
+    return {group: describe_matrix(sorted_values[start:end], columns)
+            for group, start, end in zip(groups.tolist(), starts, ends)}
+
+
+def grouped_statistics(frame, columns, key):
+    numeric = frame[columns]
+    values = numeric.to_numpy(dtype=float)
+    if np.isnan(values).any():
+        return {group: part.describe() for group, part in numeric.groupby(frame[key], observed=True)}
+    keys = frame[key]
+    if isinstance(keys.dtype, pd.CategoricalDtype):
+        codes = keys.cat.codes.to_numpy()
+        tables = grouped_describe(values[codes >= 0], codes[codes >= 0], columns)
+        return {keys.cat.categories[code]: table for code, table in tables.items()}
+    return grouped_describe(values, keys.to_numpy(), columns)
+
+
+def compute(frame, columns):
+    numeric = frame[columns]
+    values = numeric.to_numpy(dtype=float)
+    if np.isnan(values).any():
+        describe = numeric.describe()
+        boxes = {col: box_statistics(numeric[[col]].dropna().to_numpy(dtype=float), describe[[col]], [col])[col]
+                 for col in columns}
+        return Statistics(columns, numeric.corr(), describe, boxes, {})
+
+    describe = describe_matrix(values, columns)
+    return Statistics(columns, correlation_matrix(values, columns), describe,
+                      box_statistics(values, describe, columns), {})
+
+
+@tracing.traced('statistics')
+def statistics(frame, columns=None, by=()):
+    """
+    Summary statistics of ``columns`` (the numeric columns by default), grouped by each column in ``by``.
+
+    Results are memoized on the fingerprint of the columns involved; grouped tables are added to the memoized
+    summary the first time a ``by`` column is asked for.
+    """
+    columns = list(frame.select_dtypes('number').columns if columns is None else columns)
+    involved = list(dict.fromkeys(columns + list(by)))
+    key = (tuple(columns), datasets.fingerprint(frame, involved))
+    if key in _memo:
+        _memo.move_to_end(key)
+        summary = _memo[key]
+    else:
+        summary = compute(frame, columns)
+        _memo[key] = summary
+        if len(_memo) > MEMO_SIZE:
+            _memo.popitem(last=False)
+    for group_key in by:
+        if group_key not in summary.grouped:
+            summary.grouped[group_key] = grouped_statistics(frame, columns, group_key)
+    return summary
+
+
+def boxplot(ax, box, color='C0'):
+    """Draw one column's precomputed box statistics the way sns.boxplot(y=column) does."""
+    ax.bxp([box], widths=0.8, patch_artist=True, showfliers=True,
+           boxprops={'facecolor': color, 'edgecolor': '0.25'}, medianprops={'color': '0.25'},
+           whiskerprops={'color': '0.25'}, capprops={'color': '0.25'},
+           flierprops={'marker': 'd', 'markerfacecolor': '0.25', 'markeredgecolor': '0.25', 'markersize': 5})
+    ax.set_xticks([])
+    ax.set_ylabel(box['label'])
+
+
+def group(summary, key, value):
+    """describe() table of the rows whose ``key`` column is ``value``; with no such rows the count is 0."""
+    return summary.grouped[key].get(value, describe_matrix(np.empty((0, len(summary.columns))), summary.columns))
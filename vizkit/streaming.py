@@ -0,0 +1,204 @@
+"""
+Out-of-core summaries for CSV files larger than memory.
+
+summarize() reads its sources with read_csv(chunksize=...) twice and keeps only fixed-size accumulators:
+
+* pass 1: per-column count / mean / variance / min / max (Welford's update, merged chunk by chunk with Chan's
+  formula), the co-moment matrix of the complete rows for the correlation heatmap, and the value counts of columns
+  with few distinct values (the wine quality histogram uses them as bins);
+* pass 2: the requested fixed-bin histograms over the exact [min, max] found in pass 1, and a fine histogram per
+  column (SKETCH_BINS bins) used as a quantile sketch for describe() and the box plots. Quartiles, whiskers and
+  outliers read from the sketch are accurate to (max - min) / SKETCH_BINS.
+
+The result holds a vizkit.stats.Statistics, so figures drawn from stats.statistics(frame) can be drawn from a stream
+summary too. Memory use depends on the number of columns, not on the number of rows.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from vizkit import datasets, stats
+
+StreamSummary = namedtuple('StreamSummary', ['rows', 'statistics', 'histograms', 'value_counts'])
+
+CHUNK_ROWS = 100_000
+SKETCH_BINS = 2048
+# Value counts are kept for columns with at most this many distinct values.
+MAX_DISTINCT = 64
+
+
+class Moments:
+    """Streaming count, mean, sum of squared deviations, min and max of every column."""
+
+    def __init__(self, n_columns):
+        self.count = np.zeros(n_columns)
+        self.mean = np.zeros(n_columns)
+        self.m2 = np.zeros(n_columns)
+        self.min = np.full(n_columns, np.inf)
+        self.max = np.full(n_columns, -np.inf)
+
+    def update(self, values):
+        valid = ~np.isnan(values)
+        count = valid.sum(axis=0)
+        if not count.any():
+            return
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.nansum(values, axis=0) / count
+            m2 = np.nansum((values - mean) ** 2, axis=0)
+            total = self.count + count
+            delta = np.nan_to_num(mean - self.mean)
+            self.mean = np.where(count > 0, self.mean + delta * count / total, self.mean)
+            self.m2 = np.where(count > 0, self.m2 + m2 + delta ** 2 * self.count * count / total, self.m2)
+        self.count = total
+        self.min = np.fmin(self.min, np.where(valid, values, np.inf).min(axis=0))
+        self.max = np.fmax(self.max, np.where(valid, values, -np.inf).max(axis=0))
+
+    def std(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.sqrt(self.m2 / (self.count - 1))
+
+
+class Covariance:
+    """Streaming co-moment matrix of the rows without missing values."""
+
+    def __init__(self, n_columns):
+        self.count = 0
+        self.mean = np.zeros(n_columns)
+        self.comoment = np.zeros((n_columns, n_columns))
+
+    def update(self, values):
+        rows = values[~np.isnan(values).any(axis=1)]
+        count = len(rows)
+        if count == 0:
+            return
+        mean = rows.mean(axis=0)
+        centered = rows - mean
+        total = self.count + count
+        delta = mean - self.mean
+        self.comoment += centered.T @ centered + np.outer(delta, delta) * self.count * count / total
+        self.mean += delta * count / total
+        self.count = total
+
+    def corr(self):
+        scale = np.sqrt(np.diag(self.comoment))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = self.comoment / np.outer(scale, scale)
+        np.fill_diagonal(corr, np.where(scale > 0, 1.0, np.nan))
+        return corr
+
+
+class Histograms:
+    """
+    Fixed-bin histograms of several columns; values outside [low, high] are left out.
+
+    Like pairplot.column_ranges, a constant column gets a unit-wide range so it still bins; a column without any
+    value (no finite bound) gets the range [0, 1] and keeps empty counts.
+    """
+
+    def __init__(self, low, high, bins):
+        low, high = np.asarray(low, dtype=float), np.asarray(high, dtype=float)
+        empty = ~(np.isfinite(low) & np.isfinite(high))
+        low = np.where(empty, 0.0, low)
+        high = np.where(empty, 1.0, np.where(high > low, high, low + 1))
+        self.edges = [np.linspace(lo, hi, bins + 1) for lo, hi in zip(low, high)]
+        self.counts = np.zeros((len(self.edges), bins), dtype=np.int64)
+
+    def update(self, values):
+        for i, edges in enumerate(self.edges):
+            column = values[:, i]
+            self.counts[i] += np.histogram(column[~np.isnan(column)], bins=edges)[0]
+
+
+class ValueCounts:
+    """Exact value counts of the columns that never exceed MAX_DISTINCT distinct values."""
+
+    def __init__(self, columns):
+        self.counts = {col: {} for col in columns}
+
+    def update(self, chunk):
+        for col in list(self.counts):
+            counts = self.counts[col]
+            for value, count in chunk[col].value_counts().items():
+                counts[value] = counts.get(value, 0) + int(count)
+            if len(counts) > MAX_DISTINCT:
+                del self.counts[col]
+
+
+def sketch_quantiles(counts, edges, quantiles):
+    """Quantiles read from a histogram, interpolating linearly inside a bin."""
+    cumulative = np.concatenate([[0], np.cumsum(counts)])
+    if cumulative[-1] == 0:
+        return np.full(len(quantiles), np.nan)
+    targets = np.asarray(quantiles) * cumulative[-1]
+    return np.interp(targets, cumulative, edges)
+
+
+def sketch_box(label, counts, edges, mean, whis=1.5):
+    """Box plot statistics (Axes.bxp form) from a column's quantile sketch."""
+    q1, median, q3 = sketch_quantiles(counts, edges, [0.25, 0.5, 0.75])
+    low_fence, high_fence = q1 - whis * (q3 - q1), q3 + whis * (q3 - q1)
+    centers = (edges[:-1] + edges[1:]) / 2
+    occupied = centers[counts > 0]
+    inside = occupied[(occupied >= low_fence) & (occupied <= high_fence)]
+    return {'label': label, 'med': median, 'q1': q1, 'q3': q3,
+            'whislo': inside.min() if len(inside) else q1, 'whishi': inside.max() if len(inside) else q3,
+            'fliers': occupied[(occupied < low_fence) | (occupied > high_fence)], 'mean': mean}
+
+
+def read_chunks(sources, chunksize=CHUNK_ROWS, **read_csv_kwargs):
+    """Yield the chunks of every source in turn; URLs go through the dataset download cache."""
+    for source in sources:
+        for chunk in pd.read_csv(datasets.fetch(source), chunksize=chunksize, **read_csv_kwargs):
+            yield chunk
+
+
+def summarize(sources, histograms=None, chunksize=CHUNK_ROWS, **read_csv_kwargs):
+    """
+    Summarize the numeric columns of one or more CSV sources in two chunked passes.
+
+    ``histograms`` maps a column to a number of bins; the result's ``histograms[col]`` is (counts, edges) with the
+    same bins plt.hist(values, bins=n) uses.
+    """
+    histograms = histograms or {}
+    columns = moments = covariance = discrete = None
+    rows = 0
+    for chunk in read_chunks(sources, chunksize, **read_csv_kwargs):
+        if columns is None:
+            columns = chunk.select_dtypes('number').columns.tolist()
+            moments, covariance = Moments(len(columns)), Covariance(len(columns))
+            discrete = ValueCounts(columns)
+        values = chunk[columns].to_numpy(dtype=float)
+        moments.update(values)
+        covariance.update(values)
+        discrete.update(chunk)
+        rows += len(chunk)
+    if columns is None:
+        raise ValueError(f'no rows in {sources}')
+
+    sketch = Histograms(moments.min, moments.max, SKETCH_BINS)
+    requested = {col: Histograms([moments.min[columns.index(col)]], [moments.max[columns.index(col)]], bins)
+                 for col, bins in histograms.items()}
+    for chunk in read_chunks(sources, chunksize, **read_csv_kwargs):
+        sketch.update(chunk[columns].to_numpy(dtype=float))
+        for col, histogram in requested.items():
+            histogram.update(chunk[[col]].to_numpy(dtype=float))
+
+    quantiles = np.array([sketch_quantiles(counts, edges, [0.25, 0.5, 0.75])
+                          for counts, edges in zip(sketch.counts, sketch.edges)]).T
+    describe = pd.DataFrame(np.vstack([moments.count, moments.mean, moments.std(), moments.min, quantiles,
+                                       moments.max]), index=stats.DESCRIBE_INDEX, columns=columns)
+    boxes = {col: sketch_box(col, sketch.counts[i], sketch.edges[i], moments.mean[i]) for i, col in enumerate(columns)}
+    corr = pd.DataFrame(covariance.corr(), index=columns, columns=columns)
+    value_counts = {col: pd.Series(counts).sort_index() for col, counts in discrete.counts.items()}
+    return StreamSummary(rows, stats.Statistics(columns, corr, describe, boxes, {}),
+                         {col: (histogram.counts[0], histogram.edges[0]) for col, histogram in requested.items()},
+                         value_counts)
+
+
+def add_arguments(parser):
+    """--stream / --chunksize options of the scripts that can draw some figures from a stream summary."""
+    parser.add_argument('--stream', action='store_true',
+                        help='read the csv in chunks and draw only the figures that work from streamed summaries')
+    parser.add_argument('--chunksize', type=int, default=CHUNK_ROWS, help='rows per chunk in --stream mode')
+    return parser
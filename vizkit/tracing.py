@@ -0,0 +1,273 @@
+"""
+Phase tracing and profiling of a render run.
+
+    python Class7homework_basic.py --trace trace.json [--profile 5]
+
+records, for the run and for every figure, how long each phase took: loading the dataset, the shared statistics
+(stats, KDE, bootstrap, pair histograms), the figure function, tight_layout, and savefig split into rendering the
+figure and encoding the file. Each phase gets wall time, the CPU time of its thread and is tagged with the figure's
+output path. Phases on the main thread also get the memory allocated (net and peak, from tracemalloc, which slows
+allocation-heavy code down); tracemalloc counts the whole process, so these include what other threads (shared nodes,
+PNG encoding) allocate at the same time, and phases on those threads get no memory numbers at all. The result is a
+Chrome trace (open it in chrome://tracing or https://ui.perfetto.dev); figures drawn by pool workers appear under the
+worker's pid. A summary of the slowest figures is printed at the end.
+
+With --profile N every figure is run under cProfile and the profiles of the N slowest figures are kept next to the
+trace (trace.json.profiles/<output>.prof, read them with python -m pstats or snakeviz).
+
+Code marks a phase with ``with tracing.phase('name'):``; outside a tracing session this does nothing.
+"""
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import matplotlib.figure
+
+# How many of the slowest figures the summary lists.
+SUMMARY_FIGURES = 10
+
+_session = None
+
+
+class Session:
+    """Events recorded in one process; pool workers have their own and send their events back per figure."""
+
+    def __init__(self, path=None, profile=0, origin=None):
+        self.path = path
+        self.profile = profile
+        self.origin = time.time() if origin is None else origin
+        self.clock_offset = self.origin - time.time() + time.perf_counter()
+        self.events = []
+        # open phases and the figure being drawn are kept per thread (shared nodes are computed on threads)
+        self.local = threading.local()
+
+    @property
+    def stack(self):
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = []
+        return self.local.stack
+
+    @property
+    def output(self):
+        return getattr(self.local, 'output', None)
+
+    @output.setter
+    def output(self, output):
+        self.local.output = output
+
+    def timestamp(self):
+        return (time.perf_counter() - self.clock_offset) * 1e6
+
+    def event(self, name, start, end, args):
+        self.events.append({'name': name, 'cat': 'figure' if name == 'figure' else 'phase', 'ph': 'X',
+                            'ts': start, 'dur': end - start, 'pid': os.getpid(), 'tid': threading.get_ident(),
+                            'args': args})
+
+    @contextmanager
+    def phase(self, name, **args):
+        start, cpu = self.timestamp(), time.thread_time()
+        # the tracemalloc counters are process-wide: only the main thread resets and reads the peak
+        memory = threading.current_thread() is threading.main_thread()
+        if memory:
+            allocated, outer_peak = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+        frame = {'peak': 0}
+        self.stack.append(frame)
+        try:
+            yield
+        finally:
+            self.stack.pop()
+            args.update(output=self.output, cpu_ms=round((time.thread_time() - cpu) * 1e3, 3))
+            if memory:
+                current, peak = tracemalloc.get_traced_memory()
+                peak = max(peak, frame['peak'])
+                if self.stack:
+                    # reset_peak() above discarded the peak the enclosing phase had seen so far
+                    self.stack[-1]['peak'] = max(self.stack[-1]['peak'], outer_peak, peak)
+                args.update(allocated_kb=round((current - allocated) / 1024, 1),
+                            peak_kb=round(max(peak - allocated, 0) / 1024, 1))
+            self.event(name, start, self.timestamp(), args)
+
+
+def phase(name, **args):
+    """Context manager recording one phase of the current figure (a no-op when not tracing)."""
+    if _session is None:
+        return _nothing()
+    return _session.phase(name, **args)
+
+
+@contextmanager
+def _nothing():
+    yield
+
+
+def traced(name):
+    """Decorator recording every call of a function as the phase ``name``."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def figure(output):
+    """Tag the phases inside with ``output``; profile the figure when the session keeps profiles."""
+    if _session is None:
+        yield
+        return
+    _session.output = output
+    profiler = cProfile.Profile() if _session.profile else None
+    try:
+        with _session.phase('figure'):
+            if profiler:
+                profiler.enable()
+            try:
+                yield
+            finally:
+                if profiler:
+                    profiler.disable()
+    finally:
+        _session.output = None
+    if profiler:
+        path = profile_path(_session.path, output)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        profiler.dump_stats(path)
+
+
+@contextmanager
+def tagged(output):
+    """Tag the phases recorded inside, on this thread, with ``output`` (for work done off the figure's thread)."""
+    if _session is None:
+        yield
+        return
+    _session.output = output
+    try:
+        yield
+    finally:
+        _session.output = None
+
+
+def savefig(fig, output, **kwargs):
+    """fig.savefig(output, **kwargs), traced as a 'savefig' phase with 'render' and 'encode' parts."""
+    if _session is None:
+        fig.savefig(output, **kwargs)
+        return
+    drawn = []
+    callback = fig.canvas.mpl_connect('draw_event', lambda event: drawn.append(_session.timestamp()))
+    try:
+        with _session.phase('savefig'):
+            start = _session.timestamp()
+            fig.savefig(output, **kwargs)
+            end = _session.timestamp()
+    finally:
+        fig.canvas.mpl_disconnect(callback)
+    if drawn:
+        # the draw event fires when the artists are rendered, before the image is encoded and written
+        _session.event('render', start, drawn[-1], {'output': output})
+        _session.event('encode', drawn[-1], end, {'output': output})
+
+
+def profile_path(trace_path, output):
+    return os.path.join(trace_path + '.profiles', output.replace(os.sep, '__') + '.prof')
+
+
+def _traced_tight_layout(self, *args, **kwargs):
+    with phase('tight_layout'):
+        return _tight_layout(self, *args, **kwargs)
+
+
+_tight_layout = matplotlib.figure.Figure.tight_layout
+
+
+def _start(session):
+    global _session
+    _session = session
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    matplotlib.figure.Figure.tight_layout = _traced_tight_layout
+
+
+def _stop():
+    global _session
+    _session = None
+    tracemalloc.stop()
+    matplotlib.figure.Figure.tight_layout = _tight_layout
+
+
+def worker_settings():
+    """What a pool worker needs to trace the figures it draws (None when not tracing)."""
+    return None if _session is None else (_session.path, _session.profile, _session.origin)
+
+
+def start_worker(settings):
+    if settings is not None:
+        _start(Session(*settings))
+
+
+def take_events():
+    """Return and forget the events recorded so far in this process (pool workers send them back)."""
+    if _session is None:
+        return []
+    events, _session.events = _session.events, []
+    return events
+
+
+def add_events(events):
+    if _session is not None:
+        _session.events.extend(events)
+
+
+def summarize(events, profile=0, trace_path=None):
+    """Print the slowest figures with their phases; keep only the profiles of the ``profile`` slowest."""
+    figures = sorted((e for e in events if e['name'] == 'figure'), key=lambda e: e['dur'], reverse=True)
+    phases = {}
+    for e in events:
+        if e['name'] != 'figure' and e['args'].get('output'):
+            totals = phases.setdefault(e['args']['output'], {})
+            totals[e['name']] = totals.get(e['name'], 0) + e['dur'] / 1e6
+    for e in figures[:SUMMARY_FIGURES]:
+        output = e['args']['output']
+        parts = ', '.join(f'{name} {seconds:.2f}s' for name, seconds in phases.get(output, {}).items())
+        print(f"{e['dur'] / 1e6:7.2f}s  {output}  ({parts})")
+    if profile and trace_path:
+        for e in figures[profile:]:
+            path = profile_path(trace_path, e['args']['output'])
+            if os.path.exists(path):
+                os.remove(path)
+
+
+@contextmanager
+def session(path=None, profile=0):
+    """Trace everything inside into the Chrome trace ``path`` (no-op when ``path`` is None)."""
+    if path is None:
+        yield
+        return
+    _start(Session(path, profile))
+    try:
+        with phase('run'):
+            yield
+    finally:
+        events = _session.events
+        _stop()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        summarize(events, profile, path)
+        print(f'trace written to {path}')
+
+
+def add_arguments(parser):
+    """--trace / --profile options of the plotting scripts."""
+    parser.add_argument('--trace', default=None, metavar='PATH',
+                        help='write a Chrome trace of the load / compute / layout / savefig phases of every figure')
+    parser.add_argument('--profile', type=int, default=0, metavar='N',
+                        help='with --trace, keep cProfile dumps of the N slowest figures')
+    return parser
@@ -0,0 +1,156 @@
+"""
+Write-behind output of the rendered figures.
+
+    with writer.session(compression=6, queue=4):
+        render.render(tasks, data)
+
+While a session is active, writer.savefig() only renders a PNG figure (the Agg draw, on the calling thread) and
+hands the Agg buffer itself (a copy only for the figures vizkit.figpool reuses) to a small thread pool that encodes
+the PNG (zlib, which runs without the GIL) and writes the file, so the next figure is built while the previous one
+is being compressed. At most ``queue`` rendered figures wait for their encoding; the next savefig blocks until one
+is written, which bounds the memory held by pending buffers. flush() is the barrier: it waits for every pending file
+and raises with the list of the ones that could not be written. render.draw_all flushes before returning (so the
+render cache only ever stores complete files) and the session flushes again when it ends.
+
+Other formats, savefig options other than ``dpi`` and styles changing the savefig rcParams (tight bounding box,
+transparency, face colours) are saved synchronously with fig.savefig as before; so is everything outside a session.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import matplotlib
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from vizkit import figpool, tracing
+
+# zlib level of the PNG files (matplotlib's default)
+COMPRESSION = 6
+# rendered figures that may wait for their encoding at the same time (0 writes synchronously)
+QUEUE = 4
+THREADS = min(4, os.cpu_count() or 1)
+
+_writer = None
+
+
+class Writer:
+    """Encodes and writes rendered figures on a thread pool, with at most ``queue`` of them pending."""
+
+    def __init__(self, compression=COMPRESSION, queue=QUEUE, threads=THREADS):
+        self.compression = compression
+        self.queue = queue
+        self.pool = ThreadPoolExecutor(threads, thread_name_prefix='writer')
+        self.slots = threading.BoundedSemaphore(queue)
+        self.pending = []
+
+    def write(self, fig, output, dpi):
+        with tracing.phase('write wait'):
+            self.slots.acquire()
+        try:
+            with tracing.phase('render'):
+                original = fig.dpi
+                fig.dpi = dpi
+                try:
+                    fig.canvas.draw()
+                finally:
+                    fig.dpi = original
+                # a view of the renderer's memory: the closed figure is never drawn into again (pooled figures are,
+                # and their renderer is reused, so they hand over a copy)
+                buffer = fig.canvas.buffer_rgba()
+                if figpool.pooled(fig):
+                    buffer = np.array(buffer)
+            future = self.pool.submit(self._encode, buffer, output, dpi)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda done: self.slots.release())
+        self.pending.append((output, future))
+
+    def _encode(self, buffer, output, dpi):
+        from PIL import Image, PngImagePlugin
+        with tracing.tagged(output), tracing.phase('encode'):
+            height, width = buffer.shape[:2]
+            image = Image.frombuffer('RGBA', (width, height), buffer, 'raw', 'RGBA', 0, 1)
+            info = PngImagePlugin.PngInfo()
+            info.add_text('Software', f'Matplotlib version{matplotlib.__version__}, https://matplotlib.org/')
+            # written next to the output and renamed, so a failed write never leaves a truncated file
+            partial = output + '.partial'
+            image.save(partial, format='png', compress_level=self.compression, dpi=(dpi, dpi), pnginfo=info)
+            os.replace(partial, output)
+
+    def flush(self):
+        """Wait for every pending file; raise RuntimeError naming the ones that failed."""
+        pending, self.pending = self.pending, []
+        failures = [f'{output}: {future.exception()!r}' for output, future in pending if future.exception()]
+        if failures:
+            raise RuntimeError(f'{len(failures)} figures could not be written: ' + '; '.join(failures))
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.pool.shutdown()
+
+
+def can_write_behind(fig, output, kwargs):
+    """True when ``fig.savefig(output, **kwargs)`` would write exactly the Agg buffer as a PNG."""
+    rc = matplotlib.rcParams
+    return (os.path.splitext(output)[1].lower() == '.png' and set(kwargs) <= {'dpi'}
+            and isinstance(fig.canvas, FigureCanvasAgg) and rc['savefig.bbox'] != 'tight'
+            and not rc['savefig.transparent'] and rc['savefig.facecolor'] == 'auto'
+            and rc['savefig.edgecolor'] == 'auto')
+
+
+def savefig(fig, output, **kwargs):
+    """fig.savefig(output, **kwargs), written behind when a session is active and the figure allows it."""
+    if _writer is None or not can_write_behind(fig, output, kwargs):
+        tracing.savefig(fig, output, **kwargs)
+        return
+    dpi = kwargs.get('dpi', matplotlib.rcParams['savefig.dpi'])
+    _writer.write(fig, output, fig.dpi if dpi == 'figure' else dpi)
+
+
+def flush():
+    """Wait until every figure saved so far is written (no-op outside a session)."""
+    if _writer is not None:
+        _writer.flush()
+
+
+def _start(compression, queue):
+    global _writer
+    _writer = Writer(compression, queue) if queue > 0 else None
+
+
+@contextmanager
+def session(compression=COMPRESSION, queue=QUEUE):
+    """Write the figures saved inside behind; flush and report failures at the end."""
+    global _writer
+    _start(compression, queue)
+    try:
+        yield
+    finally:
+        writer, _writer = _writer, None
+        if writer is not None:
+            writer.close()
+
+
+def worker_settings():
+    """What a pool worker needs to write its figures behind (None when synchronous)."""
+    return None if _writer is None else (_writer.compression, _writer.queue)
+
+
+def start_worker(settings):
+    if settings is not None:
+        _start(*settings)
+
+
+def add_arguments(parser):
+    """--png-compression / --write-queue options of the plotting scripts."""
+    parser.add_argument('--png-compression', type=int, default=COMPRESSION, choices=range(10), metavar='0-9',
+                        help=f'zlib level of the PNG files (default {COMPRESSION}; lower is faster and larger)')
+    parser.add_argument('--write-queue', type=int, default=QUEUE, metavar='N',
+                        help=f'rendered figures that may wait for PNG encoding in the background (default {QUEUE}, '
+                             '0 saves every figure before drawing the next)')
+    return parser